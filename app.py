@@ -3,26 +3,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app import create_app
-from app.models import db
 import os
-from app.config import config_by_name
-from flask.cli import with_appcontext
-
-# Print to debug the loading of the .env variables
-print(f"DB_USER: {os.getenv('DB_USER')}, DB_PASSWORD: {os.getenv('DB_PASSWORD')}")
 
 # Determine config name
 config_name = os.getenv('FLASK_ENV', 'development')
-config_class = config_by_name[config_name]
-
-print(f"Using configuration: {config_class.__name__}")
-print(f"DB_USER: {os.getenv('DB_USER')}")
-print(f"DB_PASSWORD: {os.getenv('DB_PASSWORD')}")
-
-app = create_app(config_class)
 
-with app.app_context():
-    db.create_all()
+# Tables are no longer created on every start, run once:
+#   flask --app "app:create_app('development')" create-db     (or: ... db upgrade)
+app = create_app(config_name)
 
 if __name__ == '__main__':
-    app.run()   
\ No newline at end of file
+    app.run()
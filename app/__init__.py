@@ -1,15 +1,17 @@
 from flask import Flask
 from app.models import db
 from app.extensions import ma, limiter, cache
-from app.blueprints.customers import customers_bp
-from app.blueprints.service_tickets import service_tickets_bp
-from app.blueprints.mechanics import mechanics_bp
-from flask_migrate import Migrate
-from app.blueprints.authentication import authentications_bp
-from app.blueprints.inventory import inventory_bp
-from flask_swagger_ui import get_swaggerui_blueprint
 from app.config import config_by_name
-import os
+from app.utils.catalog import product_catalog
+from app.utils.lazyload import lazy_load_detector
+from app.utils.slow_queries import slow_query_log
+from app.utils.profiling import request_profiler
+from app.utils.replicas import replica_router
+from app.utils.read_only import read_only_requests
+from app.utils.outbox import outbox
+from app.utils.sse import ticket_events
+from app.utils.counts import row_count_invalidator
+from app.commands import register_commands
 
 # db = SQLAlchemy()
 # ma = Marshmallow()
@@ -17,40 +19,66 @@ import os
 SWAGGER_URL = '/api/docs' # URL for exposing Swagger UI (without trailing '/')
 API_URL = '/static/swagger.yaml' # Our API url (can of course be a local resource)
 
-SWAGGERUI_BLUEPRINT = get_swaggerui_blueprint(
-    SWAGGER_URL,
-    API_URL,
-    config={
-        'app_name': "Mechanic Shop API"
-    }
-)
-
-migrate = Migrate()
-
 def create_app(config_name):
     
     app = Flask(__name__)
     
-    # Config setup
-    app.config.from_object(config_by_name[config_name])
+    # Config setup, config_name is a key of config_by_name or a config class
+    config = config_by_name[config_name] if isinstance(config_name, str) else config_name
+    app.config.from_object(config)
+    if hasattr(config, 'init_app'):
+        config.init_app(app)
 
-    # Initialize extensions
+    # Initialize extensions, the replica router adds its binds before the engines are created
+    replica_router.init_app(app)
     db.init_app(app)
+    read_only_requests.init_app(app)
     ma.init_app(app)
     limiter.init_app(app)
     cache.init_app(app)
+    product_catalog.init_app(app)
+    lazy_load_detector.init_app(app)
+    slow_query_log.init_app(app)
+    request_profiler.init_app(app)
+    outbox.init_app(app)
+    ticket_events.init_app(app)
+    row_count_invalidator.init_app(app)
     
     # Ensuring that Marshmallow is using the correct session
     ma.SQLAlchemySchema.OPTIONS_CLASS.session = db.session
     
+    # Blueprints are imported here so importing app.models (CLI tools, seeding) doesn't load every route
+    from app.blueprints.customers import customers_bp
+    from app.blueprints.service_tickets import service_tickets_bp
+    from app.blueprints.mechanics import mechanics_bp
+    from app.blueprints.authentication import authentications_bp
+    from app.blueprints.inventory import inventory_bp
+    from app.blueprints.admin import admin_bp
+    from app.blueprints.jobs import jobs_bp
+    from app.blueprints.outbox import outbox_bp
+    from app import tasks  # Registers the @job_task functions the worker runs
+    from flask_swagger_ui import get_swaggerui_blueprint
+    
+    swaggerui_blueprint = get_swaggerui_blueprint(
+        SWAGGER_URL,
+        API_URL,
+        config={
+            'app_name': "Mechanic Shop API"
+        }
+    )
+    
     # Register blueprints
     app.register_blueprint(customers_bp, url_prefix='/customers')
     app.register_blueprint(service_tickets_bp, url_prefix='/service_tickets')
     app.register_blueprint(mechanics_bp, url_prefix='/mechanics')
     app.register_blueprint(authentications_bp, url_prefix='/auth')
     app.register_blueprint(inventory_bp, url_prefix='/inventory')
-    app.register_blueprint(SWAGGERUI_BLUEPRINT, url_prefix=SWAGGER_URL)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
+    app.register_blueprint(outbox_bp, url_prefix='/outbox')
+    app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
     
+    # CLI commands (flask create-db, flask reset-db, flask db, flask run-worker ...)
+    register_commands(app)
 
     return app
-
@@ -0,0 +1,104 @@
+import io
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from werkzeug.exceptions import HTTPException
+from app import create_app
+from app.utils.async_db import async_db, async_views
+from app.utils.sse import limit_streams
+
+# Modules registering async views with @async_view, imported by create_asgi_app
+ASYNC_VIEW_MODULES = (
+    'app.blueprints.service_tickets.async_routes',
+    'app.blueprints.inventory.async_routes',
+    'app.blueprints.mechanics.async_routes',
+)
+
+
+class AsyncReadApp:
+    """ASGI app serving the read endpoints that have an async view on the event loop, the rest through WSGI.
+
+    Requests are matched against the Flask URL map, so URLs, strict slashes and endpoint names are the
+    sync app's. A GET whose endpoint has an async view runs that view in a Flask request context while its
+    queries are awaited on the async engine, one worker can keep hundreds of these in flight. Everything
+    else, and async views returning None, goes to the Flask app on a thread pool of ASGI_WSGI_WORKERS.
+    Async views skip the Flask before and after request hooks, so the response cache, rate limits,
+    request profiling and the slow query log only apply to requests served by the sync app. SSE streams
+    are sync views too, so SSE_MAX_CONNECTIONS is lowered to leave some of the pool to the other requests.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.views = async_views
+        if not async_db.driver_installed(flask_app):
+            # Every async view would fail on the missing driver, the sync app serves all requests instead
+            flask_app.logger.warning("The async database driver isn't installed, serving every request through WSGI")
+            self.views = {}
+        workers = flask_app.config.get('ASGI_WSGI_WORKERS', 10)
+        limit_streams(flask_app, workers)
+        self.wsgi = WSGIMiddleware(flask_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            view, view_args = self.match(scope)
+            if view is not None:
+                response = await self.dispatch(scope, view, view_args)
+                if response is not None:
+                    await self.send_response(response, send)
+                    return
+        await self.wsgi(scope, receive, send)
+
+    def match(self, scope):
+        """The async view and URL arguments for a request, or (None, None) when the sync app handles it."""
+        root_path = scope.get('root_path', '')
+        path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+        adapter = self.flask_app.url_map.bind('localhost', script_name=root_path or None)
+        try:
+            endpoint, view_args = adapter.match(path, method='GET')
+        except HTTPException:
+            # Not found, redirects for trailing slashes, ... are answered by Flask
+            return None, None
+        return self.views.get(endpoint), view_args
+
+    async def dispatch(self, scope, view, view_args):
+        # GET requests have no body to read
+        environ = build_environ(scope, io.BytesIO())
+        with self.flask_app.request_context(environ):
+            try:
+                rv = await view(**view_args)
+            except Exception as e:
+                return self.flask_app.handle_exception(e)
+            if rv is None:
+                return None
+            return self.flask_app.make_response(rv)
+
+    async def send_response(self, response, send):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose(self.flask_app)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config_name):
+    """Create the Flask app and wrap it in an AsyncReadApp, e.g. for `uvicorn asgi:app`."""
+    import importlib
+
+    flask_app = create_app(config_name)
+    async_db.init_app(flask_app)
+    for module in ASYNC_VIEW_MODULES:
+        importlib.import_module(module)
+    return AsyncReadApp(flask_app)
@@ -0,0 +1,60 @@
+from app.blueprints.admin import admin_bp
+from flask import current_app, jsonify, request
+from app.utils.util import token_required
+from app.utils.slow_queries import slow_query_log
+from app.utils.profiling import request_profiler
+
+# ---------------- Admin Endpoints --------------------
+# Endpoint to GET the most recent slow SQL statements with their EXPLAIN output, admins only
+@admin_bp.route('/slow-queries', methods=['GET'])
+@token_required
+def get_slow_queries(user):
+    try:
+        if user.user_type != 'admin':
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        try:
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        
+        entries = slow_query_log.entries(current_app, limit=max(limit, 0))
+        return jsonify({
+            "slow_queries": entries,
+            "count": len(entries),
+            "threshold_ms": current_app.config.get('SLOW_QUERY_THRESHOLD_MS')
+        }), 200
+    except Exception as e:
+        print("Internal Server Error:", e)
+        return jsonify({"error": str(e)}), 500
+
+# Endpoint to DELETE the recorded slow queries, admins only
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@token_required
+def clear_slow_queries(user):
+    if user.user_type != 'admin':
+        return jsonify({"error": "Unauthorized access"}), 403
+    
+    slow_query_log.clear(current_app)
+    return jsonify({"message": "Slow query log cleared."}), 200
+
+# Endpoint to GET the ids of the stored request profiles, admins only
+@admin_bp.route('/profiles', methods=['GET'])
+@token_required
+def get_profiles(user):
+    if user.user_type != 'admin':
+        return jsonify({"error": "Unauthorized access"}), 403
+    
+    return jsonify({"profiles": request_profiler.list(current_app)}), 200
+
+# Endpoint to GET a stored request profile by the id returned in X-Profile-Id, admins only
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@token_required
+def get_profile(user, profile_id):
+    if user.user_type != 'admin':
+        return jsonify({"error": "Unauthorized access"}), 403
+    
+    profile = request_profiler.load(current_app, profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found."}), 404
+    return jsonify(profile), 200
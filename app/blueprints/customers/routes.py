@@ -6,7 +6,13 @@ from app.models import ServiceTicket, db, Customer, Admin
 from flask import jsonify, request
 from marshmallow import ValidationError
 from app.extensions import limiter, cache
-from app.utils.util import encode_token, not_found, token_required
+from app.utils.util import encode_token, not_found, token_required, commit_keep_loaded
+from app.utils.counts import EXACT_STRATEGIES, CountStrategyError, count_strategy, list_total
+from app.utils.rows import paginate_records, fetch_records
+from app.utils.deletes import delete_customer_cascade
+from app.utils.idempotency import idempotent
+from app.utils.batch import batch_response, bump_generations, invalidate_entities
+from app.utils.jobs import wants_async, enqueue, job_owner, accepted_response
 from werkzeug.exceptions import NotFound
 
 # -----------------Customers Endpoints--------------------
@@ -14,12 +20,13 @@ from werkzeug.exceptions import NotFound
 # Endpoint to CREATE a new customer with validation error handling
 @customers_bp.route('/', methods=['POST'], strict_slashes=False)
 @limiter.limit("10 per minute; 20 per hour; 100 per day")
+@idempotent  # Retries with the same Idempotency-Key header return the stored response
 def create_customer():
     try:
         data = request.get_json()
         customer = customer_schema.load(data)
         db.session.add(customer)
-        db.session.commit()
+        commit_keep_loaded()
         return customer_schema.jsonify(customer), 201
     except ValidationError as err:
         return jsonify(err.messages), 400
@@ -32,6 +39,12 @@ def create_customer():
 #@limiter.limit("10 per minute; 20 per hour; 100 per day")
 def get_customers():
     try:
+        # Multi-get by ids, e.g. ?ids=1,2,3, returned in request order with explicit misses
+        if 'ids' in request.args:
+            return batch_response("customers", request.args['ids'], 'customer',
+                                  lambda ids: fetch_records(Customer, where=Customer.id.in_(ids)),
+                                  customer_schema.dump)
+        
         page_str = request.args.get('page', '1')
         per_page_str = request.args.get('per_page', '10')
         
@@ -49,18 +62,28 @@ def get_customers():
                 "total_pages": 0,
                 "error": "Page not found or exceeds total pages"
             }), 200
+        
+        try:
+            strategy = count_strategy()
+        except CountStrategyError as err:
+            return jsonify({"error": str(err)}), 400
             
         # Using .order_by() to ensure consisten pagination
         base_query = Customer.query.order_by(Customer.id)
-        # Getting total number of customers
-        total = base_query.count()
+        # Getting total number of customers, counted, cached or estimated as the count strategy says, None for ?count=none
+        total, counted_by = list_total(Customer, strategy)
+        exact = counted_by in EXACT_STRATEGIES
         # Calculating total pages
-        total_pages = (total + per_page - 1) // per_page
+        total_pages = (total + per_page - 1) // per_page if total is not None else None
         
         print(f"[DEBUG] total: {total}, total_pages: {total_pages}, requested page: {page}") # Debugging line
         
-        # Checking if the requested page exceeds the total pages
-        if total == 0 or page > total_pages or page < 1:
+        # Checking if the requested page exceeds the total pages, only an exact total tells before the page is read
+        pagination = None
+        if page >= 1 and not (exact and (total == 0 or page > total_pages)):
+            # Paginating the query, reading lightweight records instead of ORM instances
+            pagination = paginate_records(base_query, Customer, page, per_page, total, exact=exact)
+        if pagination is None or not pagination.items:
             return jsonify({
                             "current_page": page,
                             "customers": [],
@@ -70,24 +93,24 @@ def get_customers():
                             "per_page": per_page,
                             "total": total,
                             "total_pages": total_pages,
+                            "count": counted_by,
                             "error": "Page not found or exceeds total pages"
                             }), 200
         
-        # Paginating the query
-        pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
         customers = pagination.items
         
         print(f"Requested page: {page}, total pages: {pagination.pages}") # Debugging line
 
         return jsonify({
             "current_page": pagination.page,
-            "customers": [CustomerSchema().dump(customer) for customer in customers],
+            "customers": customers_schema.dump(customers),
             "has_next": pagination.has_next,
             "has_prev": pagination.has_prev,
             "page": pagination.page,
             "per_page": pagination.per_page,
             "total": pagination.total,
-            "total_pages": pagination.pages
+            "total_pages": pagination.pages,
+            "count": counted_by
         }), 200  
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -129,8 +152,10 @@ def update_customer(user, customer_id): # Receiving customer_id from the token
         data.pop("email", None)  # Remove email from data if present
         customer_schema = CustomerSchema()
         customer = customer_schema.load(data, instance=customer, session=db.session, partial=True)
-        
-        db.session.commit()
+        commit_keep_loaded()
+        invalidate_entities('customer', customer_id)
+        # Cached service tickets embed their customer
+        bump_generations('customer', customer_id)
         
         return customer_schema.jsonify(customer), 200
     except ValidationError as err:
@@ -165,24 +190,24 @@ def delete_customer(user, customer_id): # Receiving customer_id from the token
         if not customer:
             return jsonify({"error": "Customer not found."}), 404
         
-        # Update related service tickets to remove the customer_id
-        service_tickets = ServiceTicket.query.filter_by(customer_id=customer_id).all()
-        for ticket in service_tickets:
-            ticket.customer_id = None
-            db.session.add(ticket)
-        
-        # Commit the changes to the service tickets
-        db.session.commit()
+        # With Prefer: respond-async the cascade runs in the job worker, the client polls the job's status URL
+        if wants_async():
+            return accepted_response(enqueue('customers.delete', {"customer_id": customer_id}, created_by=job_owner(user)))
         
-        # Delete the customer
-        db.session.delete(customer)
+        # Delete the customer together with their service tickets using set-based deletes
+        deleted_tickets = delete_customer_cascade(customer_id)
         db.session.commit()
+        invalidate_entities('customer', customer_id)
+        bump_generations('customer', customer_id)
         
-        return jsonify({"message": f"Customer {customer_id} deleted successfully"}), 200
+        return jsonify({
+            "message": f"Customer {customer_id} deleted successfully",
+            "deleted_service_tickets": deleted_tickets
+        }), 200
     
     except IntegrityError:
         db.session.rollback()
-        return jsonify({"error": "Cannot delete customer with existing service tickets."}), 400
+        return jsonify({"error": "Cannot delete customer because of related records."}), 400
     except ValidationError as err:
         return jsonify(err.messages), 400
     except Exception as e:
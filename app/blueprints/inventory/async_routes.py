@@ -0,0 +1,51 @@
+from flask import jsonify, request
+from app.blueprints.inventory.inventorySchemas import products_schema
+from app.utils.async_db import async_db, async_view
+from app.utils.catalog import product_catalog
+
+
+# ---------------- Async inventory Endpoints --------------------
+# Served by the ASGI app (asgi.py) on the event loop, same responses as the views in routes.py
+# Endpoint to GET ALL inventory products
+@async_view('inventory_bp.get_all_products')
+async def get_all_products():
+    # Multi-gets by ids and invalid page numbers are answered by the sync view
+    if 'ids' in request.args:
+        return None
+    try:
+        page = int(request.args.get('page', '1'))
+        per_page = int(request.args.get('per_page', '10'))
+    except ValueError:
+        return None
+
+    try:
+        # Only loads the products when the catalog version changed
+        catalog = await async_db.run_sync(product_catalog.snapshot)
+        total = len(catalog)
+        total_pages = (total + per_page - 1) // per_page
+
+        if total == 0 or page > total_pages or page < 1:
+            return jsonify({
+                            "current_page": page,
+                            "products": [],
+                            "has_next": False,
+                            "has_prev": False,
+                            "page": page,
+                            "per_page": per_page,
+                            "total": total,
+                            "total_pages": total_pages,
+                            "error": "Page not found or exceeds total pages"
+                            }), 200
+
+        return jsonify({
+            "current_page": page,
+            "products": products_schema.dump(catalog.page(page, per_page)),
+            "has_next": page < total_pages,
+            "has_prev": page > 1,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "total_pages": total_pages
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,7 @@
 from app.models import Product, ProductServiceTicket, db
 from app.extensions import ma
+from app.utils.catalog import product_catalog
+from flask import has_app_context
 from marshmallow import fields, validate
 
 class ProductSchema(ma.SQLAlchemyAutoSchema):
@@ -17,8 +19,17 @@ class ProductSchema(ma.SQLAlchemyAutoSchema):
         load_instance = True
         include_fk = True
         
+# Nested product field that reads from the in-memory catalog instead of lazy loading the relationship
+class CatalogProductField(fields.Nested):
+    def serialize(self, attr, obj, accessor=None, **kwargs):
+        product_id = getattr(obj, 'product_id', None)
+        product = product_catalog.get(product_id) if product_id is not None and has_app_context() else None
+        if product is None:
+            return super().serialize(attr, obj, accessor, **kwargs)
+        return self._serialize(product, attr, obj, **kwargs)
+
 class ProductServiceTicketSchema(ma.SQLAlchemyAutoSchema):
-    product = fields.Nested(ProductSchema)
+    product = CatalogProductField(ProductSchema)
     quantity = fields.Int()
     
     class Meta:
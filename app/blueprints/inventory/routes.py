@@ -1,21 +1,26 @@
-from app.utils.util import token_required
+from app.utils.util import token_required, commit_keep_loaded
 from app.blueprints.inventory import inventory_bp
 from app.blueprints.inventory.inventorySchemas import ProductSchema, products_schema, product_schema
 from app.models import Product, ServiceTicket, db, Product
 from flask import jsonify, request
 from marshmallow import ValidationError
 from app.extensions import limiter, cache
+from app.utils.stale_cache import stale_cached
+from app.utils.catalog import product_catalog
+from app.utils.idempotency import idempotent
+from app.utils.batch import batch_response, bump_generations
 
 # ---------------- inventory Endpoints --------------------
 # Endpoint to create a new inventory product with validation error handling
 @inventory_bp.route('/', methods=['POST'], strict_slashes=False)
 @limiter.limit("10 per minute; 20 per hour; 100 per day")
+@idempotent  # Retries with the same Idempotency-Key header return the stored response
 def create_inventory():
     try:
         data = request.get_json()
         product = product_schema.load(data, session=db.session)
         db.session.add(product)
-        db.session.commit()
+        commit_keep_loaded()
         return product_schema.jsonify(product), 201
     except ValidationError as err:
         return jsonify(err.messages), 400
@@ -28,6 +33,13 @@ def create_inventory():
 #@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
 def get_all_products():
     try:
+        # Multi-get by ids, e.g. ?ids=1,2,3, served straight from the catalog snapshot
+        if 'ids' in request.args:
+            catalog = product_catalog.snapshot()
+            return batch_response("products", request.args['ids'], None,
+                                  lambda ids: [product for product in map(catalog.get, ids) if product],
+                                  product_schema.dump)
+        
         page_str = request.args.get('page', '1')
         per_page_str = request.args.get('per_page', '10')
         
@@ -47,10 +59,10 @@ def get_all_products():
                 "error": "Page not found or exceeds total pages"
             }), 200
             
-        # Using Product model and  .order_by() to ensure consisten pagination
-        base_query = Product.query.order_by(Product.id)
+        # Reading from the in-memory catalog snapshot, which is already ordered by id
+        catalog = product_catalog.snapshot()
         # Getting total number of inventory products
-        total = base_query.count()
+        total = len(catalog)
         # Calculating total pages
         total_pages = (total + per_page - 1) // per_page
         
@@ -70,31 +82,30 @@ def get_all_products():
                             "error": "Page not found or exceeds total pages"
                             }), 200
         
-        # Paginating the query
-        pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
-        products = pagination.items
+        # Paginating the snapshot
+        products = catalog.page(page, per_page)
         
-        print(f"Requested page: {page}, total pages: {pagination.pages}") # Debugging line
+        print(f"Requested page: {page}, total pages: {total_pages}") # Debugging line
 
         return jsonify({
-            "current_page": pagination.page,
+            "current_page": page,
             "products": products_schema.dump(products),
-            "has_next": pagination.has_next,
-            "has_prev": pagination.has_prev,
-            "page": pagination.page,
-            "per_page": pagination.per_page,
-            "total": pagination.total,
-            "total_pages": pagination.pages
+            "has_next": page < total_pages,
+            "has_prev": page > 1,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "total_pages": total_pages
         }), 200  
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Endpoint to GET a SPECIFIC inventory product by ID with validation error handling
 @inventory_bp.route('/<int:id>', methods=['GET'], strict_slashes=False)
-@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
+@stale_cached()  # Serve cached responses, refreshing stale ones in the background and on database errors
 def get_product(id):
     try:
-        product = Product.query.get(id)
+        product = product_catalog.get(id)
         if not product:
             return jsonify({"error": "Product not found"}), 404
         return product_schema.jsonify(product), 200
@@ -122,9 +133,10 @@ def update_product(user, id):
         # Loading the data into the schema for validation and updating
         updated_product = product_schema.load(data, instance=product, session=db.session)
         print(f"Updated product: {updated_product}")
-        
         # Committing the changes to the database
-        db.session.commit()
+        commit_keep_loaded()
+        # Cached service tickets embed their products
+        bump_generations('product', id)
         
         # Returning the updated product as a JSON response
         return product_schema.jsonify(updated_product), 200
@@ -148,6 +160,7 @@ def delete_product(user, id):
         
         db.session.delete(product)
         db.session.commit()
+        bump_generations('product', id)
 
         return jsonify({"message": "Product deleted successfully from inventory"}), 200
     except ValidationError as err:
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+from . import routes
\ No newline at end of file
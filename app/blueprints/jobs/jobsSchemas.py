@@ -0,0 +1,30 @@
+import json
+from app.models import Job
+from app.extensions import ma
+from marshmallow import fields, validate
+
+class JobSchema(ma.SQLAlchemyAutoSchema):
+    # payload and result are stored as JSON text, responses show them as JSON
+    payload = fields.Method('dump_payload')
+    result = fields.Method('dump_result')
+    
+    class Meta:
+        model = Job
+        exclude = ('locked_by', 'locked_at')
+    
+    def dump_payload(self, job):
+        return json.loads(job.payload) if job.payload else {}
+    
+    def dump_result(self, job):
+        return json.loads(job.result) if job.result else None
+
+# Body of POST /jobs/, the task name and its keyword arguments
+class EnqueueJobSchema(ma.Schema):
+    name = fields.String(required=True)
+    payload = fields.Dict(load_default=dict)
+    delay = fields.Integer(load_default=0, validate=validate.Range(min=0, error="delay can't be negative."))
+
+
+job_schema = JobSchema()
+jobs_schema = JobSchema(many=True)
+enqueue_job_schema = EnqueueJobSchema()
@@ -0,0 +1,71 @@
+from sqlalchemy import select
+from app.blueprints.jobs import jobs_bp
+from app.blueprints.jobs.jobsSchemas import job_schema, jobs_schema, enqueue_job_schema
+from app.models import db, Job
+from flask import jsonify, request
+from marshmallow import ValidationError
+from app.utils.util import token_required
+from app.utils.jobs import JOB_STATUSES, tasks, enqueue, job_owner, accepted_response
+
+# ---------------- Jobs Endpoints --------------------
+# Endpoint to GET the status of a background job, for the user who queued it and admins
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(user, job_id):
+    try:
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({"error": "Job not found."}), 404
+        
+        if user.user_type != 'admin' and job.created_by != job_owner(user):
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        return jsonify({"job": job_schema.dump(job)}), 200
+    except Exception as e:
+        print("Internal Server Error:", e)
+        return jsonify({"error": str(e)}), 500
+
+# Endpoint to GET the most recent jobs, optionally filtered by ?status=, admins only
+@jobs_bp.route('/', methods=['GET'], strict_slashes=False)
+@token_required
+def get_jobs(user):
+    try:
+        if user.user_type != 'admin':
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        try:
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        
+        query = select(Job).order_by(Job.id.desc()).limit(max(min(limit, 500), 0))
+        status = request.args.get('status')
+        if status:
+            if status not in JOB_STATUSES:
+                return jsonify({"error": f"status must be one of: {', '.join(JOB_STATUSES)}"}), 400
+            query = query.where(Job.status == status)
+        
+        jobs = db.session.execute(query).scalars().all()
+        return jsonify({"jobs": jobs_schema.dump(jobs), "count": len(jobs)}), 200
+    except Exception as e:
+        print("Internal Server Error:", e)
+        return jsonify({"error": str(e)}), 500
+
+# Endpoint to queue a registered task, admins only, answers 202 with the job's status URL
+@jobs_bp.route('/', methods=['POST'], strict_slashes=False)
+@token_required
+def create_job(user):
+    try:
+        if user.user_type != 'admin':
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        data = enqueue_job_schema.load(request.get_json() or {})
+        if data['name'] not in tasks:
+            return jsonify({"error": f"Unknown task: {data['name']}", "tasks": sorted(tasks)}), 400
+        
+        job = enqueue(data['name'], data['payload'], delay=data['delay'], created_by=job_owner(user))
+        return accepted_response(job)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,24 @@
+from flask import jsonify, request
+from app.blueprints.mechanics.mechanicsSchemas import mechanics_schema
+from app.models import Mechanic
+from app.utils.async_db import async_db, async_view
+from app.utils.rows import fetch_records
+
+
+# ---------------------- Async Mechanics Endpoints ---------------------
+# Served by the ASGI app (asgi.py) on the event loop, same responses as the views in routes.py
+# Endpoint to search mechanics by name
+@async_view('mechanics_bp.search_mechanics')
+async def search_mechanics():
+    name = request.args.get('name')
+    # The sync view answers the missing parameter error
+    if not name:
+        return None
+
+    try:
+        mechanics = await async_db.run_sync(
+            lambda session: fetch_records(Mechanic, where=Mechanic.name.ilike(f"%{name}%"), session=session)
+        )
+        return jsonify(mechanics_schema.dump(mechanics)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
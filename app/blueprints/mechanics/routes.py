@@ -5,19 +5,26 @@ from flask import jsonify, request
 from marshmallow import ValidationError
 from app.extensions import limiter, cache
 from werkzeug.exceptions import NotFound
-from app.utils.util import encode_token, not_found, token_required
+from app.utils.util import encode_token, not_found, token_required, commit_keep_loaded
+from app.utils.stale_cache import stale_cached
+from app.utils.counts import EXACT_STRATEGIES, CountStrategyError, count_strategy, list_total
+from app.utils.rows import paginate_records, fetch_records
+from app.utils.deletes import delete_mechanic_cascade
+from app.utils.idempotency import idempotent
+from app.utils.batch import batch_response, bump_generations, invalidate_entities
 
 # ---------------- Mechanics Endpoints --------------------
 # Endpoint to create a new mechanic with validation error handling
 @mechanics_bp.route('/', methods=['POST'], strict_slashes=False)
 @limiter.limit("10 per minute; 20 per hour; 100 per day")
+@idempotent  # Retries with the same Idempotency-Key header return the stored response
 def create_mechanic():
     try:
         data = request.get_json()
         mechanic_schema = MechanicSchema()
         mechanic = mechanic_schema.load(data, session=db.session)
         db.session.add(mechanic)
-        db.session.commit()
+        commit_keep_loaded()
         return mechanic_schema.jsonify(mechanic), 201
     except ValidationError as err:
         return jsonify(err.messages), 400
@@ -29,6 +36,12 @@ def create_mechanic():
 #@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
 def get_mechanics():
     try:
+        # Multi-get by ids, e.g. ?ids=1,2,3, returned in request order with explicit misses
+        if 'ids' in request.args:
+            return batch_response("mechanics", request.args['ids'], 'mechanic',
+                                  lambda ids: fetch_records(Mechanic, where=Mechanic.id.in_(ids)),
+                                  mechanic_schema.dump)
+        
         page_str = request.args.get('page', '1')
         per_page_str = request.args.get('per_page', '10')
         
@@ -46,18 +59,28 @@ def get_mechanics():
                 "total_pages": 0,
                 "error": "Page not found or exceeds total pages"
             }), 200
+        
+        try:
+            strategy = count_strategy()
+        except CountStrategyError as err:
+            return jsonify({"error": str(err)}), 400
             
         # Using .order_by() to ensure consisten pagination
         base_query = Mechanic.query.order_by(Mechanic.id)
-        # Getting total number of mechanics
-        total = base_query.count()
+        # Getting total number of mechanics, counted, cached or estimated as the count strategy says, None for ?count=none
+        total, counted_by = list_total(Mechanic, strategy)
+        exact = counted_by in EXACT_STRATEGIES
         # Calculating total pages
-        total_pages = (total + per_page - 1) // per_page
+        total_pages = (total + per_page - 1) // per_page if total is not None else None
         
         print(f"[DEBUG] total: {total}, total_pages: {total_pages}, requested page: {page}") # Debugging line
         
-        # Checking if the requested page exceeds the total pages
-        if total == 0 or page > total_pages or page < 1:
+        # Checking if the requested page exceeds the total pages, only an exact total tells before the page is read
+        pagination = None
+        if page >= 1 and not (exact and (total == 0 or page > total_pages)):
+            # Paginating the query, reading lightweight records instead of ORM instances
+            pagination = paginate_records(base_query, Mechanic, page, per_page, total, exact=exact)
+        if pagination is None or not pagination.items:
             return jsonify({
                             "current_page": page,
                             "mechanics": [],
@@ -67,24 +90,24 @@ def get_mechanics():
                             "per_page": per_page,
                             "total": total,
                             "total_pages": total_pages,
+                            "count": counted_by,
                             "error": "Page not found or exceeds total pages"
                             }), 200
         
-        # Paginating the query
-        pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
         mechanics = pagination.items
         
         print(f"Requested page: {page}, total pages: {pagination.pages}") # Debugging line
 
         return jsonify({
             "current_page": pagination.page,
-            "mechanics": [MechanicSchema().dump(mechanic) for mechanic in mechanics],
+            "mechanics": mechanics_schema.dump(mechanics),
             "has_next": pagination.has_next,
             "has_prev": pagination.has_prev,
             "page": pagination.page,
             "per_page": pagination.per_page,
             "total": pagination.total,
-            "total_pages": pagination.pages
+            "total_pages": pagination.pages,
+            "count": counted_by
         }), 200  
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -105,7 +128,7 @@ def get_mechanic(id):
     
 # Endpoint to GET a list of mechanics in the order of who has worked on the most tickets with validation error handling
 @mechanics_bp.route('/most-worked', methods=['GET'], strict_slashes=False)
-@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
+@stale_cached()  # Serve cached responses, refreshing stale ones in the background and on database errors
 def get_most_worked_mechanics():
     try:
         mechanics = db.session.query(Mechanic).join(ServiceTicket.mechanics).group_by(Mechanic.id).order_by(db.func.count(ServiceTicket.id).desc()).all()
@@ -117,7 +140,7 @@ def get_most_worked_mechanics():
     
 # Endpoint to do a search for mechanics by name using GET with query parameters and validation error handling
 @mechanics_bp.route('/search', methods=['GET'], strict_slashes=False)
-@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
+@stale_cached()  # Serve cached responses, refreshing stale ones in the background and on database errors
 def search_mechanics():
     try:
         name = request.args.get('name')
@@ -155,8 +178,10 @@ def update_mechanic(user, mechanic_id):
         data.pop("email", None)  # Remove email from data if present
         mechanic_schema = MechanicSchema()
         mechanic = mechanic_schema.load(data, instance=mechanic, session=db.session, partial=True)
-        
-        db.session.commit()
+        commit_keep_loaded()
+        invalidate_entities('mechanic', mechanic_id)
+        # Cached service tickets embed their mechanics
+        bump_generations('mechanic', mechanic_id)
         
         return mechanic_schema.jsonify(mechanic), 200
     except ValidationError as err:
@@ -187,8 +212,11 @@ def delete_mechanic(user, mechanic_id):
         if mechanic.email in protected_emails:
             return jsonify({"error": "This test account cannot be deleted."}), 403
         
-        db.session.delete(mechanic)
+        # Delete the mechanic and their ticket assignments using set-based deletes
+        delete_mechanic_cascade(mechanic_id)
         db.session.commit()
+        invalidate_entities('mechanic', mechanic_id)
+        bump_generations('mechanic', mechanic_id)
         
         return jsonify({"message": f"Mechanic {mechanic_id} deleted successfully"}), 200
     except ValidationError as err:
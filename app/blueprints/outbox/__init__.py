@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+outbox_bp = Blueprint('outbox_bp', __name__)
+
+from . import routes
\ No newline at end of file
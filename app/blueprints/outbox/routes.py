@@ -0,0 +1,36 @@
+from app.blueprints.outbox import outbox_bp
+from flask import current_app, jsonify, request
+from app.utils.util import token_required
+from app.utils.outbox import outbox, event_data
+
+# ---------------- Outbox Endpoints --------------------
+# Endpoint to GET the service ticket change events after a sequence number, admins only
+# Consumers pass the next_after of the previous batch as ?after= to read the feed in order, and its gaps as
+# ?gaps=1,2,3 so events of transactions that committed after the feed moved past them are still delivered
+@outbox_bp.route('/events', methods=['GET'])
+@token_required
+def get_events(user):
+    try:
+        if user.user_type != 'admin':
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        try:
+            after = int(request.args.get('after', 0))
+            limit = int(request.args.get('limit', current_app.config.get('OUTBOX_BATCH_SIZE', 100)))
+            gaps = [int(gap) for gap in request.args.get('gaps', '').split(',') if gap.strip()]
+        except ValueError:
+            return jsonify({"error": "after, limit and gaps must be integers"}), 400
+        if after < 0 or limit < 1:
+            return jsonify({"error": "after can't be negative and limit must be positive"}), 400
+        
+        limit = min(limit, current_app.config.get('OUTBOX_MAX_BATCH_SIZE', 1000))
+        batch = outbox.read(after, limit, gaps=gaps[:current_app.config.get('OUTBOX_MAX_GAPS', 100)])
+        return jsonify({
+            "events": [event_data(outbox_event) for outbox_event in batch.events],
+            "next_after": batch.next_after,
+            "gaps": batch.gaps,
+            "has_more": batch.has_more
+        }), 200
+    except Exception as e:
+        print("Internal Server Error:", e)
+        return jsonify({"error": str(e)}), 500
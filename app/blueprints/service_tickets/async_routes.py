@@ -0,0 +1,129 @@
+from flask import jsonify, request
+from sqlalchemy import func, select
+from app.blueprints.service_tickets.service_ticketsSchemas import service_tickets_schema, service_ticket_schema
+from app.models import Customer, Mechanic, ServiceMechanic, ServiceTicket
+from app.utils.async_db import async_db, async_view
+from app.utils.catalog import product_catalog
+from app.utils.counts import CountStrategyError, count_strategy
+from app.utils.rows import RecordPage, fetch_service_ticket_records
+from app.utils.archive import fetch_archived_ticket
+from app.utils.util import load_token_user, not_found
+
+
+# ---------------------- Async Service Tickets Endpoints ---------------------
+# Served by the ASGI app (asgi.py) on the event loop, same responses as the views in routes.py
+def load_ticket_page(session, page, per_page):
+    product_catalog.snapshot(session)  # Product links are dumped from the catalog
+    total = session.scalar(select(func.count()).select_from(ServiceTicket))
+    total_pages = (total + per_page - 1) // per_page
+    if total == 0 or page > total_pages or page < 1:
+        return RecordPage([], page, per_page, total)
+    tickets = fetch_service_ticket_records(offset=(page - 1) * per_page, limit=per_page, session=session)
+    return RecordPage(tickets, page, per_page, total)
+
+
+# Endpoint to GET ALL service tickets
+@async_view('service_tickets_bp.get_service_tickets')
+async def get_service_tickets():
+    # Multi-gets by ids, archive pages, totals that aren't exact counts and invalid page numbers are answered by the sync view
+    if 'ids' in request.args or 'archived' in request.args:
+        return None
+    try:
+        if count_strategy('service_tickets_bp.get_service_tickets') != 'exact':
+            return None
+    except CountStrategyError:
+        return None
+    try:
+        page = int(request.args.get('page', '1'))
+        per_page = int(request.args.get('per_page', '10'))
+    except ValueError:
+        return None
+
+    try:
+        pagination = await async_db.run_sync(load_ticket_page, page, per_page)
+        if not pagination.items:
+            return jsonify({
+                            "current_page": page,
+                            "service_tickets": [],
+                            "has_next": False,
+                            "has_prev": False,
+                            "page": page,
+                            "per_page": per_page,
+                            "total": pagination.total,
+                            "total_pages": pagination.pages,
+                            "count": "exact",
+                            "error": "Page not found or exceeds total pages"
+                            }), 200
+
+        return jsonify({
+            "current_page": pagination.page,
+            "service_tickets": service_tickets_schema.dump(pagination.items),
+            "has_next": pagination.has_next,
+            "has_prev": pagination.has_prev,
+            "page": pagination.page,
+            "per_page": pagination.per_page,
+            "total": pagination.total,
+            "total_pages": pagination.pages,
+            "count": "exact"
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def load_my_tickets(session, token):
+    user, error = load_token_user(token, session=session)
+    if error:
+        return None, error
+    product_catalog.snapshot(session)
+    if isinstance(user, Customer):
+        where = ServiceTicket.customer_id == user.id
+    elif isinstance(user, Mechanic):
+        where = ServiceTicket.id.in_(select(ServiceMechanic.service_ticket_id).where(ServiceMechanic.mechanic_id == user.id))
+    else:
+        return user, None
+    return user, fetch_service_ticket_records(where=where, session=session)
+
+
+# Endpoint to GET ALL service tickets for the customer or mechanic of the token
+@async_view('service_tickets_bp.get_my_tickets')
+async def get_my_tickets():
+    # Missing or malformed Authorization headers get the sync view's 401
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        return None
+
+    try:
+        user, tickets = await async_db.run_sync(load_my_tickets, parts[1])
+        if user is None:
+            return jsonify({'error': tickets}), 401
+        if tickets is None:
+            return not_found("Unauthorized")
+        return jsonify(service_tickets_schema.dump(tickets)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def load_ticket(session, service_ticket_id):
+    product_catalog.snapshot(session)
+    tickets = fetch_service_ticket_records(where=ServiceTicket.id == service_ticket_id, session=session)
+    if tickets:
+        return tickets[0], False
+    return fetch_archived_ticket(service_ticket_id, session=session), True
+
+
+# Endpoint to GET a SPECIFIC service ticket by ID
+@async_view('service_tickets_bp.get_service_ticket')
+async def get_service_ticket(service_ticket_id):
+    try:
+        service_ticket, archived = await async_db.run_sync(load_ticket, service_ticket_id)
+        if not service_ticket:
+            return jsonify({"error": "Service ticket not found"}), 404
+        response = {
+            "message": "Service ticket retrieved successfully",
+            "service_ticket": service_ticket_schema.dump(service_ticket)
+        }
+        if archived:
+            response["archived"] = True
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,24 +1,39 @@
-from sqlalchemy import select
+from functools import partial
+from sqlalchemy import and_, distinct, select
 from app.blueprints.service_tickets import service_tickets_bp
 from app.blueprints.service_tickets.service_ticketsSchemas import service_tickets_schema, service_ticket_schema, update_service_ticket_schema
-from app.models import Admin, Customer, Mechanic, Product, ProductServiceTicket, db, ServiceTicket
+from app.models import Admin, Customer, Mechanic, Product, ProductServiceTicket, db, ServiceTicket, ServiceTicketArchive, ServiceTicketTombstone
 from app.blueprints.inventory.inventorySchemas import product_service_ticket_schema
-from flask import jsonify, request
+from flask import Response, jsonify, request, stream_with_context
 from marshmallow import ValidationError
 from app.extensions import limiter, cache
-from app.utils.util import encode_token, token_required, not_found
+from app.utils.util import encode_token, token_required, not_found, commit_keep_loaded
+from app.utils.stale_cache import stale_cached
+from app.utils.catalog import product_catalog
+from app.utils.deletes import delete_service_tickets
+from app.utils.counts import EXACT_STRATEGIES, CountStrategyError, count_strategy, list_total
+from app.utils.rows import paginate_records, fetch_service_ticket_records, service_ticket_embeds
+from app.utils.idempotency import idempotent
+from app.utils.batch import batch_response, invalidate_entities
+from app.utils.sync import SyncTokenError, parse_token, read_counters, sync_scope
+from app.utils.sse import StreamLimitError, event_stream, ticket_events
+from app.utils.archive import fetch_archived_ticket
 
 
 # ---------------------- Service Tickets Endpoints ---------------------
 # Endpoint to CREATE a new service ticket with validation error handling
 @service_tickets_bp.route('/', methods=['POST'], strict_slashes=False)
 @limiter.limit("10 per minute; 20 per hour; 100 per day")
+@idempotent  # Retries with the same Idempotency-Key header return the stored response
 def create_service_ticket():
     try:
         data = request.get_json()
         service_ticket = service_ticket_schema.load(data, session=db.session)
+        # A new ticket has no product links yet, setting the collection avoids a lazy load when dumping it
+        if 'product_links' not in data:
+            service_ticket.product_links = []
         db.session.add(service_ticket)
-        db.session.commit()
+        commit_keep_loaded()
         
         return jsonify({
             "message": "Service ticket created successfully",
@@ -38,6 +53,12 @@ def create_service_ticket():
 #@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
 def get_service_tickets():
     try:
+        # Multi-get by ids, e.g. ?ids=1,2,3, returned in request order with explicit misses
+        if 'ids' in request.args:
+            return batch_response("service_tickets", request.args['ids'], 'service_ticket',
+                                  lambda ids: fetch_service_ticket_records(where=ServiceTicket.id.in_(ids)),
+                                  service_ticket_schema.dump, service_ticket_embeds)
+        
         page_str = request.args.get('page', '1')
         per_page_str = request.args.get('per_page', '10')
         
@@ -55,18 +76,37 @@ def get_service_tickets():
                 "total_pages": 0,
                 "error": "Page not found or exceeds total pages"
             }), 200
+        
+        try:
+            strategy = count_strategy()
+        except CountStrategyError as err:
+            return jsonify({"error": str(err)}), 400
             
+        # Archived tickets are left out unless they are asked for with ?archived=true
+        archived = request.args.get('archived', 'false').lower() == 'true'
+        model = ServiceTicketArchive if archived else ServiceTicket
         # Using .order_by() to ensure consisten pagination
-        base_query = ServiceTicket.query.order_by(ServiceTicket.id)
-        # Getting total number of service tickets
-        total = base_query.count()
+        base_query = model.query.order_by(model.id)
+        # Getting total number of service tickets, counted, cached or estimated as the count strategy says, None for ?count=none
+        total, counted_by = list_total(model, strategy)
+        exact = counted_by in EXACT_STRATEGIES
         # Calculating total pages
-        total_pages = (total + per_page - 1) // per_page
+        total_pages = (total + per_page - 1) // per_page if total is not None else None
         
         print(f"[DEBUG] total: {total}, total_pages: {total_pages}, requested page: {page}") # Debugging line
         
-        # Checking if the requested page exceeds the total pages
-        if total == 0 or page > total_pages or page < 1:
+        # Checking if the requested page exceeds the total pages, only an exact total tells before the page is read
+        pagination = None
+        if page >= 1 and not (exact and (total == 0 or page > total_pages)):
+            # Paginating the query, reading lightweight records instead of ORM instances
+            if archived:
+                # The archive models have no relationships to dump, archived pages are always read as records
+                pagination = paginate_records(base_query, ServiceTicketArchive, page, per_page, total, exact=exact,
+                                              loader=partial(fetch_service_ticket_records, archived=True), orm=False)
+            else:
+                pagination = paginate_records(base_query, ServiceTicket, page, per_page, total, exact=exact,
+                                              loader=fetch_service_ticket_records)
+        if pagination is None or not pagination.items:
             return jsonify({
                             "current_page": page,
                             "service_tickets": [],
@@ -76,24 +116,24 @@ def get_service_tickets():
                             "per_page": per_page,
                             "total": total,
                             "total_pages": total_pages,
+                            "count": counted_by,
                             "error": "Page not found or exceeds total pages"
                             }), 200
         
-        # Paginating the query
-        pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
         service_tickets = pagination.items
         
         print(f"Requested page: {page}, total pages: {pagination.pages}") # Debugging line
 
         return jsonify({
             "current_page": pagination.page,
-            "service_tickets": [service_ticket_schema.dump(ticket) for ticket in service_tickets],
+            "service_tickets": service_tickets_schema.dump(service_tickets),
             "has_next": pagination.has_next,
             "has_prev": pagination.has_prev,
             "page": pagination.page,
             "per_page": pagination.per_page,
             "total": pagination.total,
-            "total_pages": pagination.pages
+            "total_pages": pagination.pages,
+            "count": counted_by
         }), 200  
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -123,14 +163,93 @@ def get_my_tickets(current_user):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Endpoint to GET the service tickets of the logged in customer or mechanic that changed since their last sync
+# Without ?since= every ticket is returned, clients send the sync_token of the response as ?since= next time
+@service_tickets_bp.route('/sync', methods=['GET'], strict_slashes=False)
+@token_required
+def sync_my_tickets(current_user):
+    try:
+        scope = sync_scope(current_user)
+        if scope is None:
+            return not_found("Unauthorized")
+        tickets_where, tombstones_where = scope
+        
+        try:
+            since = parse_token(request.args['since']) if 'since' in request.args else None
+        except SyncTokenError as err:
+            return jsonify({"error": str(err)}), 400
+        
+        # Read before the tickets, changes committed in between are sent again on the next sync
+        version, pruned_version = read_counters()
+        # Tokens older than the pruned tombstones or from another database can't be caught up
+        full_sync = since is None or since < pruned_version or since > version
+        deleted_ids = []
+        if full_sync:
+            service_tickets = fetch_service_ticket_records(where=tickets_where)
+        else:
+            service_tickets = fetch_service_ticket_records(where=and_(tickets_where, ServiceTicket.change_version > since))
+            changed_ids = {ticket.id for ticket in service_tickets}
+            # A ticket unassigned and assigned again since the token is in the changed tickets only
+            deleted_ids = sorted(set(db.session.execute(
+                select(distinct(ServiceTicketTombstone.service_ticket_id))
+                .where(tombstones_where, ServiceTicketTombstone.change_version > since)
+            ).scalars()) - changed_ids)
+        
+        return jsonify({
+            "service_tickets": service_tickets_schema.dump(service_tickets),
+            "deleted_ids": deleted_ids,
+            "sync_token": str(version),
+            "full_sync": full_sync
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Endpoint streaming the changes of the logged in customer's or mechanic's tickets as Server-Sent Events
+# Reconnecting clients send the id of the last event they got as the Last-Event-ID header (or ?last_event_id=)
+@service_tickets_bp.route('/stream', methods=['GET'], strict_slashes=False)
+@token_required
+def stream_my_tickets(current_user):
+    try:
+        if sync_scope(current_user) is None:
+            return not_found("Unauthorized")
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            try:
+                last_event_id = parse_token(last_event_id)
+            except SyncTokenError:
+                return jsonify({"error": "Last-Event-ID must be the id of an event of this stream"}), 400
+        
+        try:
+            subscription = ticket_events.subscribe((current_user.user_type, current_user.id))
+        except StreamLimitError:
+            return jsonify({"error": "Too many open streams, try again later"}), 503, {'Retry-After': '5'}
+        
+        response = Response(stream_with_context(event_stream(current_user, subscription, last_event_id)),
+                            mimetype='text/event-stream')
+        response.call_on_close(lambda: ticket_events.unsubscribe(subscription))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Endpoint to GET a SPECIFIC service ticket by ID with validation error handling
 @service_tickets_bp.route('/<int:service_ticket_id>', methods=['GET'], strict_slashes=False)
-@cache.cached(timeout=60)  # Cache the response for 60 seconds to avoid repeated database calls
+@stale_cached()  # Serve cached responses, refreshing stale ones in the background and on database errors
 def get_service_ticket(service_ticket_id):
     try:
         service_ticket = db.session.get(ServiceTicket,service_ticket_id)
         if not service_ticket:
-            return jsonify({"error": "Service ticket not found"}), 404
+            # Old tickets are moved to the archive, they are still readable
+            service_ticket = fetch_archived_ticket(service_ticket_id)
+            if not service_ticket:
+                return jsonify({"error": "Service ticket not found"}), 404
+            return jsonify({
+                "message": "Service ticket retrieved successfully",
+                "service_ticket": service_ticket_schema.dump(service_ticket),
+                "archived": True
+            }), 200
         return jsonify({
             "message": "Service ticket retrieved successfully",
             "service_ticket": service_ticket_schema.dump(service_ticket)
@@ -178,7 +297,8 @@ def update_service_ticket(service_ticket_id):
         if mechanic and mechanic in service_ticket.mechanics:
             service_ticket.mechanics.remove(mechanic)
 
-    db.session.commit()
+    commit_keep_loaded()
+    invalidate_entities('service_ticket', service_ticket_id)
     return jsonify({
         "message": "Service ticket updated successfully",
         "service_ticket": service_ticket_schema.dump(service_ticket)
@@ -188,6 +308,7 @@ def update_service_ticket(service_ticket_id):
 # Endpoint to Add a product to an existing service ticket with validation error handling
 @service_tickets_bp.route('/<int:service_ticket_id>/add_product', methods=['PUT'], strict_slashes=False)
 @limiter.limit("10 per minute; 20 per hour; 100 per day")
+@idempotent  # Retries with the same Idempotency-Key header return the stored response
 def add_product_to_service_ticket(service_ticket_id):
     try:
         # Get the data from the request body
@@ -204,7 +325,8 @@ def add_product_to_service_ticket(service_ticket_id):
         if not service_ticket:
             return jsonify({"error": "Service ticket not found"}), 404
 
-        product = Product.query.get(data['product_id'])
+        # Looking the product up in the in-memory catalog instead of the database
+        product = product_catalog.get(data['product_id'])
         if not product:
             return jsonify({"error": "Product item not found"}), 404
 
@@ -226,7 +348,8 @@ def add_product_to_service_ticket(service_ticket_id):
         
         # Add the new product service ticket to the database
         db.session.add(product_service_ticket)
-        db.session.commit()
+        commit_keep_loaded()
+        invalidate_entities('service_ticket', service_ticket.id)
         
         return jsonify({
             "message": "Product added successfully",
@@ -254,9 +377,10 @@ def delete_service_ticket(current_user, service_ticket_id):
     if not service_ticket:
         return jsonify({"error": "Service ticket not found"}), 404
     
-    # Delete the service ticket
-    db.session.delete(service_ticket)
+    # Delete the service ticket and its mechanic and product links using set-based deletes
+    delete_service_tickets(ServiceTicket.id == service_ticket_id)
     db.session.commit()
+    invalidate_entities('service_ticket', service_ticket_id)
     return jsonify({"message": f"Service ticket {service_ticket_id} deleted successfully"}), 200
 
 
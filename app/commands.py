@@ -0,0 +1,106 @@
+import click
+from flask.cli import ScriptInfo
+from app.models import db
+
+
+@click.command('db', add_help_option=False, context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+@click.pass_context
+def migrate_command(ctx):
+    """Perform database migrations."""
+    # Flask-Migrate pulls in Alembic, it is only imported when a migration command actually runs
+    from flask_migrate import Migrate
+    from flask_migrate.cli import db as db_cli_group
+    script_info = ctx.ensure_object(ScriptInfo)
+    Migrate(script_info.load_app(), db)
+    db_cli_group.main(args=ctx.args, prog_name=ctx.command_path, obj=script_info)
+
+
+@click.command('create-db')
+@click.pass_context
+def create_db_command(ctx):
+    """Create any missing tables."""
+    with ctx.ensure_object(ScriptInfo).load_app().app_context():
+        db.create_all()
+    click.echo("✅ Database tables created.")
+
+
+@click.command('reset-db')
+@click.confirmation_option(prompt="Drop every table and recreate them empty?")
+@click.pass_context
+def reset_db_command(ctx):
+    """Drop and recreate all tables."""
+    with ctx.ensure_object(ScriptInfo).load_app().app_context():
+        db.drop_all()
+        db.create_all()
+    click.echo("✅ Database reset: all tables recreated, no data.")
+
+
+@click.command('sync-replicas')
+@click.pass_context
+def sync_replicas_command(ctx):
+    """Copy the primary SQLite database over each SQLite replica, to try replica routing locally."""
+    from app.utils.replicas import REPLICA_BIND_PREFIX
+    with ctx.ensure_object(ScriptInfo).load_app().app_context():
+        primary = db.engine.url
+        replicas = {key: engine.url for key, engine in db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)}
+        if primary.get_backend_name() != 'sqlite':
+            raise click.ClickException("Only SQLite databases can be copied, real replicas are kept in sync by the database")
+        if not replicas:
+            raise click.ClickException("No replicas configured, set SQLALCHEMY_REPLICA_URIS or DB_REPLICA_URIS")
+        for key, url in replicas.items():
+            if url.get_backend_name() != 'sqlite':
+                click.echo(f"Skipping {key}, it is not a SQLite database")
+                continue
+            copy_sqlite_database(primary.database, url.database)
+            click.echo(f"✅ Copied {primary.database} to {key} ({url.database})")
+
+
+@click.command('run-worker')
+@click.option('--concurrency', type=int, default=None, help="Jobs run at the same time, defaults to JOB_WORKER_CONCURRENCY.")
+@click.option('--poll-interval', type=float, default=None, help="Seconds between polls of an empty queue, defaults to JOB_POLL_INTERVAL.")
+@click.option('--burst', is_flag=True, help="Exit once no job is due instead of waiting for new ones.")
+@click.pass_context
+def run_worker_command(ctx, concurrency, poll_interval, burst):
+    """Run queued background jobs."""
+    from app.utils.jobs import JobWorker
+    worker = JobWorker(ctx.ensure_object(ScriptInfo).load_app(), concurrency=concurrency, poll_interval=poll_interval)
+    click.echo(f"Worker {worker.worker_id} running jobs with {worker.concurrency} threads, Ctrl+C to stop")
+    processed = worker.run(burst=burst)
+    click.echo(f"✅ Worker stopped after {processed} jobs.")
+
+
+@click.command('archive-tickets')
+@click.option('--older-than-days', type=int, default=None, help="Archive tickets with an older service_date, defaults to ARCHIVE_AFTER_DAYS.")
+@click.option('--batch-size', type=int, default=None, help="Tickets moved per transaction, defaults to ARCHIVE_BATCH_SIZE.")
+@click.pass_context
+def archive_tickets_command(ctx, older_than_days, batch_size):
+    """Move old service tickets and their links to the archive tables."""
+    from app.utils.archive import archive_cutoff, archive_service_tickets
+    app = ctx.ensure_object(ScriptInfo).load_app()
+    with app.app_context():
+        older_than_days = older_than_days or app.config.get('ARCHIVE_AFTER_DAYS', 365)
+        batch_size = batch_size or app.config.get('ARCHIVE_BATCH_SIZE', 500)
+        cutoff = archive_cutoff(older_than_days)
+        archived = archive_service_tickets(cutoff, batch_size)
+        click.echo(f"✅ Archived {archived} service tickets with a service date before {cutoff:%Y-%m-%d}.")
+
+
+def copy_sqlite_database(source, target):
+    """Copy a SQLite database file with the backup API, consistent even while the source is in use."""
+    import sqlite3
+    source_conn = sqlite3.connect(source)
+    target_conn = sqlite3.connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        target_conn.close()
+        source_conn.close()
+
+
+def register_commands(app):
+    app.cli.add_command(create_db_command)
+    app.cli.add_command(reset_db_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(sync_replicas_command)
+    app.cli.add_command(run_worker_command)
+    app.cli.add_command(archive_tickets_command)
@@ -1,11 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index, LargeBinary
 from sqlalchemy.orm import relationship, declarative_base
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.replicas import RoutingSession
 
 Base = declarative_base()
-db = SQLAlchemy(model_class=Base)
+# RoutingSession sends the reads of GET requests to the read replicas when any are configured
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
 # Creating the database tables
 # Admin model
@@ -34,7 +36,7 @@ class Customer(Base):
     password_hash = Column(String(255), nullable=False)
     
     # Relationship with the ServiceTicket class
-    service_tickets = relationship('ServiceTicket', back_populates='customer', lazy=True)
+    service_tickets = relationship('ServiceTicket', back_populates='customer', lazy=True, passive_deletes=True)
     
     # Password Setter
     def set_password(self, password):
@@ -69,7 +71,7 @@ class Mechanic(Base):
     password_hash = Column(String(255), nullable=False)
     
     # Relationship with the ServiceTicket class
-    service_tickets = relationship('ServiceTicket', secondary='service_mechanics', back_populates='mechanics', lazy=True)
+    service_tickets = relationship('ServiceTicket', secondary='service_mechanics', back_populates='mechanics', lazy=True, passive_deletes=True)
     
     # Password Setter
     def set_password(self, password):
@@ -96,15 +98,18 @@ class Mechanic(Base):
 # This class represents the service_tickets table in the database
 class ServiceTicket(Base):
     __tablename__ = 'service_tickets'
+    # Ids of archived tickets must not be handed out again, SQLite reuses the highest id once its row is gone
+    __table_args__ = {'sqlite_autoincrement': True}
     id = Column(Integer, primary_key=True)
-    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
     vin = Column(String(17), nullable=False)
-    service_date = Column(DateTime, nullable=False, default=datetime.utcnow)
+    service_date = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)  # Tickets before the archive cutoff are moved to service_tickets_archive
     service_desc = Column(String(200), nullable=False)
+    change_version = Column(Integer, nullable=False, default=0, index=True)  # Sync version of the last change to the ticket, its mechanics or products
     
     # Relationship with the Customer class and Mechanic class
     customer = relationship('Customer', back_populates='service_tickets', lazy=True)
-    mechanics = relationship('Mechanic', secondary='service_mechanics', back_populates='service_tickets', lazy=True)
+    mechanics = relationship('Mechanic', secondary='service_mechanics', back_populates='service_tickets', lazy=True, passive_deletes=True)
     
     # Relationship with the Product class as many-to-many where one service ticket can have many products and one product can belong to many service tickets
     products = relationship(
@@ -119,15 +124,16 @@ class ServiceTicket(Base):
     product_links = relationship(
         'ProductServiceTicket',
         back_populates='service_ticket',
-        lazy=True
+        lazy=True,
+        passive_deletes=True
         )
     
 # Service_Mechanics class
 # This class represents the service_mechanics table in the database as a many-to-many relationship
 class ServiceMechanic(Base):
     __tablename__ = 'service_mechanics'
-    service_ticket_id = Column(Integer, ForeignKey('service_tickets.id'), primary_key=True)
-    mechanic_id = Column(Integer, ForeignKey('mechanics.id'), primary_key=True)
+    service_ticket_id = Column(Integer, ForeignKey('service_tickets.id', ondelete='CASCADE'), primary_key=True)
+    mechanic_id = Column(Integer, ForeignKey('mechanics.id', ondelete='CASCADE'), primary_key=True)
     
 
 # Product class
@@ -150,9 +156,10 @@ class Product(Base):
 # This class represents the Product_service_tickets table in the database as a many-to-many relationship
 class ProductServiceTicket(Base):
     __tablename__ = 'inventory_service_tickets'
+    __table_args__ = {'sqlite_autoincrement': True}  # Archived link ids are kept, like the tickets'
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey('inventory.id'), nullable=False)
-    service_ticket_id = Column(Integer, ForeignKey('service_tickets.id'), nullable=False)
+    service_ticket_id = Column(Integer, ForeignKey('service_tickets.id', ondelete='CASCADE'), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)  # Quantity of the inventory item used in the service ticket
 
     # Relationship with the Product class and ServiceTicket class
@@ -167,3 +174,102 @@ class ProductServiceTicket(Base):
         back_populates='product_links', 
         lazy=True,
         overlaps='products')
+
+
+# Job class
+# This class represents the jobs table, the queue of background jobs run by `flask run-worker`
+class Job(Base):
+    __tablename__ = 'jobs'
+    # Workers look for the oldest queued job that is due
+    __table_args__ = (Index('ix_jobs_status_run_at', 'status', 'run_at'),)
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)  # Task name registered with @job_task
+    payload = Column(Text, nullable=False, default='{}')  # JSON arguments of the task
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not picked up before this time, pushed back on retries
+    locked_by = Column(String(100))  # Worker running the job
+    locked_at = Column(DateTime)
+    result = Column(Text)  # JSON result of a succeeded job
+    error = Column(Text)  # Error of the last failed attempt
+    created_by = Column(String(50))  # user_type:id of the user who queued it
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+
+# OutboxEvent class
+# This class represents the outbox_events table, the change feed of service tickets written in the same transaction as the change
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+    id = Column(Integer, primary_key=True)  # Sequence number consumers resume after
+    event_type = Column(String(50), nullable=False)  # e.g. service_ticket.updated, service_ticket.mechanic_assigned
+    aggregate_type = Column(String(30), nullable=False)  # Entity the event is about, service_ticket
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(Text)  # JSON details of the change, NULL for deletes
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# SyncCounter class
+# This class represents the sync_counters table, named counters behind the ?since= sync tokens and the product catalog version
+class SyncCounter(Base):
+    __tablename__ = 'sync_counters'
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+# IdempotencyKey class
+# This class represents the idempotency_keys table, the responses stored under Idempotency-Key headers, see app/utils/idempotency.py
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+    key = Column(String(64), primary_key=True)  # SHA-256 of the client, endpoint, path and header value
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the request body
+    status = Column(Integer)  # NULL while the first request is still running
+    body = Column(LargeBinary)
+    mimetype = Column(String(100))
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# ServiceTicketTombstone class
+# This class represents the service_ticket_tombstones table, tickets that left a user's sync set by deletion or unassignment
+class ServiceTicketTombstone(Base):
+    __tablename__ = 'service_ticket_tombstones'
+    # Syncs read the tombstones of one customer or mechanic after a version
+    __table_args__ = (
+        Index('ix_service_ticket_tombstones_customer_version', 'customer_id', 'change_version'),
+        Index('ix_service_ticket_tombstones_mechanic_version', 'mechanic_id', 'change_version'),
+    )
+    id = Column(Integer, primary_key=True)
+    service_ticket_id = Column(Integer, nullable=False)  # No foreign key, the ticket is usually gone
+    customer_id = Column(Integer)  # Set when the ticket was deleted, for its customer
+    mechanic_id = Column(Integer)  # Set for each mechanic the ticket was deleted or unassigned from
+    change_version = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Archive classes
+# These classes represent the archive tables old service tickets are moved to with their links, see app/utils/archive.py.
+# They have no foreign keys: archived tickets outlive deleted products, and the tables can be partitioned by date.
+class ServiceTicketArchive(Base):
+    __tablename__ = 'service_tickets_archive'
+    id = Column(Integer, primary_key=True, autoincrement=False)  # The id the ticket had in service_tickets
+    customer_id = Column(Integer, nullable=False, index=True)
+    vin = Column(String(17), nullable=False)
+    service_date = Column(DateTime, nullable=False)
+    service_desc = Column(String(200), nullable=False)
+    change_version = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ServiceMechanicArchive(Base):
+    __tablename__ = 'service_mechanics_archive'
+    service_ticket_id = Column(Integer, primary_key=True)
+    mechanic_id = Column(Integer, primary_key=True, index=True)
+
+
+class ProductServiceTicketArchive(Base):
+    __tablename__ = 'inventory_service_tickets_archive'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    product_id = Column(Integer, nullable=False)
+    service_ticket_id = Column(Integer, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=1)
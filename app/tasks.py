@@ -0,0 +1,42 @@
+from flask import current_app
+from app.models import db
+from app.utils.jobs import job_task
+from app.utils.deletes import delete_customer_cascade
+from app.utils.batch import bump_generations, invalidate_entities
+from app.utils.sync import prune_tombstones
+from app.utils.archive import archive_cutoff, archive_service_tickets
+from app.utils.idempotency import prune_idempotency_keys
+
+# ---------------- Background Job Tasks --------------------
+# Work the `flask run-worker` process runs off the request path, queued with app.utils.jobs.enqueue.
+# Bulk imports, exports and reports belong here too once the API has them.
+
+# Delete a customer and every service ticket of theirs, queued by DELETE /customers/<id> with Prefer: respond-async
+@job_task('customers.delete')
+def delete_customer_task(customer_id):
+    deleted_tickets = delete_customer_cascade(customer_id)
+    db.session.commit()
+    invalidate_entities('customer', customer_id)
+    bump_generations('customer', customer_id)
+    return {"customer_id": customer_id, "deleted_service_tickets": deleted_tickets}
+
+
+# Delete old delta sync tombstones, clients with a token from before them get a full sync
+@job_task('sync.prune_tombstones')
+def prune_sync_tombstones_task(retention_days=None):
+    retention_days = retention_days or current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+    return {"deleted_tombstones": prune_tombstones(retention_days)}
+
+
+# Delete the Idempotency-Key responses past IDEMPOTENCY_TTL, queue it daily
+@job_task('idempotency.prune_keys')
+def prune_idempotency_keys_task():
+    return {"deleted_idempotency_keys": prune_idempotency_keys()}
+
+
+# Move service tickets older than ARCHIVE_AFTER_DAYS to the archive tables, queue it daily or run `flask archive-tickets`
+@job_task('service_tickets.archive')
+def archive_service_tickets_task(older_than_days=None, batch_size=None):
+    older_than_days = older_than_days or current_app.config.get('ARCHIVE_AFTER_DAYS', 365)
+    batch_size = batch_size or current_app.config.get('ARCHIVE_BATCH_SIZE', 500)
+    return {"archived_service_tickets": archive_service_tickets(archive_cutoff(older_than_days), batch_size)}
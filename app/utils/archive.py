@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, insert, literal, select
+from app.models import (db, ServiceTicket, ServiceMechanic, ProductServiceTicket,
+                        ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive)
+from app.utils.deletes import delete_ticket_rows
+from app.utils.outbox import record_ticket_events
+from app.utils.rows import fetch_service_ticket_records
+from app.utils.sync import record_deleted_tickets
+
+# Archival of old service tickets. Tickets whose service_date is before the cutoff move with their
+# mechanic assignments and product links to the *_archive tables, so the live tables and every list,
+# count and join on them only hold recent tickets. GET /service_tickets/<id> still finds archived
+# tickets, lists only read the archive with ?archived=true. For delta sync clients an archived ticket
+# leaves their set like a deleted one, its outbox event is service_ticket.archived.
+# Archived tickets keep their ids, so the live tables must never hand them out again: SQLite tables are
+# AUTOINCREMENT, MySQL before 8.0 (and MariaDB before 10.2.4) recomputes AUTO_INCREMENT from max(id) on a
+# restart and isn't supported.
+MYSQL_PERSISTENT_AUTO_INCREMENT = (8, 0)
+MARIADB_PERSISTENT_AUTO_INCREMENT = (10, 2, 4)
+
+
+def archive_cutoff(days):
+    """The service_date before which tickets are archived, days ago."""
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def archive_service_tickets(before, batch_size):
+    """Move the service tickets with a service_date before `before` to the archive, batch_size tickets per transaction.
+
+    Each batch copies the tickets and their links with one INSERT ... SELECT per table and deletes them
+    from the live tables, so the live tables stay usable while a large backlog is archived.
+    Returns the number of tickets archived.
+    """
+    check_auto_increment_persists()
+    archived = 0
+    while True:
+        # Locked until the batch commits, a concurrent update of an old ticket can't be lost between the copy and the delete
+        ticket_ids = db.session.execute(
+            select(ServiceTicket.id).where(ServiceTicket.service_date < before)
+            .order_by(ServiceTicket.id).limit(batch_size).with_for_update()
+        ).scalars().all()
+        if not ticket_ids:
+            return archived
+        archive_tickets(ServiceTicket.id.in_(ticket_ids))
+        db.session.commit()
+        archived += len(ticket_ids)
+
+
+def check_auto_increment_persists():
+    """Raise a RuntimeError on MySQL and MariaDB versions that would reuse the ids of archived tickets after a restart."""
+    dialect = db.session.get_bind(mapper=ServiceTicket).dialect
+    if dialect.name != 'mysql':
+        return
+    version = tuple(dialect.server_version_info or ())
+    required = MARIADB_PERSISTENT_AUTO_INCREMENT if dialect.is_mariadb else MYSQL_PERSISTENT_AUTO_INCREMENT
+    if version < required:
+        server = 'MariaDB' if dialect.is_mariadb else 'MySQL'
+        raise RuntimeError(f"Archiving needs {server} {'.'.join(map(str, required))} or later, older versions reset "
+                           "AUTO_INCREMENT on a restart and would give new tickets the ids of archived ones")
+
+
+def archive_tickets(where):
+    """Copy the tickets matching where and their links to the archive tables and delete them from the live ones."""
+    record_ticket_events('service_ticket.archived', select(ServiceTicket.id).where(where))
+    record_deleted_tickets(where)
+    ticket_ids = select(ServiceTicket.id).where(where).scalar_subquery()
+    ticket_columns = ['id', 'customer_id', 'vin', 'service_date', 'service_desc', 'change_version']
+    db.session.execute(insert(ServiceTicketArchive).from_select(
+        ticket_columns + ['archived_at'],
+        select(*[ServiceTicket.__table__.c[name] for name in ticket_columns], literal(datetime.utcnow(), DateTime)).where(where)
+    ))
+    db.session.execute(insert(ServiceMechanicArchive).from_select(
+        ['service_ticket_id', 'mechanic_id'],
+        select(ServiceMechanic.service_ticket_id, ServiceMechanic.mechanic_id).where(ServiceMechanic.service_ticket_id.in_(ticket_ids))
+    ))
+    db.session.execute(insert(ProductServiceTicketArchive).from_select(
+        ['id', 'product_id', 'service_ticket_id', 'quantity'],
+        select(ProductServiceTicket.id, ProductServiceTicket.product_id, ProductServiceTicket.service_ticket_id,
+               ProductServiceTicket.quantity).where(ProductServiceTicket.service_ticket_id.in_(ticket_ids))
+    ))
+    return delete_ticket_rows(where)
+
+
+def fetch_archived_ticket(service_ticket_id, session=None):
+    """An archived service ticket as a record with its customer, mechanics and product links, None if it isn't archived."""
+    tickets = fetch_service_ticket_records(where=ServiceTicketArchive.id == service_ticket_id, session=session, archived=True)
+    return tickets[0] if tickets else None
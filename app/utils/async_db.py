@@ -0,0 +1,96 @@
+from flask import current_app
+from app.models import db
+
+# Async driver used for each database backend when ASYNC_DATABASE_URI isn't set
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+aiomysql',
+    'mariadb': 'mariadb+aiomysql',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# Async views by the endpoint name of the sync view they replace, filled by @async_view
+async_views = {}
+
+
+def async_view(endpoint):
+    """Register an async implementation of a read endpoint, served by the ASGI app in app/asgi.py.
+
+    The view runs inside a Flask request context, so request.args, jsonify and the schemas work as in the
+    sync view, and receives the same URL arguments. Returning None hands the request to the sync view.
+    """
+    def decorator(f):
+        async_views[endpoint] = f
+        return f
+    return decorator
+
+
+def async_database_url(url):
+    """The URL of the sync engine with its driver swapped for the async driver of the same backend."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}, set ASYNC_DATABASE_URI")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """Async engine and session factory for the async views, on the same database as db.engine.
+
+    The engine is created on first use so the sync app never imports the async drivers. Views run their
+    queries with run_sync(), which hands the existing sync loaders (fetch_records, the catalog, ...) a
+    Session whose I/O is awaited on the event loop instead of blocking a thread.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['async_db'] = {'engine': None, 'sessionmaker': None}
+
+    def url(self, app):
+        """The URL of the async engine, ASYNC_DATABASE_URI or the sync engine's URL with the async driver."""
+        from sqlalchemy.engine import make_url
+        url = app.config.get('ASYNC_DATABASE_URI')
+        if url is None:
+            with app.app_context():
+                url = async_database_url(db.engine.url)
+        return make_url(url)
+
+    def driver_installed(self, app):
+        """Whether the async driver of the database can be imported."""
+        try:
+            self.url(app).get_dialect().import_dbapi()
+        except (ImportError, ValueError):
+            return False
+        return True
+
+    def engine(self, app):
+        state = app.extensions['async_db']
+        if state['engine'] is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+            url = self.url(app)
+            options = {}
+            # aiosqlite opens a connection per session (NullPool), the server databases get a sized pool
+            if url.get_backend_name() != 'sqlite':
+                options['pool_size'] = app.config.get('ASYNC_DB_POOL_SIZE', 20)
+                options['max_overflow'] = app.config.get('ASYNC_DB_MAX_OVERFLOW', 20)
+            state['engine'] = create_async_engine(url, **options)
+            state['sessionmaker'] = async_sessionmaker(state['engine'], expire_on_commit=False)
+        return state['engine']
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """Call fn(session, *args, **kwargs) with the sync facade of a new AsyncSession and return its result."""
+        app = current_app._get_current_object()
+        self.engine(app)
+        async with app.extensions['async_db']['sessionmaker']() as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    async def dispose(self, app):
+        engine = app.extensions['async_db']['engine']
+        if engine is not None:
+            await engine.dispose()
+            app.extensions['async_db'] = {'engine': None, 'sessionmaker': None}
+
+
+async_db = AsyncDatabase()
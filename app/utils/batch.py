@@ -0,0 +1,108 @@
+import uuid
+from flask import current_app, jsonify
+from app.extensions import cache
+
+
+def entity_cache_key(prefix, entity_id):
+    """Build the per-id cache key of a serialized entity, e.g. service_ticket/42."""
+    return f"{prefix}/{entity_id}"
+
+
+def invalidate_entities(prefix, *entity_ids):
+    """Drop cached serialized entities after they were changed or deleted."""
+    if entity_ids:
+        cache.delete_many(*[entity_cache_key(prefix, entity_id) for entity_id in entity_ids])
+
+
+def generation_key(prefix, entity_id):
+    """Cache key of the generation of an entity embedded in other cached entities, e.g. generation/customer/7."""
+    return f"generation/{prefix}/{entity_id}"
+
+
+def bump_generations(prefix, *entity_ids):
+    """Invalidate every cached entity that embeds these entities, e.g. the tickets of a renamed customer.
+
+    Each cached entry holds the generations of the entities it embeds, a new generation makes it a miss.
+    One cache write per entity however many entries embed it. Generations are random so one that expired
+    never matches an entry again, and they only need to outlive the entries cached before the bump.
+    """
+    if entity_ids:
+        cache.set_many({generation_key(prefix, entity_id): uuid.uuid4().hex for entity_id in entity_ids},
+                       timeout=current_app.config.get('BATCH_CACHE_TIMEOUT', 60))
+
+
+def parse_ids(raw_ids):
+    """Parse a comma separated ?ids= value into a list of integers, raising ValueError if it is invalid."""
+    ids = [int(part) for part in raw_ids.split(',') if part.strip()]
+    if not ids:
+        raise ValueError("No ids provided")
+    max_ids = current_app.config.get('BATCH_MAX_IDS', 100)
+    if len(ids) > max_ids:
+        raise ValueError(f"At most {max_ids} ids can be requested at once")
+    return ids
+
+
+def fetch_many(ids, prefix, load, dump, embeds=None):
+    """Return serialized entities for the ids in request order, with None for ids that don't exist.
+
+    The per-id cache is checked first, then every miss is loaded with a single call to load(ids) and
+    cached for BATCH_CACHE_TIMEOUT seconds. A prefix of None skips the cache entirely, for entities that
+    are already held in memory. embeds(entity) lists the (prefix, id) of the entities a serialized entity
+    embeds, its cached entry is only served while their generations are unchanged, see bump_generations.
+    Returns the results and the list of ids that were not found.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    found = {}
+    if prefix is not None:
+        cached = cache.get_many(*[entity_cache_key(prefix, entity_id) for entity_id in unique_ids])
+        found = {entity_id: value for entity_id, value in zip(unique_ids, cached) if value is not None}
+        if embeds is not None:
+            found = _current_entries(found)
+
+    to_load = [entity_id for entity_id in unique_ids if entity_id not in found]
+    if to_load:
+        entities = load(to_load)
+        loaded = {entity.id: dump(entity) for entity in entities}
+        if loaded and prefix is not None:
+            entries = loaded
+            if embeds is not None:
+                entries = _generation_entries(entities, loaded, embeds)
+            cache.set_many({entity_cache_key(prefix, entity_id): value for entity_id, value in entries.items()},
+                           timeout=current_app.config.get('BATCH_CACHE_TIMEOUT', 60))
+        found.update(loaded)
+
+    missing = [entity_id for entity_id in unique_ids if entity_id not in found]
+    return [found.get(entity_id) for entity_id in ids], missing
+
+
+def _current_entries(entries):
+    # The values of the entries whose embedded entities kept their generation, with one get_many for all of them
+    keys = list(dict.fromkeys(key for entry in entries.values() for key in entry['generations']))
+    generations = dict(zip(keys, cache.get_many(*keys))) if keys else {}
+    return {entity_id: entry['value'] for entity_id, entry in entries.items()
+            if all(generations[key] == generation for key, generation in entry['generations'].items())}
+
+
+def _generation_entries(entities, loaded, embeds):
+    # Cached entries with the current generation of every entity they embed
+    keys_by_id = {entity.id: [generation_key(prefix, embedded_id) for prefix, embedded_id in embeds(entity)]
+                  for entity in entities}
+    keys = list(dict.fromkeys(key for entity_keys in keys_by_id.values() for key in entity_keys))
+    generations = dict(zip(keys, cache.get_many(*keys))) if keys else {}
+    return {entity_id: {'value': value, 'generations': {key: generations[key] for key in keys_by_id[entity_id]}}
+            for entity_id, value in loaded.items()}
+
+
+def batch_response(name, raw_ids, prefix, load, dump, embeds=None):
+    """Build the response of a ?ids=1,2,3 multi-get on a list endpoint."""
+    try:
+        ids = parse_ids(raw_ids)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid ids: {e}"}), 400
+
+    results, missing = fetch_many(ids, prefix, load, dump, embeds)
+    return jsonify({
+        name: results,
+        "ids": ids,
+        "missing": missing
+    }), 200
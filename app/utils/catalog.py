@@ -0,0 +1,161 @@
+import threading
+import time
+from array import array
+from sqlalchemy import event, select
+from flask import current_app, has_app_context
+from app.models import db, Product, SyncCounter
+from app.utils.sync import bump_counter
+
+
+class CatalogProduct:
+    """Read-only product record handed out by the catalog, dumps with ProductSchema like a Product."""
+    __slots__ = ('id', 'name', 'price')
+
+    def __init__(self, id, name, price):
+        self.id = id
+        self.name = name
+        self.price = price
+
+    def __repr__(self):
+        return f"<CatalogProduct {self.id} {self.name!r}>"
+
+
+class CatalogSnapshot:
+    """Immutable copy of the inventory table stored in compact parallel arrays keyed by product id."""
+    __slots__ = ('version', 'ids', 'names', 'prices', '_positions')
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.ids = array('q', (row.id for row in rows))
+        self.names = tuple(row.name for row in rows)
+        self.prices = array('d', (row.price for row in rows))
+        self._positions = {product_id: position for position, product_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return product_id in self._positions
+
+    def _record(self, position):
+        return CatalogProduct(self.ids[position], self.names[position], self.prices[position])
+
+    def get(self, product_id):
+        """Return the product with the given id, or None if it is not in the catalog."""
+        position = self._positions.get(product_id)
+        if position is None:
+            return None
+        return self._record(position)
+
+    def price(self, product_id):
+        """Return the price of a product without building a record, or None if it does not exist."""
+        position = self._positions.get(product_id)
+        return None if position is None else self.prices[position]
+
+    def page(self, page, per_page):
+        """Return the products on a 1-based page, ordered by id."""
+        start = (page - 1) * per_page
+        return [self._record(position) for position in range(start, min(start + per_page, len(self.ids)))]
+
+
+class _CatalogState:
+    def __init__(self):
+        self.local_version = 0
+        self.shared_version = None  # Last value read from the catalog counter row
+        self.checked_at = None  # time.monotonic() of that read
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+
+class ProductCatalog:
+    """In-process snapshot of the inventory table, reloaded only when the catalog version changes.
+
+    The version is bumped whenever a session flushes, commits or rolls back a change to a Product. The
+    local part reloads the writing process at once, the transaction also bumps the product_catalog row of
+    sync_counters, which every process reads at most every CATALOG_VERSION_CHECK_INTERVAL seconds, so the
+    other workers reload within that interval.
+    """
+    COUNTER = 'product_catalog'
+    _events_registered = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['product_catalog'] = _CatalogState()
+        if not ProductCatalog._events_registered:
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'after_commit', _after_transaction_end)
+            event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
+            ProductCatalog._events_registered = True
+
+    @property
+    def _state(self):
+        return current_app.extensions['product_catalog']
+
+    def _version(self, session):
+        state = self._state
+        interval = current_app.config.get('CATALOG_VERSION_CHECK_INTERVAL')
+        now = time.monotonic()
+        if interval is not None and (state.checked_at is None or now - state.checked_at >= interval):
+            state.shared_version = session.execute(select(SyncCounter.value).where(SyncCounter.name == self.COUNTER)).scalar()
+            state.checked_at = now
+        return (state.local_version, state.shared_version)
+
+    def bump_version(self):
+        """Mark the catalog as changed in this process so the next read reloads it."""
+        self._state.local_version += 1
+
+    def snapshot(self, session=None):
+        """Return the current snapshot, loading it from the database only if the version changed.
+
+        session defaults to db.session, the async views pass the sync facade of their AsyncSession.
+        """
+        state = self._state
+        version = self._version(session or db.session)
+        snapshot = state.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        if session is not None:
+            # Async views hold no lock across the awaited query, waiting on it would block the event loop
+            rows = session.execute(select(Product.id, Product.name, Product.price).order_by(Product.id)).all()
+            state.snapshot = CatalogSnapshot(version, rows)
+            return state.snapshot
+        with state.lock:
+            if state.snapshot is None or state.snapshot.version != version:
+                rows = db.session.execute(select(Product.id, Product.name, Product.price).order_by(Product.id)).all()
+                state.snapshot = CatalogSnapshot(version, rows)
+            return state.snapshot
+
+    def get(self, product_id):
+        """Return a product from the catalog, or None if it does not exist."""
+        return self.snapshot().get(product_id)
+
+    def price(self, product_id):
+        """Return the price of a product from the catalog, or None if it does not exist."""
+        return self.snapshot().price(product_id)
+
+
+# Session hooks that keep the catalog version in step with writes to the inventory table
+def _after_flush(session, flush_context):
+    changed = (session.new | session.dirty | session.deleted)
+    if any(isinstance(obj, Product) for obj in changed):
+        if not session.info.get('product_catalog_changed'):
+            # Once per transaction, the other processes reload when they next read the counter
+            bump_counter(session.connection(), ProductCatalog.COUNTER)
+        session.info['product_catalog_changed'] = True
+        if has_app_context():
+            product_catalog.bump_version()
+
+
+def _after_transaction_end(session):
+    if session.info.pop('product_catalog_changed', False) and has_app_context():
+        product_catalog.bump_version()
+
+
+def _after_soft_rollback(session, previous_transaction):
+    _after_transaction_end(session)
+
+
+product_catalog = ProductCatalog()
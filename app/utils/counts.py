@@ -0,0 +1,158 @@
+from cachelib import NullCache, SimpleCache
+from flask import current_app, has_app_context, request
+from sqlalchemy import event, func, select, text
+from sqlalchemy.exc import DBAPIError
+from app.extensions import cache
+from app.models import db
+
+# Totals of the paginated list envelopes. COUNT(*) scans a whole index on InnoDB, so each list endpoint
+# picks how its total is computed, with LIST_COUNT_STRATEGIES per endpoint, LIST_COUNT_STRATEGY for the
+# rest, or ?count= per request:
+#   exact     COUNT(*) on every request
+#   cached    COUNT(*) cached for LIST_COUNT_CACHE_TTL seconds, dropped when a commit of the same process inserts or
+#             deletes rows of the table, other workers serve their total until it expires
+#   estimate  the row count of the table statistics, cached when the database has none
+#   none      no total, has_next is found by reading one row past the page
+COUNT_STRATEGIES = ('exact', 'cached', 'estimate', 'none')
+EXACT_STRATEGIES = ('exact',)  # Strategies whose total can be used to reject pages past the end, a cached one may be behind
+COUNT_TABLES_KEY = 'count_tables_written'  # session.info key of the tables whose cached totals the transaction invalidates
+
+
+class CountStrategyError(ValueError):
+    """The ?count= value isn't a count strategy."""
+
+
+def count_strategy(endpoint=None):
+    """The count strategy of the current list request, raising CountStrategyError for an unknown ?count=."""
+    strategy = request.args.get('count')
+    if strategy is None:
+        strategies = current_app.config.get('LIST_COUNT_STRATEGIES') or {}
+        strategy = strategies.get(endpoint or request.endpoint, current_app.config.get('LIST_COUNT_STRATEGY', 'exact'))
+    if strategy not in COUNT_STRATEGIES:
+        raise CountStrategyError(f"count must be one of {', '.join(COUNT_STRATEGIES)}")
+    return strategy
+
+
+def count_store():
+    """The cache of the totals: the app cache, or an in-process TTL cache when caching is disabled."""
+    store = current_app.extensions.get('count_store')
+    if store is None:
+        backend = cache.cache
+        if isinstance(backend, NullCache):
+            backend = SimpleCache(default_timeout=current_app.config.get('LIST_COUNT_CACHE_TTL', 30))
+        store = current_app.extensions['count_store'] = backend
+    return store
+
+
+def _count_key(table_name):
+    return f"list_count/{table_name}"
+
+
+def list_total(model, strategy, session=None):
+    """(total, strategy used) of the rows of a model's table.
+
+    The total is None for 'none'. An 'estimate' on a database without table statistics is served as
+    'cached' instead, the strategy used tells the client whether the total is exact.
+    """
+    session = session or db.session
+    if strategy == 'none':
+        return None, strategy
+    if strategy == 'estimate':
+        total = estimated_count(model, session)
+        if total is not None:
+            return total, strategy
+        strategy = 'cached'
+    if strategy == 'cached':
+        store = count_store()
+        key = _count_key(model.__tablename__)
+        total = store.get(key)
+        if total is None:
+            total = _exact_count(model, session)
+            store.set(key, total, timeout=current_app.config.get('LIST_COUNT_CACHE_TTL', 30))
+        return total, strategy
+    return _exact_count(model, session), strategy
+
+
+def _exact_count(model, session):
+    return session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def estimated_count(model, session):
+    """The row count the database keeps in its table statistics, None if it has none for the table."""
+    connection = session.connection()
+    table_name = model.__tablename__
+    dialect = connection.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        # InnoDB's estimate, refreshed by the database as the table changes and by ANALYZE TABLE
+        rows = connection.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {'table': table_name}).scalar()
+    elif dialect == 'postgresql':
+        # -1 until the table was first vacuumed or analyzed
+        rows = connection.execute(text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"),
+                                  {'table': table_name}).scalar()
+    elif dialect == 'sqlite':
+        # sqlite_stat1 only exists once ANALYZE ran, the first number of a row is the table's row count
+        try:
+            stat = connection.execute(text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"),
+                                      {'table': table_name}).scalar()
+        except DBAPIError:
+            return None
+        rows = int(stat.split()[0]) if stat else None
+    else:
+        return None
+    return int(rows) if rows is not None and rows >= 0 else None
+
+
+class RowCountInvalidator:
+    """Drops the cached totals of the tables a transaction inserted into or deleted from, once it commits.
+
+    Flushed objects and set-based INSERT and DELETE statements run through the session are both seen.
+    Updates don't change totals and are ignored.
+    """
+    _events_registered = False
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not RowCountInvalidator._events_registered:
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
+            RowCountInvalidator._events_registered = True
+
+
+def _written_tables(session):
+    return session.info.setdefault(COUNT_TABLES_KEY, set())
+
+
+def _after_flush(session, flush_context):
+    written = {obj.__table__.name for obj in session.new | session.deleted if hasattr(obj, '__table__')}
+    if written:
+        _written_tables(session).update(written)
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+
+
+def _after_commit(session):
+    written = session.info.pop(COUNT_TABLES_KEY, None)
+    if written and has_app_context():
+        store = count_store()
+        # One by one, delete_many of the Flask-Caching backends stops at the first key that isn't cached
+        for table_name in written:
+            store.delete(_count_key(table_name))
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop(COUNT_TABLES_KEY, None)
+
+
+row_count_invalidator = RowCountInvalidator()
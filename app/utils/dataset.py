@@ -0,0 +1,184 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from werkzeug.security import generate_password_hash
+from app.models import db, Customer, Mechanic, Product, ServiceTicket, ServiceMechanic, ProductServiceTicket
+
+# Synthetic, referentially consistent data for benchmarks and capacity planning. Rows get explicit ids
+# 1..n so every foreign key is known up front without reading anything back, and each table draws from
+# its own seeded generator so the same seed always produces the same data for every table.
+
+SCALES = {
+    # name: (customers, mechanics, products, tickets)
+    'small': (200, 20, 100, 2000),
+    'medium': (5000, 100, 1000, 100000),
+    'production': (50000, 500, 10000, 1000000),
+}
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Maria']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin']
+SERVICES = ['Oil change', 'Brake pad replacement', 'Tire rotation', 'Battery replacement', 'Engine diagnostics',
+            'Transmission flush', 'Coolant flush', 'Wheel alignment', 'Air filter replacement', 'Spark plug replacement',
+            'Timing belt replacement', 'AC recharge', 'Suspension repair', 'Exhaust repair', 'State inspection']
+PARTS = ['Oil filter', 'Brake pads', 'Brake rotor', 'Air filter', 'Cabin filter', 'Spark plug', 'Battery', 'Wiper blade',
+         'Serpentine belt', 'Timing belt', 'Coolant', 'Motor oil 5qt', 'Headlight bulb', 'Tire', 'Shock absorber']
+VIN_CHARACTERS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'  # VINs never use I, O or Q
+
+MECHANICS_PER_TICKET = ([1, 2, 3], [60, 30, 10])
+PARTS_PER_TICKET = ([0, 1, 2, 3, 4, 5], [20, 30, 25, 15, 7, 3])
+
+
+class DatasetSpec:
+    """How much data to generate and how it is shaped."""
+
+    def __init__(self, customers=200, mechanics=20, products=100, tickets=2000, seed=42, chunk_size=5000,
+                 email_domain='example.com', password='password123', days=730, skew=1.1):
+        self.customers = customers
+        self.mechanics = mechanics
+        self.products = products
+        self.tickets = tickets
+        self.seed = seed
+        self.chunk_size = chunk_size  # Rows per INSERT statement and transaction
+        self.email_domain = email_domain
+        self.password = password  # Shared by every generated account, hashing is deliberately slow
+        self.days = days  # Tickets are spread over this many days before now
+        self.skew = skew  # Zipf exponent: a few customers, mechanics and products account for most tickets
+
+    @classmethod
+    def from_scale(cls, scale, **overrides):
+        customers, mechanics, products, tickets = SCALES[scale]
+        values = dict(customers=customers, mechanics=mechanics, products=products, tickets=tickets)
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**values)
+
+
+def zipf_cum_weights(n, skew):
+    """Cumulative weights of a Zipf distribution over ranks 1..n, for random.choices(cum_weights=...)."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+
+def _shuffled_ids(rng, n):
+    # Popularity rank is decoupled from id, otherwise the lowest ids would always be the busiest
+    ids = list(range(1, n + 1))
+    rng.shuffle(ids)
+    return ids
+
+
+def _rng(spec, table):
+    return random.Random(f"{spec.seed}-{table}")
+
+
+def insert_chunks(table, rows, chunk_size):
+    """Insert rows from an iterator in chunks, one executemany and one transaction per chunk."""
+    rows = iter(rows)
+    inserted = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return inserted
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), chunk)
+        inserted += len(chunk)
+
+
+def _people(spec, table, count, password_hash, extra):
+    rng = _rng(spec, table)
+    for i in range(1, count + 1):
+        row = {
+            "id": i,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "phone": f"555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "email": f"{table}{i}@{spec.email_domain}",
+            "password_hash": password_hash,
+        }
+        row.update(extra(rng))
+        yield row
+
+
+def _products(spec):
+    rng = _rng(spec, 'inventory')
+    for i in range(1, spec.products + 1):
+        # Log-normal prices: mostly cheap consumables with a long tail of expensive parts
+        yield {"id": i, "name": f"{rng.choice(PARTS)} #{i}", "price": round(min(rng.lognormvariate(3.5, 1.0), 5000), 2)}
+
+
+def _tickets(spec, now):
+    rng = _rng(spec, 'service_tickets')
+    customers = _shuffled_ids(rng, spec.customers)
+    cum_weights = zipf_cum_weights(spec.customers, spec.skew)
+    for start in range(1, spec.tickets + 1, spec.chunk_size):
+        size = min(spec.chunk_size, spec.tickets - start + 1)
+        # Draw the customers of a whole chunk at once
+        owners = rng.choices(customers, cum_weights=cum_weights, k=size)
+        for offset, customer_id in enumerate(owners):
+            # Later ticket ids are more recent and recent months are busier than old ones
+            age = spec.days * (1 - ((start + offset) / (spec.tickets + 1)) ** 0.5)
+            yield {
+                "id": start + offset,
+                "customer_id": customer_id,
+                "vin": ''.join(rng.choices(VIN_CHARACTERS, k=17)),
+                "service_date": now - timedelta(days=age),
+                "service_desc": rng.choice(SERVICES),
+            }
+
+
+def _assignments(spec):
+    rng = _rng(spec, 'service_mechanics')
+    mechanics = _shuffled_ids(rng, spec.mechanics)
+    cum_weights = zipf_cum_weights(spec.mechanics, spec.skew)
+    counts, count_weights = MECHANICS_PER_TICKET
+    for ticket_id in range(1, spec.tickets + 1):
+        wanted = min(rng.choices(counts, count_weights)[0], spec.mechanics)
+        assigned = set()
+        while len(assigned) < wanted:
+            assigned.update(rng.choices(mechanics, cum_weights=cum_weights, k=wanted - len(assigned)))
+        for mechanic_id in sorted(assigned):
+            yield {"service_ticket_id": ticket_id, "mechanic_id": mechanic_id}
+
+
+def _product_links(spec):
+    rng = _rng(spec, 'inventory_service_tickets')
+    products = _shuffled_ids(rng, spec.products)
+    cum_weights = zipf_cum_weights(spec.products, spec.skew)
+    counts, count_weights = PARTS_PER_TICKET
+    link_id = 0
+    for ticket_id in range(1, spec.tickets + 1):
+        wanted = min(rng.choices(counts, count_weights)[0], spec.products)
+        used = set()
+        while len(used) < wanted:
+            used.update(rng.choices(products, cum_weights=cum_weights, k=wanted - len(used)))
+        for product_id in sorted(used):
+            link_id += 1
+            yield {"id": link_id, "service_ticket_id": ticket_id, "product_id": product_id, "quantity": rng.randint(1, 4)}
+
+
+def generate_dataset(spec, reset=True, now=None, progress=None):
+    """Fill the database with the data described by spec and return the row counts per table.
+
+    With reset the tables are dropped and recreated first, otherwise they must be empty. now defaults to a
+    fixed date so runs are reproducible. progress is an optional callable receiving (table name, rows
+    inserted) after each table is done.
+    """
+    if reset:
+        db.drop_all()
+        db.create_all()
+    now = now or datetime(2025, 1, 1)
+    password_hash = generate_password_hash(spec.password)
+
+    tables = [
+        (Customer.__table__, _people(spec, 'customers', spec.customers, password_hash, lambda rng: {})),
+        (Mechanic.__table__, _people(spec, 'mechanics', spec.mechanics, password_hash,
+                                     lambda rng: {"salary": rng.randrange(40000, 95000, 500)})),
+        (Product.__table__, _products(spec)),
+        (ServiceTicket.__table__, _tickets(spec, now)),
+        (ServiceMechanic.__table__, _assignments(spec)),
+        (ProductServiceTicket.__table__, _product_links(spec)),
+    ]
+    counts = {}
+    for table, rows in tables:
+        counts[table.name] = insert_chunks(table, rows, spec.chunk_size)
+        if progress:
+            progress(table.name, counts[table.name])
+    return counts
@@ -0,0 +1,61 @@
+from sqlalchemy import delete, select
+from app.models import (db, Customer, Mechanic, ServiceTicket, ServiceMechanic, ProductServiceTicket,
+                        ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive)
+from app.utils.outbox import record_ticket_events
+from app.utils.sync import record_deleted_tickets, record_unassigned_mechanic
+
+# Set-based deletes. Each helper issues a fixed number of DELETE statements no matter how many rows
+# match, instead of loading every child row into the session. The foreign keys also carry ON DELETE
+# CASCADE, these statements make the same semantics hold on databases that don't enforce it (SQLite).
+# The outbox events and sync tombstones of the deleted rows are recorded with one INSERT ... SELECT each
+# before the deletes.
+
+
+def _execute_delete(statement):
+    # The session isn't synchronized row by row, callers commit right after and don't use the deleted objects again
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def delete_service_tickets(where):
+    """Delete the service tickets matching a condition along with their mechanic assignments and product links.
+
+    Returns the number of service tickets deleted.
+    """
+    record_ticket_events('service_ticket.deleted', select(ServiceTicket.id).where(where))
+    record_deleted_tickets(where)
+    return delete_ticket_rows(where)
+
+
+def delete_ticket_rows(where, ticket_model=ServiceTicket, mechanic_link_model=ServiceMechanic,
+                       product_link_model=ProductServiceTicket):
+    """Delete the ticket rows matching where and their link rows, without recording events or tombstones.
+
+    The models default to the live tables, pass the archive models to delete archived tickets.
+    """
+    ticket_ids = select(ticket_model.id).where(where).scalar_subquery()
+    _execute_delete(delete(mechanic_link_model).where(mechanic_link_model.service_ticket_id.in_(ticket_ids)))
+    _execute_delete(delete(product_link_model).where(product_link_model.service_ticket_id.in_(ticket_ids)))
+    return _execute_delete(delete(ticket_model).where(where))
+
+
+def delete_customer_cascade(customer_id):
+    """Delete a customer and every service ticket that belongs to them, archived ones included.
+
+    Returns the number of live service tickets deleted.
+    """
+    deleted_tickets = delete_service_tickets(ServiceTicket.customer_id == customer_id)
+    delete_ticket_rows(ServiceTicketArchive.customer_id == customer_id,
+                       ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive)
+    _execute_delete(delete(Customer).where(Customer.id == customer_id))
+    return deleted_tickets
+
+
+def delete_mechanic_cascade(mechanic_id):
+    """Delete a mechanic and unassign them from their service tickets, the tickets themselves are kept."""
+    record_ticket_events('service_ticket.mechanic_removed',
+                         select(ServiceMechanic.service_ticket_id).where(ServiceMechanic.mechanic_id == mechanic_id),
+                         {"mechanic_id": mechanic_id})
+    record_unassigned_mechanic(mechanic_id)
+    _execute_delete(delete(ServiceMechanic).where(ServiceMechanic.mechanic_id == mechanic_id))
+    _execute_delete(delete(ServiceMechanicArchive).where(ServiceMechanicArchive.mechanic_id == mechanic_id))
+    return _execute_delete(delete(Mechanic).where(Mechanic.id == mechanic_id))
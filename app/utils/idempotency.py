@@ -0,0 +1,110 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.models import db, IdempotencyKey
+from app.utils.util import token_principal
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Keys live in the idempotency_keys table so a retry landing on another worker finds them. They are read
+# and written in their own short transactions on the primary: a reservation is visible to every worker as
+# soon as it is made and outlives a rollback of the view's transaction.
+
+
+def _store_key(key):
+    # Keys are scoped to the client, endpoint and path and hashed so every stored key has the same small size
+    scope = f"{token_principal() or 'anonymous'}|{request.endpoint}|{request.path}|{key}".encode()
+    return hashlib.sha256(scope).hexdigest()
+
+
+def _reserve(store_key, fingerprint):
+    """Reserve the key for this request and return None, or return the row another request stored under it."""
+    table = IdempotencyKey.__table__
+    lock_timeout = timedelta(seconds=current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    entry = None
+    for _ in range(3):
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(table).values(key=store_key, fingerprint=fingerprint, expires_at=now + lock_timeout))
+            return None
+        except IntegrityError:
+            pass
+        with db.engine.begin() as connection:
+            entry = connection.execute(select(table).where(table.c.key == store_key)).first()
+            if entry is not None and entry.expires_at > now:
+                return entry
+            if entry is not None:
+                # An expired response, or a reservation whose request never finished, frees the key
+                connection.execute(delete(table).where(table.c.key == store_key, table.c.expires_at == entry.expires_at))
+    return entry
+
+
+def _release(store_key):
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        connection.execute(delete(table).where(table.c.key == store_key, table.c.status.is_(None)))
+
+
+def _store(store_key, response):
+    table = IdempotencyKey.__table__
+    expires_at = datetime.utcnow() + timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+    with db.engine.begin() as connection:
+        connection.execute(update(table).where(table.c.key == store_key).values(
+            status=response.status_code, body=response.get_data(), mimetype=response.mimetype, expires_at=expires_at
+        ))
+
+
+def idempotent(f):
+    """Let clients safely retry a POST/PUT by sending an Idempotency-Key header.
+
+    The first request with a key runs normally and its response is stored for IDEMPOTENCY_TTL seconds.
+    A retry with the same key and body gets the stored response back without running the view again,
+    a retry with a different body gets 422, and a retry while the first request is still running gets 409,
+    for at most IDEMPOTENCY_LOCK_TIMEOUT seconds. Keys are per client, the token's user or anonymous.
+    Server errors are not stored so the request can be retried.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"}), 400
+
+        store_key = _store_key(key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        entry = _reserve(store_key, fingerprint)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used with a different request"}), 422
+            if entry.status is None:
+                return jsonify({"error": f"A request with this {IDEMPOTENCY_HEADER} is still being processed"}), 409
+            response = current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(store_key)
+            raise
+
+        if response.status_code >= 500:
+            _release(store_key)
+        else:
+            _store(store_key, response)
+        return response
+
+    return decorated
+
+
+def prune_idempotency_keys():
+    """Delete the expired keys, returns how many."""
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        return connection.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
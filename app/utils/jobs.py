@@ -0,0 +1,257 @@
+import json
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, request, url_for
+from sqlalchemy import select, update
+from app.models import db, Job
+from app.utils.util import commit_keep_loaded
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+JOB_STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED)
+RESPOND_ASYNC = 'respond-async'  # Prefer header value asking for a 202 and a job instead of doing the work in the request
+CLAIM_CANDIDATES = 10  # Due jobs a worker tries to claim per poll, others may win some of them
+
+# Task name -> (function, max attempts or None for JOB_MAX_ATTEMPTS), filled by @job_task
+tasks = {}
+
+
+def job_task(name, max_attempts=None):
+    """Register a function the worker runs for jobs named name, called with the job's payload as keyword arguments.
+
+    The function runs in the worker's app context and returns a JSON serializable result. Jobs run at least
+    once, a job whose worker died is run again, so tasks must be safe to repeat. Any exception is a failed
+    attempt, retried with exponential backoff until max_attempts.
+    """
+    def register(f):
+        tasks[name] = (f, max_attempts)
+        return f
+    return register
+
+
+def enqueue(name, payload=None, delay=0, created_by=None):
+    """Queue a job and commit it together with anything else pending in the session, returns the Job."""
+    if name not in tasks:
+        raise ValueError(f"Unknown task: {name}")
+    max_attempts = tasks[name][1] or current_app.config.get('JOB_MAX_ATTEMPTS', 3)
+    job = Job(name=name, payload=json.dumps(payload or {}), status=QUEUED, attempts=0, max_attempts=max_attempts,
+              run_at=datetime.utcnow() + timedelta(seconds=delay), created_by=created_by)
+    db.session.add(job)
+    commit_keep_loaded()
+    return job
+
+
+def job_owner(user):
+    """The created_by value of jobs queued by a token user."""
+    return f"{user.user_type}:{user.id}"
+
+
+def wants_async():
+    """True when the request sent Prefer: respond-async."""
+    return RESPOND_ASYNC in request.headers.get('Prefer', '').lower()
+
+
+def accepted_response(job):
+    """202 response pointing the client at the status endpoint of a queued job."""
+    status_url = url_for('jobs_bp.get_job', job_id=job.id)
+    response = jsonify({"message": "Job queued", "job_id": job.id, "status": job.status, "status_url": status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+
+def retry_delay(app, attempts):
+    """Seconds before retrying a job that failed its attempts-th attempt, exponential with jitter."""
+    base = app.config.get('JOB_RETRY_BACKOFF', 10)
+    delay = min(base * 2 ** (attempts - 1), app.config.get('JOB_RETRY_BACKOFF_MAX', 3600))
+    # Jitter spreads out jobs that failed together, e.g. while the database was down
+    return delay * random.uniform(0.5, 1)
+
+
+def claim_job(worker_id):
+    """Claim the next due job for worker_id and return it, or None when no job is due.
+
+    Claiming is an UPDATE ... WHERE status = 'queued' on one job, so when workers race for a job only one
+    of them changes a row. Jobs locked longer than JOB_LOCK_TIMEOUT belong to a worker that died and are
+    queued again first, or failed if they used up their attempts.
+    """
+    now = datetime.utcnow()
+    _recover_stale_jobs(now)
+    candidates = db.session.execute(
+        select(Job.id).where(Job.status == QUEUED, Job.run_at <= now).order_by(Job.run_at, Job.id).limit(CLAIM_CANDIDATES)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == QUEUED)
+            .values(status=RUNNING, locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    db.session.commit()
+    return None
+
+
+def _recover_stale_jobs(now):
+    cutoff = now - timedelta(seconds=current_app.config.get('JOB_LOCK_TIMEOUT', 600))
+    stale = (Job.status == RUNNING) & (Job.locked_at < cutoff)
+    db.session.execute(
+        update(Job).where(stale, Job.attempts >= Job.max_attempts)
+        .values(status=FAILED, error="The worker running the job stopped", finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(Job).where(stale).values(status=QUEUED, locked_by=None, locked_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def run_job(job):
+    """Run a claimed job and record its result, or its error and when it is retried. Returns the job.
+
+    The job's lock is refreshed every JOB_HEARTBEAT_INTERVAL seconds while the task runs. If another worker
+    still took the job over, e.g. because the heartbeats couldn't reach the database, the outcome of this
+    run and the task's uncommitted writes are dropped and the run that owns the job records its own.
+    """
+    job_id, owner, attempt = job.id, job.locked_by, job.attempts
+    name, max_attempts = job.name, job.max_attempts
+    try:
+        if name not in tasks:
+            raise LookupError(f"Unknown task: {name}")
+        with JobHeartbeat(current_app._get_current_object(), job_id, owner, attempt):
+            result = tasks[name][0](**json.loads(job.payload))
+    except Exception as e:
+        db.session.rollback()
+        if attempt >= max_attempts or name not in tasks:
+            outcome = dict(status=FAILED, finished_at=datetime.utcnow())
+        else:
+            outcome = dict(status=QUEUED, run_at=datetime.utcnow() + timedelta(seconds=retry_delay(current_app, attempt)),
+                           locked_by=None, locked_at=None)
+        current_app.logger.warning("Job %s (%s) attempt %s/%s failed: %s", job_id, name, attempt, max_attempts, e)
+        return _record_outcome(job_id, owner, attempt, error=f"{type(e).__name__}: {e}", **outcome)
+
+    # Tasks that don't commit themselves have their writes committed with the job's status
+    return _record_outcome(job_id, owner, attempt, status=SUCCEEDED, result=json.dumps(result), error=None,
+                           finished_at=datetime.utcnow())
+
+
+def _owned_run(job_id, owner, attempt):
+    # The job is still running the attempt the worker claimed
+    return (Job.id == job_id) & (Job.status == RUNNING) & (Job.locked_by == owner) & (Job.attempts == attempt)
+
+
+def _record_outcome(job_id, owner, attempt, **values):
+    recorded = db.session.execute(
+        update(Job).where(_owned_run(job_id, owner, attempt)).values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if recorded:
+        db.session.commit()
+    else:
+        db.session.rollback()
+        current_app.logger.warning("Job %s attempt %s was taken over by another worker, its outcome is dropped", job_id, attempt)
+    return db.session.get(Job, job_id)
+
+
+class JobHeartbeat:
+    """Refresh the locked_at of a running job on a thread of its own, so a long task isn't taken for abandoned.
+
+    Each refresh is its own short transaction on a separate connection. The heartbeat stops once the job
+    is no longer owned by the run, lost is then True.
+    """
+
+    def __init__(self, app, job_id, owner, attempt):
+        self.app = app
+        self.job_id, self.owner, self.attempt = job_id, owner, attempt
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+    def _beat(self):
+        interval = self.app.config.get('JOB_HEARTBEAT_INTERVAL', 60)
+        while not self.stopped.wait(interval):
+            try:
+                with self.app.app_context(), db.engine.begin() as connection:
+                    refreshed = connection.execute(
+                        update(Job).where(_owned_run(self.job_id, self.owner, self.attempt)).values(locked_at=datetime.utcnow())
+                    ).rowcount
+            except Exception:
+                # The next beat tries again, JOB_LOCK_TIMEOUT leaves room for several misses
+                self.app.logger.exception("Heartbeat of job %s failed", self.job_id)
+                continue
+            if not refreshed:
+                self.lost = True
+                return
+
+
+class JobWorker:
+    """Run queued jobs on JOB_WORKER_CONCURRENCY threads, each claiming and running one job at a time.
+
+    Threads poll every JOB_POLL_INTERVAL seconds while the queue is empty. In burst mode a thread stops
+    once no job is due, which is how tests and cron style runs drain the queue.
+    """
+
+    def __init__(self, app, concurrency=None, poll_interval=None):
+        self.app = app
+        self.concurrency = max(concurrency or app.config.get('JOB_WORKER_CONCURRENCY', 2), 1)
+        self.poll_interval = poll_interval if poll_interval is not None else app.config.get('JOB_POLL_INTERVAL', 1.0)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def run(self, burst=False):
+        """Run until stop() or Ctrl+C, or until the queue has no due job in burst mode. Returns the jobs run."""
+        threads = [threading.Thread(target=self._loop, args=(f"{self.worker_id}:{index}", burst), daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            # Running jobs finish, nothing new is claimed
+            self.stop()
+            for thread in threads:
+                thread.join()
+        return self.processed
+
+    def stop(self):
+        self.stopping.set()
+
+    def _loop(self, worker_id, burst):
+        while not self.stopping.is_set():
+            # A fresh app context, and so a fresh session, for every job
+            with self.app.app_context():
+                try:
+                    job = claim_job(worker_id)
+                    if job is not None:
+                        run_job(job)
+                except Exception:
+                    self.app.logger.exception("Job worker %s failed", worker_id)
+                    job = None
+                finally:
+                    db.session.remove()
+            if job is not None:
+                with self._lock:
+                    self.processed += 1
+            elif burst:
+                return
+            else:
+                self.stopping.wait(self.poll_interval)
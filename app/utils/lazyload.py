@@ -0,0 +1,79 @@
+import os
+import traceback
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app.models import db
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.dirname(APP_DIR)
+
+
+class NPlusOneError(Exception):
+    """Raised in 'raise' mode when a request lazy loads the same relationship too many times."""
+
+
+class LazyLoadDetector:
+    """Debug/test aid that counts lazy relationship loads per request and flags N+1 patterns.
+
+    Every relationship in models.py is lazy, so serializing a list of objects quietly runs one SELECT per
+    object and relationship. With LAZY_LOAD_DETECTION set to 'log' or 'raise', each lazy load that hits
+    the database is grouped by relationship (e.g. ServiceTicket.mechanics) and the app code that
+    triggered it. A group loaded more than LAZY_LOAD_THRESHOLD times in one request is logged as a
+    warning or raised as NPlusOneError when the request ends. The detector is off when the setting is unset.
+    """
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not self._listening:
+            event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+            self._listening = True
+        app.before_request(_start_tracking)
+        app.after_request(_check_lazy_loads)
+
+
+def _start_tracking():
+    if current_app.config.get('LAZY_LOAD_DETECTION') in ('log', 'raise'):
+        g.lazy_loads = Counter()
+
+
+def _call_site():
+    # Innermost frame in the app's own code outside this module, usually a schema.dump() in a view
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(APP_DIR) and filename != os.path.abspath(__file__):
+            return f"{os.path.relpath(filename, PROJECT_DIR)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def _do_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_select or not has_request_context() or orm_execute_state.lazy_loaded_from is None:
+        return
+    lazy_loads = g.get('lazy_loads')
+    if lazy_loads is not None:
+        relationship = str(orm_execute_state.loader_strategy_path[-1])
+        lazy_loads[(relationship, _call_site())] += 1
+
+
+def _check_lazy_loads(response):
+    lazy_loads = g.pop('lazy_loads', None)
+    if not lazy_loads:
+        return response
+    threshold = current_app.config.get('LAZY_LOAD_THRESHOLD', 5)
+    offenders = [(relationship, site, count) for (relationship, site), count in lazy_loads.most_common() if count > threshold]
+    if not offenders:
+        return response
+
+    details = '; '.join(f"{relationship} lazy loaded {count} times from {site}" for relationship, site, count in offenders)
+    message = f"N+1 queries in {request.method} {request.path} ({request.endpoint}): {details}"
+    if current_app.config.get('LAZY_LOAD_DETECTION') == 'raise':
+        raise NPlusOneError(message)
+    current_app.logger.warning(message)
+    return response
+
+
+lazy_load_detector = LazyLoadDetector()
@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import DateTime, Text, event, func, inspect, insert, literal, or_, select
+from app.models import db, Mechanic, OutboxEvent, ProductServiceTicket, ServiceTicket
+
+OUTBOX_KEY = 'outbox_recorded'  # Set in session.info once the transaction recorded events, wakes the dispatcher on commit
+TICKET_AGGREGATE = 'service_ticket'
+TICKET_FIELDS = ('customer_id', 'vin', 'service_date', 'service_desc')
+
+
+class _OutboxState:
+    def __init__(self):
+        self.cursor = None  # Sequence of the last event dispatched in this process
+        self.gaps = []  # Sequences below the cursor the dispatcher moved past and still re-checks
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.pid = None
+
+
+class OutboxBatch:
+    """The events of a read, the sequence to read after next time and the gaps to pass back with it."""
+    __slots__ = ('events', 'next_after', 'gaps', 'has_more')
+
+    def __init__(self, events, next_after, gaps, has_more):
+        self.events = events
+        self.next_after = next_after
+        self.gaps = gaps
+        self.has_more = has_more
+
+
+class Outbox:
+    """Change feed of service tickets, their mechanic assignments and product links.
+
+    Every create, update and delete is recorded as a row of outbox_events by the flush or the set-based
+    delete that makes the change, so an event exists exactly when its change committed. Downstream systems
+    read the feed with GET /outbox/events?after=<sequence>&gaps=<sequences> and keep their own position
+    and open gaps in it.
+
+    Handlers registered with @outbox.handler run in each app process on a dispatcher thread started with
+    the first request. It wakes when this process commits events and every OUTBOX_DISPATCH_INTERVAL seconds
+    for events of other processes, and starts at the end of the feed, handlers only see new events.
+    """
+    _events_registered = False
+
+    def __init__(self, app=None):
+        self.handlers = []  # (set of event types or None for all, function)
+        self.notifiers = []  # Functions called with the app after a commit recorded events, e.g. to wake other workers
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['outbox'] = _OutboxState()
+        if not Outbox._events_registered:
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
+            Outbox._events_registered = True
+        if app.config.get('OUTBOX_DISPATCH_INTERVAL'):
+            app.before_request(self._start_dispatcher)
+
+    def handler(self, *event_types):
+        """Register a function called with each new OutboxEvent of the given types, or of every type."""
+        def register(f):
+            self.handlers.append((set(event_types) or None, f))
+            return f
+        return register
+
+    def read(self, after, limit, session=None, gaps=()):
+        """Up to limit events with a sequence above after in order, preceded by the events that filled gaps.
+
+        A transaction that started earlier can commit a lower sequence after a later one is already
+        visible. The read stops before a missing sequence until the events after it are OUTBOX_GAP_TIMEOUT
+        seconds old, then moves past it and returns it as a gap. Passing the gaps back with the next read
+        delivers the event of a late commit, until the events after the gap are OUTBOX_GAP_RETENTION seconds
+        old, older gaps are sequences of rolled back transactions. Returns an OutboxBatch.
+        """
+        session = session or db.session
+        config = current_app.config
+        gaps = sorted(gap for gap in set(gaps) if gap <= after)
+        rows = session.execute(
+            select(OutboxEvent).where(or_(OutboxEvent.id > after, OutboxEvent.id.in_(gaps)))
+            .order_by(OutboxEvent.id).limit(limit + len(gaps))
+        ).scalars().all()
+        filled = [outbox_event for outbox_event in rows if outbox_event.id <= after]
+        events = rows[len(filled):][:limit]
+        has_more = len(events) == limit
+
+        now = datetime.utcnow()
+        settled = now - timedelta(seconds=config.get('OUTBOX_GAP_TIMEOUT', 5))
+        retained = now - timedelta(seconds=config.get('OUTBOX_GAP_RETENTION', 3600))
+        open_gaps = [gap for gap in gaps if gap not in {outbox_event.id for outbox_event in filled}]
+        expected = after + 1
+        for index, outbox_event in enumerate(events):
+            if outbox_event.id != expected:
+                if outbox_event.created_at > settled:
+                    events, has_more = events[:index], False
+                    break
+                if outbox_event.created_at > retained:
+                    open_gaps.extend(range(max(expected, outbox_event.id - config.get('OUTBOX_MAX_GAPS', 100)), outbox_event.id))
+            expected = outbox_event.id + 1
+        next_after = events[-1].id if events else after
+        return OutboxBatch(filled + events, next_after, self._open_gaps(session, open_gaps, retained), has_more)
+
+    def _open_gaps(self, session, gaps, retained):
+        # A gap closes once the first event after it is older than OUTBOX_GAP_RETENTION, one query for all of them
+        gaps = sorted(gaps)[-current_app.config.get('OUTBOX_MAX_GAPS', 100):]
+        if not gaps:
+            return []
+        following = session.execute(select(*[
+            select(OutboxEvent.created_at).where(OutboxEvent.id > gap).order_by(OutboxEvent.id).limit(1).scalar_subquery()
+            for gap in gaps
+        ])).one()
+        return [gap for gap, created_at in zip(gaps, following) if created_at is None or created_at > retained]
+
+    def dispatch(self, app=None):
+        """Run the handlers for the events recorded since the last dispatch, returns how many were dispatched."""
+        app = app or current_app._get_current_object()
+        state = app.extensions['outbox']
+        batch_size = app.config.get('OUTBOX_BATCH_SIZE', 100)
+        with state.lock:
+            if state.cursor is None:
+                state.cursor = db.session.execute(select(func.max(OutboxEvent.id))).scalar() or 0
+            dispatched = 0
+            while True:
+                batch = self.read(state.cursor, batch_size, gaps=state.gaps)
+                for outbox_event in batch.events:
+                    for event_types, f in self.handlers:
+                        if event_types is None or outbox_event.event_type in event_types:
+                            try:
+                                f(outbox_event)
+                            except Exception:
+                                # Handlers are best effort, durable consumers read the feed themselves
+                                app.logger.exception("Outbox handler %s failed on event %s", f.__name__, outbox_event.id)
+                state.cursor, state.gaps = batch.next_after, batch.gaps
+                dispatched += len(batch.events)
+                if not batch.has_more:
+                    return dispatched
+
+    def _start_dispatcher(self):
+        state = current_app.extensions['outbox']
+        # A forked worker doesn't inherit the parent's thread
+        if state.thread is not None and state.pid == os.getpid():
+            return None
+        with state.lock:
+            if state.thread is None or state.pid != os.getpid():
+                state.pid = os.getpid()
+                state.thread = threading.Thread(target=self._run, args=(current_app._get_current_object(), state),
+                                                name='outbox-dispatcher', daemon=True)
+                state.thread.start()
+        return None
+
+    def _run(self, app, state):
+        interval = app.config.get('OUTBOX_DISPATCH_INTERVAL')
+        while True:
+            try:
+                with app.app_context():
+                    self.dispatch(app)
+            except Exception:
+                app.logger.exception("Outbox dispatch failed")
+            state.wake.wait(interval)
+            state.wake.clear()
+
+
+def event_data(outbox_event):
+    """JSON representation of an event, as served to consumers."""
+    return {
+        "sequence": outbox_event.id,
+        "event_type": outbox_event.event_type,
+        "aggregate_type": outbox_event.aggregate_type,
+        "aggregate_id": outbox_event.aggregate_id,
+        "payload": json.loads(outbox_event.payload) if outbox_event.payload else None,
+        "created_at": outbox_event.created_at.isoformat(),
+    }
+
+
+def record_ticket_events(event_type, ticket_ids, payload=None):
+    """Record event_type for every service ticket id selected by ticket_ids with one INSERT ... SELECT.
+
+    For set-based writes that bypass the flush, call it before the statement that changes the rows.
+    """
+    ticket_ids = ticket_ids.subquery()
+    rows = select(
+        literal(event_type), literal(TICKET_AGGREGATE), list(ticket_ids.c)[0],
+        literal(json.dumps(payload) if payload is not None else None, Text), literal(datetime.utcnow(), DateTime)
+    )
+    db.session.execute(insert(OutboxEvent).from_select(
+        ['event_type', 'aggregate_type', 'aggregate_id', 'payload', 'created_at'], rows
+    ))
+    db.session.info[OUTBOX_KEY] = True
+
+
+# Session hooks that turn flushed changes into events in the same transaction
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _after_flush(session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+    assignments = set()  # (event type, ticket id, mechanic id), both sides of an assignment change are in the flush
+
+    def add(event_type, ticket_id, payload=None):
+        rows.append({'event_type': event_type, 'aggregate_type': TICKET_AGGREGATE, 'aggregate_id': ticket_id,
+                     'payload': json.dumps(payload) if payload is not None else None, 'created_at': now})
+
+    for obj in session.new | session.dirty:
+        state = inspect(obj)
+        if isinstance(obj, ServiceTicket):
+            if obj in session.new:
+                add('service_ticket.created', obj.id, {field: _json_value(getattr(obj, field)) for field in TICKET_FIELDS})
+            else:
+                changed = {field: _json_value(getattr(obj, field)) for field in TICKET_FIELDS
+                           if state.attrs[field].history.has_changes()}
+                if changed:
+                    add('service_ticket.updated', obj.id, changed)
+            history = state.attrs.mechanics.history
+            for mechanic in history.added or ():
+                assignments.add(('service_ticket.mechanic_assigned', obj.id, mechanic.id))
+            for mechanic in history.deleted or ():
+                assignments.add(('service_ticket.mechanic_removed', obj.id, mechanic.id))
+        elif isinstance(obj, Mechanic):
+            # The same assignment seen from the mechanic's side
+            history = state.attrs.service_tickets.history
+            for ticket in history.added or ():
+                assignments.add(('service_ticket.mechanic_assigned', ticket.id, obj.id))
+            for ticket in history.deleted or ():
+                assignments.add(('service_ticket.mechanic_removed', ticket.id, obj.id))
+        elif isinstance(obj, ProductServiceTicket):
+            if obj in session.new:
+                add('service_ticket.product_added', obj.service_ticket_id,
+                    {"link_id": obj.id, "product_id": obj.product_id, "quantity": obj.quantity})
+            elif session.is_modified(obj, include_collections=False):
+                add('service_ticket.product_updated', obj.service_ticket_id,
+                    {"link_id": obj.id, "product_id": obj.product_id, "quantity": obj.quantity})
+
+    for event_type, ticket_id, mechanic_id in sorted(assignments):
+        add(event_type, ticket_id, {"mechanic_id": mechanic_id})
+
+    for obj in session.deleted:
+        if isinstance(obj, ServiceTicket):
+            add('service_ticket.deleted', obj.id)
+        elif isinstance(obj, ProductServiceTicket):
+            add('service_ticket.product_removed', obj.service_ticket_id, {"link_id": obj.id, "product_id": obj.product_id})
+
+    if rows:
+        session.connection().execute(insert(OutboxEvent), rows)
+        session.info[OUTBOX_KEY] = True
+
+
+def _after_commit(session):
+    if session.info.pop(OUTBOX_KEY, False) and has_app_context():
+        state = current_app.extensions.get('outbox')
+        if state is not None:
+            state.wake.set()
+        for notify in outbox.notifiers:
+            try:
+                notify(current_app)
+            except Exception:
+                current_app.logger.exception("Outbox notifier %s failed", notify)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop(OUTBOX_KEY, None)
+
+
+outbox = Outbox()
+
+
+# Entity caches are per process with the simple cache backend, every process drops the tickets that changed
+@outbox.handler()
+def _invalidate_cached_ticket(outbox_event):
+    from app.utils.batch import invalidate_entities
+    invalidate_entities('service_ticket', outbox_event.aggregate_id)
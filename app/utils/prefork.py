@@ -0,0 +1,43 @@
+import gc
+from sqlalchemy.orm import configure_mappers
+from app.models import db
+from app.utils.catalog import product_catalog
+
+
+def warm_up(app):
+    """Do every piece of one-time initialization a worker would otherwise do lazily on its first requests.
+
+    Meant to run once in a pre-fork server's master process (gunicorn preload_app), so the objects built
+    here live in memory that all workers share copy-on-write instead of each worker building its own.
+    The engine is disposed at the end so no database connection is inherited by the workers.
+    """
+    # Lazily imported on the first token use, import it here so workers share it
+    import jose.jwt  # noqa: F401
+
+    with app.app_context():
+        configure_mappers()
+        # Werkzeug builds the URL matcher on the first match otherwise
+        app.url_map.update()
+        # The inventory endpoints read from the in-process catalog snapshot
+        product_catalog.snapshot()
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def freeze_heap():
+    """Move everything allocated so far into the GC's permanent generation before forking.
+
+    Collections in the workers then never touch these objects, so the pages holding them (and their
+    reference counts written by the collector) stay shared with the master instead of being copied.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Reset process-local state inherited from the master, call first thing in every worker."""
+    with app.app_context():
+        # close=False leaves any connection the master had open to the master, the worker opens its own
+        for engine in db.engines.values():
+            engine.dispose(close=False)
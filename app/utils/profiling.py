@@ -0,0 +1,198 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app.models import db
+from app.utils.util import load_token_user, token_principal
+
+PROFILE_HEADER = 'X-Profile'  # 'store' saves the profile to disk, 'inline' returns it instead of the response body
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_STATUS_HEADER = 'X-Profile-Status'
+
+
+class RequestProfiler:
+    """Profile single requests on demand, for admins only, so slow endpoints can be examined on live traffic.
+
+    A request with an X-Profile header and an admin bearer token runs under cProfile while its SQL
+    statements are timed. With 'store' (or any other value) the cProfile output is written to
+    PROFILE_DIR as <id>.prof, next to an <id>.json summary of the hottest functions and the SQL, and the
+    id is returned in X-Profile-Id. With 'inline' the summary replaces the response body. At most
+    PROFILE_MAX_CONCURRENT requests are profiled at once, the others run normally with X-Profile-Status: busy.
+    Requests from anyone else run normally too, with X-Profile-Status: denied.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['request_profiler'] = {
+            'slots': threading.BoundedSemaphore(app.config.get('PROFILE_MAX_CONCURRENT', 1)),
+        }
+        # Replicas included, reads of GET requests may run there
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(_start_profile)
+        app.after_request(_finish_profile)
+        app.teardown_request(_release_slot)
+
+    def profile_dir(self, app):
+        return os.path.join(app.instance_path, app.config.get('PROFILE_DIR', 'profiles'))
+
+    def load(self, app, profile_id):
+        """Return the stored summary of a profile, or None if there is no such profile."""
+        if not _is_profile_id(profile_id):
+            return None
+        path = os.path.join(self.profile_dir(app), f"{profile_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def list(self, app):
+        """Ids of the stored profiles, newest first."""
+        directory = self.profile_dir(app)
+        if not os.path.isdir(directory):
+            return []
+        return sorted((name[:-5] for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+
+
+def _is_profile_id(profile_id):
+    # Ids are generated as <timestamp>-<hex>, anything else could escape the profile directory
+    return bool(profile_id) and all(character.isalnum() or character == '-' for character in profile_id)
+
+
+def _start_profile():
+    mode = request.headers.get(PROFILE_HEADER)
+    if not mode:
+        return None
+
+    # A stray header from another client or a proxy must not change the request, only admins get a profile
+    user = None
+    if (token_principal() or '').startswith('admin:'):
+        user, _ = load_token_user(request.headers['Authorization'].split()[1])
+    if user is None or user.user_type != 'admin':
+        g.profile_status = 'denied'
+        return None
+
+    if not current_app.extensions['request_profiler']['slots'].acquire(blocking=False):
+        g.profile_status = 'busy'
+        return None
+
+    g.profile = {
+        'mode': mode,
+        'sql': [],
+        'started': time.perf_counter(),
+        'thread': threading.get_ident(),
+        'profiler': cProfile.Profile(),
+    }
+    g.profile['profiler'].enable()
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile()
+    if profile is not None and context is not None:
+        context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'profile_started', None)
+    profile = _active_profile()
+    if started is not None and profile is not None:
+        profile['sql'].append({
+            "statement": statement,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "offset_ms": round((started - profile['started']) * 1000, 3),
+        })
+
+
+def _active_profile():
+    if not has_request_context():
+        return None
+    profile = g.get('profile')
+    # Background threads pushing their own context for this request aren't part of the profile
+    if profile is None or profile['thread'] != threading.get_ident():
+        return None
+    return profile
+
+
+def _finish_profile(response):
+    if g.get('profile_status'):
+        response.headers[PROFILE_STATUS_HEADER] = g.profile_status
+    profile = g.get('profile')
+    if profile is None or profile.get('finished'):
+        return response
+    profile['profiler'].disable()
+    profile['finished'] = True
+    elapsed_ms = (time.perf_counter() - profile['started']) * 1000
+
+    profile_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    summary = {
+        "id": profile_id,
+        "route": f"{request.method} {request.full_path.rstrip('?')}",
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "elapsed_ms": round(elapsed_ms, 3),
+        "sql": {
+            "count": len(profile['sql']),
+            "total_ms": round(sum(entry['duration_ms'] for entry in profile['sql']), 3),
+            "statements": profile['sql'],
+        },
+        "functions": _top_functions(profile['profiler'], current_app.config.get('PROFILE_TOP_FUNCTIONS', 40)),
+    }
+    response.headers[PROFILE_ID_HEADER] = profile_id
+
+    if profile['mode'] == 'inline':
+        response.set_data(json.dumps({"profile": summary}))
+        response.mimetype = 'application/json'
+        response.headers[PROFILE_STATUS_HEADER] = 'inline'
+        return response
+
+    directory = request_profiler.profile_dir(current_app)
+    os.makedirs(directory, exist_ok=True)
+    profile['profiler'].dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    with open(os.path.join(directory, f"{profile_id}.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    response.headers[PROFILE_STATUS_HEADER] = 'stored'
+    return response
+
+
+def _release_slot(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile['profiler'].disable()
+        current_app.extensions['request_profiler']['slots'].release()
+
+
+def _top_functions(profiler, limit):
+    """The functions with the highest cumulative time, each with the functions that called it."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        "function": _label(function),
+        "calls": calls,
+        "total_ms": round(total * 1000, 3),
+        "cumulative_ms": round(cumulative * 1000, 3),
+        "callers": [_label(caller) for caller in callers],
+    } for function, (_, calls, total, cumulative, callers) in entries]
+
+
+def _label(function):
+    filename, line, name = function
+    if filename == '~':
+        return name  # Built-in functions
+    return f"{os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename}:{line}({name})"
+
+
+request_profiler = RequestProfiler()
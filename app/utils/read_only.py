@@ -0,0 +1,76 @@
+import weakref
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+READ_ONLY_KEY = 'read_only_request'  # Set in session.info while the session serves a read request
+# Backends that accept SET TRANSACTION READ ONLY before the first statement of a transaction
+READ_ONLY_TRANSACTION_DIALECTS = {'mysql', 'mariadb', 'postgresql'}
+
+# AUTOCOMMIT copies of each engine, they share its pool and event listeners
+_autocommit_engines = weakref.WeakKeyDictionary()
+
+
+class ReadOnlyRequests:
+    """Run the session of GET requests in a read-only mode set by READ_ONLY_GET_MODE.
+
+    Either way autoflush is off for the request, there is nothing to flush before a read.
+    - 'autocommit' (the default) runs every SELECT on an AUTOCOMMIT connection, with no BEGIN, COMMIT
+      or ROLLBACK round trips, and InnoDB treats each one as a read-only transaction. Statements of one
+      request no longer share a snapshot, e.g. a page can be read after a row was added past its count.
+    - 'transaction' keeps one transaction per request and starts it with SET TRANSACTION READ ONLY on
+      MySQL and PostgreSQL, which also makes any write in a GET handler fail.
+    - None turns the read-only mode off.
+    Flushes and DML always use the regular transactional connection.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(_start_read_only)
+        app.teardown_request(_end_read_only)
+
+
+def read_only_engine(session, engine, clause):
+    """The engine a read-only session runs a statement on, an AUTOCOMMIT copy of engine for SELECTs."""
+    if session._flushing or not getattr(clause, 'is_select', False):
+        return engine
+    if session.info.get(READ_ONLY_KEY) != 'autocommit':
+        return engine
+    autocommit = _autocommit_engines.get(engine)
+    if autocommit is None:
+        autocommit = _autocommit_engines[engine] = engine.execution_options(isolation_level='AUTOCOMMIT')
+    return autocommit
+
+
+def _start_read_only():
+    mode = current_app.config.get('READ_ONLY_GET_MODE', 'autocommit')
+    if not mode or request.method not in READ_METHODS:
+        return None
+    from app.models import db
+    session = db.session()
+    g.read_only_session = (session, session.autoflush)
+    session.autoflush = False
+    session.info[READ_ONLY_KEY] = mode
+    return None
+
+
+def _end_read_only(exc):
+    # Tests share one session across requests, the next request gets the session back as it was
+    state = g.pop('read_only_session', None)
+    if state is not None:
+        session, autoflush = state
+        session.autoflush = autoflush
+        session.info.pop(READ_ONLY_KEY, None)
+
+
+@event.listens_for(Session, 'after_begin')
+def _set_transaction_read_only(session, transaction, connection):
+    if session.info.get(READ_ONLY_KEY) == 'transaction' and connection.dialect.name in READ_ONLY_TRANSACTION_DIALECTS:
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
+
+read_only_requests = ReadOnlyRequests()
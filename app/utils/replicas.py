@@ -0,0 +1,185 @@
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from app.utils.read_only import READ_METHODS, read_only_engine
+
+REPLICA_BIND_PREFIX = 'replica_'  # Replica n is the Flask-SQLAlchemy bind replica_<n>
+WROTE_KEY = 'replica_router_wrote'  # Set in session.info once the session wrote, its reads stay on the primary
+HEALTH_CHECK_OPTION = 'replica_health_check'  # Execution option of the SELECT 1 health checks, not counted as app queries
+WRITE_COOKIE = 'read_your_writes'  # Signed marker of a client's last write, sent back with its next requests
+WRITE_HEADER = 'X-Read-Your-Writes'  # The same marker for clients that don't keep cookies, echoed from the response
+_PRIMARY = object()  # g.replica_bind_key of a read request that must use the primary
+
+
+class RoutingSession(Session):
+    """db.session class that sends the SELECTs of read requests to a replica, see ReplicaRouter.
+
+    In read-only requests the SELECTs run on an AUTOCOMMIT connection, see app/utils/read_only.py.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        engine = replica_router.engine_for(self, clause)
+        if engine is None:
+            engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        return read_only_engine(self, engine, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+
+class _RouterState:
+    def __init__(self, keys):
+        self.keys = keys
+        self.counter = itertools.count()
+        self.health = {}  # bind key -> (monotonic time of the last check, healthy)
+        self.listening = False
+        self.lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Send the reads of GET requests to replica databases and everything else to the primary.
+
+    Each URI in SQLALCHEMY_REPLICA_URIS becomes a bind named replica_<n>. A read request picks one healthy
+    replica round-robin and runs its SELECTs there. These stay on the primary:
+    - flushes and writes
+    - reads of a session that already wrote
+    - requests with other methods
+    - views decorated with @use_primary
+    - read requests from a client that made a successful write in the last REPLICA_READ_YOUR_WRITES
+      seconds, so clients read their own writes even when the replicas lag. The write response carries
+      a signed marker of the token's user in a cookie and the X-Read-Your-Writes header, which any
+      worker checks when the client sends it back
+
+    Replicas are checked with SELECT 1 every REPLICA_HEALTH_CHECK_INTERVAL seconds and after connection
+    errors. Failing replicas are skipped, and without a healthy replica reads go to the primary.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call before db.init_app, which creates the engines of the replica binds."""
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        keys = []
+        for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+            keys.append(f"{REPLICA_BIND_PREFIX}{index}")
+            binds[keys[-1]] = uri
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['replica_router'] = _RouterState(keys)
+        if keys:
+            app.after_request(_remember_write)
+
+    def engine_for(self, session, clause):
+        """The replica engine for a statement of the session, or None when it belongs on the primary."""
+        if not has_request_context() or request.method not in READ_METHODS:
+            return None
+        state = current_app.extensions.get('replica_router')
+        if state is None or not state.keys:
+            return None
+        if getattr(clause, 'is_dml', False):
+            session.info[WROTE_KEY] = True
+        if session._flushing or session.info.get(WROTE_KEY) or not getattr(clause, 'is_select', False):
+            return None
+        if g.get('use_primary'):
+            return None
+
+        # One replica serves every read of a request
+        key = g.get('replica_bind_key')
+        if key is None:
+            key = g.replica_bind_key = self._choose(state, session._db.engines)
+        return None if key is _PRIMARY else session._db.engines[key]
+
+    def _choose(self, state, engines):
+        if _wrote_recently():
+            return _PRIMARY
+        healthy = [key for key in state.keys if self._healthy(current_app, state, engines, key)]
+        if not healthy:
+            return _PRIMARY
+        return healthy[next(state.counter) % len(healthy)]
+
+    def _healthy(self, app, state, engines, key):
+        if not state.listening:
+            with state.lock:
+                if not state.listening:
+                    for replica_key in state.keys:
+                        event.listen(engines[replica_key], 'handle_error', _mark_unhealthy(state, replica_key))
+                    state.listening = True
+
+        checked_at, healthy = state.health.get(key, (None, True))
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= app.config.get('REPLICA_HEALTH_CHECK_INTERVAL', 30):
+            try:
+                with engines[key].connect() as connection:
+                    connection.execution_options(**{HEALTH_CHECK_OPTION: True}).execute(text('SELECT 1'))
+                healthy = True
+            except Exception as e:
+                app.logger.warning("Replica %s failed its health check: %s", key, e)
+                healthy = False
+            state.health[key] = (now, healthy)
+        return healthy
+
+
+def _mark_unhealthy(state, key):
+    def handle_error(context):
+        # Connection failures take the replica out of rotation until its next health check
+        if context.is_disconnect or context.connection is None:
+            state.health[key] = (time.monotonic(), False)
+    return handle_error
+
+
+def _write_serializer():
+    from itsdangerous import URLSafeTimedSerializer
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='read-your-writes')
+
+
+def _client_principal():
+    # The token's user, so a marker only pins the client that wrote, requests without a token share one
+    from app.utils.util import token_principal
+    return token_principal() or 'anonymous'
+
+
+def _wrote_recently():
+    marker = request.headers.get(WRITE_HEADER) or request.cookies.get(WRITE_COOKIE)
+    if not marker:
+        return False
+    from itsdangerous import BadSignature
+    try:
+        principal = _write_serializer().loads(marker, max_age=current_app.config.get('REPLICA_READ_YOUR_WRITES', 5))
+    except BadSignature:
+        # Tampered with or older than the window
+        return False
+    return principal == _client_principal()
+
+
+def _remember_write(response):
+    if request.method not in READ_METHODS and response.status_code < 400:
+        window = current_app.config.get('REPLICA_READ_YOUR_WRITES', 5)
+        if window:
+            marker = _write_serializer().dumps(_client_principal())
+            response.set_cookie(WRITE_COOKIE, marker, max_age=window, httponly=True, samesite='Lax')
+            response.headers[WRITE_HEADER] = marker
+    return response
+
+
+def use_primary(f):
+    """Run every query of a view on the primary, for reads that must see the latest writes.
+
+    Place it above @token_required so the token's user is loaded from the primary too.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.use_primary = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,165 @@
+from collections import defaultdict
+from sqlalchemy import select
+from flask import current_app
+from app.models import (db, Customer, Mechanic, ServiceTicket, ServiceMechanic, ProductServiceTicket,
+                        ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive)
+
+# Record classes are built once per model and field list and reused for every row
+_record_classes = {}
+
+
+def record_class(name, fields):
+    """Return a lightweight __slots__ class with the given attributes, usable by the marshmallow schemas."""
+    key = (name, tuple(fields))
+    cls = _record_classes.get(key)
+    if cls is None:
+        def __init__(self, *values):
+            for field, value in zip(self.__slots__, values):
+                setattr(self, field, value)
+
+        def __repr__(self):
+            return f"<{name} {getattr(self, 'id', None)}>"
+
+        cls = type(name, (), {'__slots__': tuple(fields), '__init__': __init__, '__repr__': __repr__})
+        _record_classes[key] = cls
+    return cls
+
+
+def column_names(model):
+    """Return the names of the table columns of a model, in table order."""
+    return [column.key for column in model.__table__.columns]
+
+
+def fetch_records(model, where=None, order_by=None, offset=None, limit=None, columns=None, extra_fields=(), session=None):
+    """Select only the needed columns of a model with Core and map the rows to slot records.
+
+    The rows never enter the session identity map and carry no instrumentation or relationship state.
+    extra_fields adds attributes (set to None) that callers fill in themselves, e.g. nested relationships.
+    session defaults to db.session, the async views pass the sync facade of their AsyncSession.
+    """
+    session = session or db.session
+    columns = columns or column_names(model)
+    table = model.__table__
+    query = select(*[table.c[name] for name in columns])
+    if where is not None:
+        query = query.where(where)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+
+    cls = record_class(f"{model.__name__}Record", list(columns) + list(extra_fields))
+    padding = (None,) * len(extra_fields)
+    return [cls(*row, *padding) for row in session.execute(query)]
+
+
+def fetch_service_ticket_records(where=None, order_by=None, offset=None, limit=None, session=None, archived=False):
+    """Load service tickets as records with customer, mechanics and product links attached.
+
+    Relationships are loaded with one IN query each instead of lazy loads per ticket. Products are not
+    joined, ProductServiceTicketSchema reads them from the catalog by product_id. With archived=True the
+    tickets and their links are read from the archive tables, where conditions the archive models.
+    """
+    session = session or db.session
+    if archived:
+        ticket_model, mechanic_link_model, product_link_model = ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive
+    else:
+        ticket_model, mechanic_link_model, product_link_model = ServiceTicket, ServiceMechanic, ProductServiceTicket
+    tickets = fetch_records(ticket_model, where=where, order_by=ticket_model.id if order_by is None else order_by,
+                            offset=offset, limit=limit,
+                            extra_fields=('customer', 'mechanics', 'product_links'), session=session)
+    if not tickets:
+        return tickets
+    ticket_ids = [ticket.id for ticket in tickets]
+
+    customer_ids = {ticket.customer_id for ticket in tickets}
+    customers = {customer.id: customer for customer in fetch_records(Customer, where=Customer.id.in_(customer_ids), session=session)}
+
+    # Mechanics are fetched through the service_mechanics junction table in a single joined select
+    mechanic_columns = column_names(Mechanic)
+    mechanic_record = record_class('MechanicRecord', mechanic_columns)
+    links = mechanic_link_model.__table__
+    mechanics_table = Mechanic.__table__
+    query = (select(links.c.service_ticket_id, *[mechanics_table.c[name] for name in mechanic_columns])
+             .join(mechanics_table, mechanics_table.c.id == links.c.mechanic_id)
+             .where(links.c.service_ticket_id.in_(ticket_ids))
+             .order_by(links.c.service_ticket_id, mechanics_table.c.id))
+    mechanics_by_ticket = defaultdict(list)
+    for row in session.execute(query):
+        mechanics_by_ticket[row[0]].append(mechanic_record(*row[1:]))
+
+    product_links_by_ticket = defaultdict(list)
+    for link in fetch_records(product_link_model, where=product_link_model.service_ticket_id.in_(ticket_ids),
+                              order_by=product_link_model.id, session=session):
+        product_links_by_ticket[link.service_ticket_id].append(link)
+
+    for ticket in tickets:
+        ticket.customer = customers.get(ticket.customer_id)
+        ticket.mechanics = mechanics_by_ticket.get(ticket.id, [])
+        ticket.product_links = product_links_by_ticket.get(ticket.id, [])
+    return tickets
+
+
+def service_ticket_embeds(ticket):
+    """List the (prefix, id) of the customer, mechanics and products a serialized service ticket record embeds."""
+    return ([('customer', ticket.customer_id)]
+            + [('mechanic', mechanic.id) for mechanic in ticket.mechanics]
+            + [('product', link.product_id) for link in ticket.product_links])
+
+
+class RecordPage:
+    """A page of records exposing the same attributes as a Flask-SQLAlchemy Pagination.
+
+    total is None when the list wasn't counted, more then tells whether rows follow the page.
+    """
+    __slots__ = ('items', 'page', 'per_page', 'total', 'more')
+
+    def __init__(self, items, page, per_page, total, more=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.more = more
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return (self.total + self.per_page - 1) // self.per_page if self.per_page else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        if self.more is not None:
+            return self.more
+        return self.page < self.pages
+
+
+def paginate_records(base_query, model, page, per_page, total, loader=None, exact=True, orm=None):
+    """Return a page of rows for a list endpoint.
+
+    With LIST_READ_PATH set to 'core' (the default) the page is read with Core into slot records, using the
+    total the endpoint already counted. With 'orm' it falls back to base_query.paginate(). A total that is
+    estimated or None (exact=False) can't tell if another page follows, one row past the page is read instead.
+    orm=False reads records whatever LIST_READ_PATH says, for models the schemas can only dump as records.
+    """
+    if orm is None:
+        orm = current_app.config.get('LIST_READ_PATH', 'core') != 'core'
+    if orm and exact:
+        return base_query.paginate(page=page, per_page=per_page, error_out=False)
+    limit = per_page if exact else per_page + 1
+    if orm:
+        items = base_query.offset((page - 1) * per_page).limit(limit).all()
+    else:
+        if loader is None:
+            def loader(**kwargs):
+                return fetch_records(model, **kwargs)
+        items = loader(order_by=model.id, offset=(page - 1) * per_page, limit=limit)
+    if exact:
+        return RecordPage(items, page, per_page, total)
+    return RecordPage(items[:per_page], page, per_page, total, more=len(items) > per_page)
@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+from app.models import db
+
+# EXPLAIN prefix per dialect, statements on other databases are logged without a plan
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN ',
+    'postgresql': 'EXPLAIN ',
+}
+# Execution option set on the EXPLAIN statements so they are neither timed nor counted as app queries
+EXPLAIN_OPTION = 'slow_query_explain'
+
+
+class SlowQueryLog:
+    """Times every SQL statement and records the ones slower than SLOW_QUERY_THRESHOLD_MS.
+
+    Each record has the statement, the types of its bound parameters (their values with
+    SLOW_QUERY_LOG_PARAMETERS), the route that ran it and, for SELECTs, the EXPLAIN output so missing
+    indexes show up. EXPLAIN runs at most once per distinct statement every SLOW_QUERY_EXPLAIN_INTERVAL
+    seconds, on a background thread of each process with its own connection, so a slow request doesn't
+    wait for it or take a second connection. Records are appended as JSON lines to a rotating file in the
+    instance folder once their plan is in, and the most recent SLOW_QUERY_BUFFER_SIZE are kept in memory
+    for the admin endpoint. Setting the threshold to None turns the log off.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = app.extensions['slow_query_log'] = _SlowQueryState(app)
+        # Replicas included, reads of GET requests may run there
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', state.before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', state.after_cursor_execute)
+
+    def entries(self, app, limit=None):
+        """Most recent slow queries first."""
+        entries = list(reversed(app.extensions['slow_query_log'].entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self, app):
+        app.extensions['slow_query_log'].entries.clear()
+
+    def join(self, app):
+        """Wait until the queued EXPLAINs ran and their records were written."""
+        app.extensions['slow_query_log'].explains.join()
+
+
+class _SlowQueryState:
+    def __init__(self, app):
+        self.app = app
+        self.entries = deque(maxlen=app.config.get('SLOW_QUERY_BUFFER_SIZE', 200))
+        self.logger = None
+        self.explained_at = {}
+        self.lock = threading.Lock()
+        self.explains = queue.Queue(maxsize=app.config.get('SLOW_QUERY_EXPLAIN_QUEUE_SIZE', 100))
+        self.thread = None
+        self.pid = None
+
+    def threshold_ms(self):
+        return self.app.config.get('SLOW_QUERY_THRESHOLD_MS')
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and self.threshold_ms() is not None and not context.execution_options.get(EXPLAIN_OPTION):
+            context.slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'slow_query_started', None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        threshold = self.threshold_ms()
+        if threshold is None or duration_ms < threshold:
+            return
+
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            "duration_ms": round(duration_ms, 3),
+            "statement": statement,
+            "parameters": _truncate(repr(parameters if self.app.config.get('SLOW_QUERY_LOG_PARAMETERS') else _redact(parameters))),
+            "executemany": executemany,
+            "route": f"{request.method} {request.path}" if has_request_context() else None,
+            "endpoint": request.endpoint if has_request_context() else None,
+            "plan": None,
+        }
+        self.entries.append(entry)
+        if executemany or not self.queue_explain(conn.engine, statement, parameters, entry):
+            self.write(entry)
+
+    def queue_explain(self, engine, statement, parameters, entry):
+        """Hand the EXPLAIN of a SELECT to the background thread, which writes the entry. False if it won't run."""
+        if EXPLAIN_PREFIXES.get(engine.dialect.name) is None or not statement.lstrip().upper().startswith('SELECT'):
+            return False
+
+        now = time.monotonic()
+        interval = self.app.config.get('SLOW_QUERY_EXPLAIN_INTERVAL', 60)
+        with self.lock:
+            if now - self.explained_at.get(statement, float('-inf')) < interval:
+                return False
+            if len(self.explained_at) > 1000:
+                self.explained_at.clear()
+            self.explained_at[statement] = now
+            # A forked worker doesn't inherit the parent's thread
+            if self.thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run_explains, name='slow-query-explain', daemon=True)
+                self.thread.start()
+        try:
+            self.explains.put_nowait((engine, statement, parameters, entry))
+        except queue.Full:
+            # The database is too slow to keep up, log the statement without a plan
+            return False
+        return True
+
+    def _run_explains(self):
+        while True:
+            engine, statement, parameters, entry = self.explains.get()
+            try:
+                entry["plan"] = self.explain(engine, statement, parameters)
+                self.write(entry)
+            except Exception:
+                self.app.logger.exception("Writing a slow query failed")
+            finally:
+                self.explains.task_done()
+
+    def explain(self, engine, statement, parameters):
+        prefix = EXPLAIN_PREFIXES[engine.dialect.name]
+        try:
+            with engine.connect() as explain_conn:
+                explain_conn = explain_conn.execution_options(**{EXPLAIN_OPTION: True})
+                rows = explain_conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+            return [[_plain(value) for value in row] for row in rows]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+
+    def write(self, entry):
+        if self.logger is None:
+            with self.lock:
+                if self.logger is None:
+                    self.logger = self._create_logger()
+        self.logger.info(json.dumps(entry, default=str))
+
+    def _create_logger(self):
+        path = os.path.join(self.app.instance_path, self.app.config.get('SLOW_QUERY_LOG_FILE', 'slow_queries.log'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=self.app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 1024 * 1024),
+            backupCount=self.app.config.get('SLOW_QUERY_LOG_BACKUPS', 5)
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger(f'{__name__}.{self.app.import_name}.{id(self)}')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        return logger
+
+
+def _truncate(text, limit=500):
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _redact(parameters):
+    # The type of each value in place of the value, parameters hold password hashes, emails, ...
+    if isinstance(parameters, dict):
+        return {name: _redact(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return type(parameters).__name__
+
+
+def _plain(value):
+    return value if isinstance(value, (int, float, str, type(None))) else str(value)
+
+
+slow_query_log = SlowQueryLog()
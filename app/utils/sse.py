@@ -0,0 +1,295 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from flask import current_app
+from sqlalchemy import or_, select
+from app.models import db, OutboxEvent, ServiceMechanic, ServiceTicket, ServiceTicketTombstone
+from app.utils.outbox import TICKET_AGGREGATE, event_data, outbox
+from app.utils.sync import sync_scope
+
+# The outbox dispatcher of every process reads the committed events from the shared outbox_events table
+# and publishes them here, so the table is the ordered cross-worker transport and its sequence is the SSE id
+ASSIGNMENT_EVENTS = ('service_ticket.mechanic_assigned', 'service_ticket.mechanic_removed')
+REMOVAL_EVENTS = ('service_ticket.deleted', 'service_ticket.archived')  # The ticket left the live tables, its tombstones have the audience
+
+
+class StreamLimitError(Exception):
+    """The process already serves SSE_MAX_CONNECTIONS streams."""
+
+
+class Subscription:
+    """Bounded buffer of the events waiting to be written to one stream."""
+
+    def __init__(self, state, principal, buffer_size):
+        self.state = state  # Broker state of the app it's subscribed to
+        self.principal = principal  # (user type, user id)
+        self.buffer_size = buffer_size
+        self.events = deque()  # (sequence, SSE message)
+        self.overflowed = False  # The client fell behind, the stream ends with a reset event
+        self.condition = threading.Condition()
+
+    def put(self, sequence, message):
+        with self.condition:
+            if len(self.events) >= self.buffer_size:
+                # Dropping events silently would leave the client out of date without knowing it
+                self.overflowed = True
+                self.events.clear()
+            elif not self.overflowed:
+                self.events.append((sequence, message))
+            self.condition.notify()
+
+    def get(self, timeout):
+        """The buffered events, waiting up to timeout seconds for one, [] if none arrived."""
+        with self.condition:
+            if not self.events and not self.overflowed:
+                self.condition.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+
+class _BrokerState:
+    def __init__(self):
+        self.subscriptions = {}  # principal -> set of Subscription
+        self.count = 0
+        self.lock = threading.Lock()
+        self.transport_pid = None
+
+
+class OutboxTransport:
+    """Default transport: the outbox dispatchers poll the table every OUTBOX_DISPATCH_INTERVAL seconds.
+
+    Commits of the stream's own process wake its dispatcher at once, events of other processes arrive
+    within the interval.
+    """
+
+    def init_app(self, app):
+        pass
+
+    def start(self, app):
+        pass
+
+
+class RedisTransport:
+    """Wakes the outbox dispatcher of every process through a Redis channel as soon as any process commits events.
+
+    Redis only carries the wake-up, the events are still read from the outbox table in order, so a lost
+    message delays events by at most OUTBOX_DISPATCH_INTERVAL. Needs the optional redis package.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.channel = None
+
+    def init_app(self, app):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SSE_TRANSPORT = 'redis' needs the redis package: pip install redis")
+        url = app.config.get('SSE_REDIS_URL')
+        if not url:
+            raise RuntimeError("SSE_TRANSPORT = 'redis' needs SSE_REDIS_URL")
+        # redis-py connects lazily and reconnects in forked processes
+        self.client = redis.Redis.from_url(url)
+        self.channel = app.config.get('SSE_REDIS_CHANNEL', 'outbox_events')
+        outbox.notifiers.append(self._notify)
+
+    def _notify(self, app):
+        self.client.publish(self.channel, b'1')
+
+    def start(self, app):
+        thread = threading.Thread(target=self._listen, args=(app,), name='sse-redis-listener', daemon=True)
+        thread.start()
+
+    def _listen(self, app):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for _ in pubsub.listen():
+                    app.extensions['outbox'].wake.set()
+            except Exception:
+                app.logger.exception("SSE Redis listener failed, reconnecting")
+                time.sleep(1)
+
+
+transports = {
+    'outbox': OutboxTransport,
+    'redis': RedisTransport,
+}
+
+
+def limit_streams(app, threads):
+    """Lower SSE_MAX_CONNECTIONS so the streams of a process leave SSE_RESERVED_THREADS of its threads free.
+
+    Every open stream holds a thread of the sync app until it ends, call this with the number of threads a
+    process serves requests on, e.g. gunicorn's threads per worker or the ASGI app's ASGI_WSGI_WORKERS.
+    """
+    available = max(threads - app.config.get('SSE_RESERVED_THREADS', 4), 0)
+    app.config['SSE_MAX_CONNECTIONS'] = min(app.config.get('SSE_MAX_CONNECTIONS', 100), available)
+
+
+class TicketEventBroker:
+    """In-process pub/sub of service ticket events for the SSE streams of GET /service_tickets/stream.
+
+    Each stream subscribes with its principal, customers get the events of their tickets and mechanics
+    the events of the tickets assigned to them. The audience of an event is only looked up while this
+    process has streams, and each stream buffers at most SSE_BUFFER_SIZE events for a slow client.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['ticket_events'] = state = _BrokerState()
+        name = app.config.get('SSE_TRANSPORT', 'outbox')
+        if name not in transports:
+            raise ValueError(f"SSE_TRANSPORT must be one of {', '.join(transports)}, not {name!r}")
+        state.transport = transports[name]()
+        state.transport.init_app(app)
+
+    def subscribe(self, principal):
+        """A new Subscription for principal, raising StreamLimitError past SSE_MAX_CONNECTIONS."""
+        app = current_app._get_current_object()
+        state = app.extensions['ticket_events']
+        subscription = Subscription(state, principal, app.config.get('SSE_BUFFER_SIZE', 100))
+        with state.lock:
+            if state.count >= app.config.get('SSE_MAX_CONNECTIONS', 100):
+                raise StreamLimitError()
+            # A forked worker doesn't inherit the parent's threads
+            if state.transport_pid != os.getpid():
+                state.transport_pid = os.getpid()
+                state.transport.start(app)
+            state.subscriptions.setdefault(principal, set()).add(subscription)
+            state.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription, once the response is closed. Unsubscribing twice does nothing."""
+        state = subscription.state
+        with state.lock:
+            subscriptions = state.subscriptions.get(subscription.principal)
+            if subscriptions is not None and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                state.count -= 1
+                if not subscriptions:
+                    del state.subscriptions[subscription.principal]
+
+    def publish(self, outbox_event):
+        """Put the event in the buffers of the streams whose principal it concerns."""
+        state = current_app.extensions.get('ticket_events')
+        if state is None or not state.subscriptions or outbox_event.aggregate_type != TICKET_AGGREGATE:
+            return
+        with state.lock:
+            subscribed = set(state.subscriptions)
+        audience = ticket_audience(outbox_event) & subscribed
+        if not audience:
+            return
+        message = format_event(outbox_event)
+        with state.lock:
+            subscriptions = [subscription for principal in audience for subscription in state.subscriptions.get(principal, ())]
+        for subscription in subscriptions:
+            subscription.put(outbox_event.id, message)
+
+
+def ticket_audience(outbox_event):
+    """The (user type, user id) principals an event of a service ticket concerns.
+
+    The ticket's customer and assigned mechanics, the mechanic of an assignment change, and for a
+    deleted or archived ticket the customer and mechanics its tombstones were written for.
+    """
+    ticket_id = outbox_event.aggregate_id
+    principals = {('customer', customer_id) for customer_id in db.session.execute(
+        select(ServiceTicket.customer_id).where(ServiceTicket.id == ticket_id)
+    ).scalars()}
+    principals.update(('mechanic', mechanic_id) for mechanic_id in db.session.execute(
+        select(ServiceMechanic.mechanic_id).where(ServiceMechanic.service_ticket_id == ticket_id)
+    ).scalars())
+    if outbox_event.event_type in REMOVAL_EVENTS:
+        for customer_id, mechanic_id in db.session.execute(
+            select(ServiceTicketTombstone.customer_id, ServiceTicketTombstone.mechanic_id)
+            .where(ServiceTicketTombstone.service_ticket_id == ticket_id)
+        ):
+            principals.add(('customer', customer_id) if customer_id is not None else ('mechanic', mechanic_id))
+    elif outbox_event.event_type in ASSIGNMENT_EVENTS and outbox_event.payload:
+        principals.add(('mechanic', json.loads(outbox_event.payload)['mechanic_id']))
+    return principals
+
+
+def format_event(outbox_event):
+    """SSE message of an event, its id is the outbox sequence clients resume from."""
+    return f"id: {outbox_event.id}\nevent: {outbox_event.event_type}\ndata: {json.dumps(event_data(outbox_event))}\n\n"
+
+
+def format_reset(reason):
+    """Tells the client to reload its tickets, e.g. with GET /service_tickets/sync, and reconnect without Last-Event-ID."""
+    return f"event: reset\ndata: {json.dumps({'reason': reason})}\n\n"
+
+
+def replay_events(user, last_event_id, limit):
+    """Up to limit events after last_event_id of the tickets the user has or had, in order.
+
+    Events of tickets the user has now or left since (their tombstones) are replayed. Events committed
+    while the replay runs with a lower sequence than it saw arrive through the subscription.
+    """
+    tickets_where, tombstones_where = sync_scope(user)
+    return db.session.execute(
+        select(OutboxEvent).where(
+            OutboxEvent.id > last_event_id,
+            OutboxEvent.aggregate_type == TICKET_AGGREGATE,
+            or_(OutboxEvent.aggregate_id.in_(select(ServiceTicket.id).where(tickets_where)),
+                OutboxEvent.aggregate_id.in_(select(ServiceTicketTombstone.service_ticket_id).where(tombstones_where))),
+        ).order_by(OutboxEvent.id).limit(limit)
+    ).scalars().all()
+
+
+def event_stream(user, subscription, last_event_id=None):
+    """The SSE messages of a stream: the replay after last_event_id, then live events and heartbeats.
+
+    The subscription is taken before the replay, so no event falls between the two, replayed events
+    are not sent again. The stream ends after SSE_MAX_STREAM_SECONDS and the client reconnects with
+    its Last-Event-ID, which spreads long-lived connections over the workers again.
+    """
+    config = current_app.config
+    heartbeat = config.get('SSE_HEARTBEAT_INTERVAL', 15)
+    replay_limit = config.get('SSE_REPLAY_LIMIT', 500)
+    deadline = time.monotonic() + config.get('SSE_MAX_STREAM_SECONDS', 300)
+    yield f"retry: {config.get('SSE_RETRY_MS', 3000)}\n\n"
+    replayed = set()
+    if last_event_id is not None:
+        events = replay_events(user, last_event_id, replay_limit + 1)
+        if len(events) > replay_limit:
+            yield format_reset('too_far_behind')
+            return
+        for outbox_event in events:
+            replayed.add(outbox_event.id)
+            yield format_event(outbox_event)
+    # Don't hold a database connection for the life of the stream
+    db.session.close()
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events = subscription.get(min(heartbeat, remaining))
+        if subscription.overflowed:
+            yield format_reset('buffer_overflow')
+            return
+        if not events:
+            # Keeps proxies from closing an idle connection and detects disconnected clients
+            yield ": heartbeat\n\n"
+            continue
+        for sequence, message in events:
+            if sequence not in replayed:
+                yield message
+
+
+ticket_events = TicketEventBroker()
+
+
+@outbox.handler()
+def _publish_ticket_event(outbox_event):
+    ticket_events.publish(outbox_event)
@@ -0,0 +1,119 @@
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, make_response
+from app.extensions import cache
+
+# Keys that currently have a background refresh running, so a burst of stale hits only refreshes once
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+STALE_WARNING = '110 - "Response is Stale"'
+REVALIDATION_FAILED_WARNING = '111 - "Revalidation Failed"'
+
+
+def stale_cache_key(path, key_prefix='swr'):
+    """Build the cache key used for a cached GET of the given path (query string included)."""
+    return f"{key_prefix}{path}"
+
+
+def _store(key, response, timeout):
+    """Save a successful response in the cache together with the time it was produced."""
+    entry = {
+        'body': response.get_data(),
+        'status': response.status_code,
+        'mimetype': response.mimetype,
+        'created': time.time(),
+    }
+    cache.set(key, entry, timeout=timeout)
+
+
+def _from_entry(entry, warning=None):
+    """Rebuild a response object from a cached entry."""
+    response = current_app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['Age'] = str(int(time.time() - entry['created']))
+    if warning:
+        response.headers['Warning'] = warning
+    return response
+
+
+def _refresh(app, environ, key, view, args, kwargs, timeout):
+    """Re-run the view in its own request context and replace the cached entry if it succeeds."""
+    try:
+        with app.request_context(environ):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _store(key, response, timeout)
+    except Exception as e:
+        app.logger.warning("Background cache refresh failed for %s: %s", key, e)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
+def _refresh_in_background(key, view, args, kwargs, timeout):
+    """Start a background refresh for the key unless one is already running."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    app = current_app._get_current_object()
+    if not current_app.config.get('CACHE_REFRESH_IN_BACKGROUND', True):
+        _refresh(app, request.environ.copy(), key, view, args, kwargs, timeout)
+        return
+    thread = threading.Thread(
+        target=_refresh,
+        args=(app, request.environ.copy(), key, view, args, kwargs, timeout),
+        daemon=True
+    )
+    thread.start()
+
+
+def stale_cached(soft_timeout=None, hard_timeout=None, key_prefix='swr'):
+    """Cache a GET view with a soft and a hard TTL.
+
+    Younger than the soft TTL the cached response is served as is. Between the soft and hard TTL the
+    stale response is served immediately while the view is re-run in the background. Past the hard TTL
+    the view runs inline, and if it fails (exception or 5xx) a stale copy is served with a Warning
+    header for up to CACHE_STALE_IF_ERROR more seconds when CACHE_SERVE_STALE_ON_ERROR is enabled.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            config = current_app.config
+            soft = soft_timeout or config.get('CACHE_SOFT_TIMEOUT', 60)
+            hard = max(hard_timeout or config.get('CACHE_HARD_TIMEOUT', 300), soft)
+            serve_stale_on_error = config.get('CACHE_SERVE_STALE_ON_ERROR', True)
+            stale_if_error = config.get('CACHE_STALE_IF_ERROR', 3600) if serve_stale_on_error else 0
+            # Entries are kept past the hard TTL only so they can be served if the database fails
+            timeout = hard + stale_if_error
+
+            key = stale_cache_key(request.full_path, key_prefix)
+            entry = cache.get(key)
+            age = time.time() - entry['created'] if entry else None
+
+            if entry and age < soft:
+                return _from_entry(entry)
+            if entry and age < hard:
+                _refresh_in_background(key, f, args, kwargs, timeout)
+                return _from_entry(entry, STALE_WARNING)
+
+            can_serve_stale = entry is not None and serve_stale_on_error and age < timeout
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception as e:
+                if not can_serve_stale:
+                    raise
+                current_app.logger.warning("Serving stale %s after error: %s", key, e)
+                return _from_entry(entry, REVALIDATION_FAILED_WARNING)
+
+            if response.status_code >= 500 and can_serve_stale:
+                current_app.logger.warning("Serving stale %s after %s response", key, response.status_code)
+                return _from_entry(entry, REVALIDATION_FAILED_WARNING)
+            if response.status_code == 200:
+                _store(key, response, timeout)
+            return response
+
+        return decorated
+    return decorator
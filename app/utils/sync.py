@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, delete, event, func, insert, inspect, literal, null, select, union_all, update
+from app.utils.replicas import RoutingSession
+from app.models import db, Customer, Mechanic, ProductServiceTicket, ServiceMechanic, ServiceTicket, ServiceTicketTombstone, SyncCounter
+
+# Delta sync of service tickets. Every change to a ticket, its mechanic assignments or its product links,
+# and to the customer and mechanics its payload embeds, stamps the ticket with the next value of the
+# service_tickets counter, and tickets leaving a user's set
+# leave a tombstone with that version. A sync token is the committed counter value: the counter row stays
+# locked until the writing transaction commits, so every version up to a committed value is visible.
+VERSION_COUNTER = 'service_tickets'
+PRUNED_COUNTER = 'service_ticket_tombstones_pruned'  # Tokens older than this version need a full sync
+VERSION_KEY = 'sync_change_version'  # session.info key of the version the current transaction writes
+
+
+class SyncTokenError(ValueError):
+    """The since token isn't a sync token of this API."""
+
+
+def transaction_version(session):
+    """The change version of the session's transaction, taken from the counter on the first write."""
+    version = session.info.get(VERSION_KEY)
+    if version is None:
+        version = session.info[VERSION_KEY] = bump_counter(session.connection(), VERSION_COUNTER)
+    return version
+
+
+def bump_counter(connection, name):
+    """Add one to the named counter and return its new value, the row stays locked until the transaction ends."""
+    table = SyncCounter.__table__
+    bump = update(table).where(table.c.name == name).values(value=table.c.value + 1)
+    if connection.dialect.update_returning:
+        value = connection.execute(bump.returning(table.c.value)).scalar()
+    elif connection.execute(bump).rowcount:
+        value = connection.execute(select(table.c.value).where(table.c.name == name)).scalar()
+    else:
+        value = None
+    if value is None:
+        # Databases built with create_all instead of the migrations start without the counter row
+        connection.execute(insert(table).values(name=name, value=1))
+        value = 1
+    return value
+
+
+def record_deleted_tickets(where):
+    """Stamp tombstones for the service tickets matching where, before a set-based delete removes them.
+
+    The ticket's customer and every assigned mechanic get a tombstone, with one INSERT ... SELECT.
+    """
+    version = literal(transaction_version(db.session()))
+    now = literal(datetime.utcnow(), DateTime)
+    ticket_ids = select(ServiceTicket.id).where(where).scalar_subquery()
+    rows = union_all(
+        select(ServiceTicket.id, ServiceTicket.customer_id, null(), version, now).where(where),
+        select(ServiceMechanic.service_ticket_id, null(), ServiceMechanic.mechanic_id, version, now)
+        .where(ServiceMechanic.service_ticket_id.in_(ticket_ids)),
+    )
+    db.session.execute(insert(ServiceTicketTombstone).from_select(
+        ['service_ticket_id', 'customer_id', 'mechanic_id', 'change_version', 'created_at'], rows
+    ))
+
+
+def record_unassigned_mechanic(mechanic_id):
+    """Stamp the tickets of a mechanic whose assignments are about to be deleted with one UPDATE."""
+    version = transaction_version(db.session())
+    ticket_ids = select(ServiceMechanic.service_ticket_id).where(ServiceMechanic.mechanic_id == mechanic_id)
+    db.session.execute(update(ServiceTicket).where(ServiceTicket.id.in_(ticket_ids)).values(change_version=version)
+                       .execution_options(synchronize_session=False))
+
+
+def sync_scope(user):
+    """(condition selecting the user's tickets, condition selecting the user's tombstones), None for other users."""
+    if user.user_type == 'customer':
+        return ServiceTicket.customer_id == user.id, ServiceTicketTombstone.customer_id == user.id
+    if user.user_type == 'mechanic':
+        assigned = select(ServiceMechanic.service_ticket_id).where(ServiceMechanic.mechanic_id == user.id)
+        return ServiceTicket.id.in_(assigned), ServiceTicketTombstone.mechanic_id == user.id
+    return None
+
+
+def read_counters(session=None):
+    """(current version, pruned version) from one SELECT of the counters."""
+    session = session or db.session
+    counters = dict(session.execute(
+        select(SyncCounter.name, SyncCounter.value).where(SyncCounter.name.in_([VERSION_COUNTER, PRUNED_COUNTER]))
+    ).all())
+    return counters.get(VERSION_COUNTER, 0), counters.get(PRUNED_COUNTER, 0)
+
+
+def parse_token(token):
+    """The version of a sync token, raising SyncTokenError if it isn't one."""
+    try:
+        version = int(token)
+    except (TypeError, ValueError):
+        raise SyncTokenError("since must be a sync_token returned by this endpoint")
+    if version < 0:
+        raise SyncTokenError("since must be a sync_token returned by this endpoint")
+    return version
+
+
+def prune_tombstones(retention_days):
+    """Delete tombstones older than retention_days, tokens from before them get a full sync. Returns how many."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    pruned_version = db.session.execute(
+        select(func.max(ServiceTicketTombstone.change_version)).where(ServiceTicketTombstone.created_at < cutoff)
+    ).scalar()
+    if pruned_version is None:
+        return 0
+    deleted = db.session.execute(
+        delete(ServiceTicketTombstone).where(ServiceTicketTombstone.change_version <= pruned_version)
+    ).rowcount
+    table = SyncCounter.__table__
+    if not db.session.execute(update(table).where(table.c.name == PRUNED_COUNTER).values(value=pruned_version)).rowcount:
+        db.session.execute(insert(table).values(name=PRUNED_COUNTER, value=pruned_version))
+    db.session.commit()
+    return deleted
+
+
+# Session hooks that stamp flushed ticket changes with the transaction's version
+@event.listens_for(RoutingSession, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    tickets = set()
+    ticket_ids = set()  # Tickets changed through their product links, not necessarily loaded
+    unassigned = set()  # (ticket, mechanic id)
+    customer_ids, mechanic_ids = set(), set()  # Renamed or otherwise changed people embedded in their tickets
+
+    def linked_ticket(link):
+        if link.service_ticket_id is None and link.service_ticket is not None:
+            tickets.add(link.service_ticket)
+        else:
+            ticket_ids.add(link.service_ticket_id)
+
+    for obj in session.new:
+        if isinstance(obj, ServiceTicket):
+            tickets.add(obj)
+        elif isinstance(obj, ProductServiceTicket):
+            linked_ticket(obj)
+    for obj in session.dirty:
+        if isinstance(obj, ServiceTicket) and session.is_modified(obj):
+            tickets.add(obj)
+            unassigned.update((obj, mechanic.id) for mechanic in inspect(obj).attrs.mechanics.history.deleted or ())
+        elif isinstance(obj, Mechanic):
+            # Assignments changed from the mechanic's side
+            history = inspect(obj).attrs.service_tickets.history
+            tickets.update(history.added or ())
+            tickets.update(history.deleted or ())
+            unassigned.update((ticket, obj.id) for ticket in history.deleted or ())
+            if _columns_changed(obj):
+                mechanic_ids.add(obj.id)
+        elif isinstance(obj, Customer) and _columns_changed(obj):
+            customer_ids.add(obj.id)
+        elif isinstance(obj, ProductServiceTicket) and session.is_modified(obj):
+            linked_ticket(obj)
+    deleted = [obj for obj in session.deleted if isinstance(obj, ServiceTicket)]
+    for obj in session.deleted:
+        if isinstance(obj, ProductServiceTicket):
+            linked_ticket(obj)
+
+    tickets.difference_update(deleted)
+    ticket_ids.difference_update({ticket.id for ticket in tickets} | {ticket.id for ticket in deleted} | {None})
+    if not (tickets or ticket_ids or unassigned or deleted or customer_ids or mechanic_ids):
+        return
+
+    version = transaction_version(session)
+    for ticket in tickets:
+        ticket.change_version = version
+    for ticket, mechanic_id in unassigned:
+        if ticket not in deleted:
+            session.add(ServiceTicketTombstone(service_ticket_id=ticket.id, mechanic_id=mechanic_id, change_version=version))
+    for ticket in deleted:
+        session.add(ServiceTicketTombstone(service_ticket_id=ticket.id, customer_id=ticket.customer_id, change_version=version))
+        session.add_all([ServiceTicketTombstone(service_ticket_id=ticket.id, mechanic_id=mechanic.id, change_version=version)
+                         for mechanic in ticket.mechanics])
+    if ticket_ids:
+        session.connection().execute(
+            update(ServiceTicket.__table__).where(ServiceTicket.__table__.c.id.in_(ticket_ids)).values(change_version=version)
+        )
+    if customer_ids:
+        session.connection().execute(
+            update(ServiceTicket.__table__).where(ServiceTicket.__table__.c.customer_id.in_(customer_ids))
+            .values(change_version=version)
+        )
+    if mechanic_ids:
+        assignments = ServiceMechanic.__table__
+        session.connection().execute(
+            update(ServiceTicket.__table__).where(ServiceTicket.__table__.c.id.in_(
+                select(assignments.c.service_ticket_id).where(assignments.c.mechanic_id.in_(mechanic_ids))
+            )).values(change_version=version)
+        )
+
+
+def _columns_changed(obj):
+    state = inspect(obj)
+    return any(state.attrs[column.key].history.has_changes() for column in state.mapper.column_attrs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    session.info.pop(VERSION_KEY, None)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop(VERSION_KEY, None)
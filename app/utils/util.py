@@ -1,11 +1,10 @@
 from datetime import datetime, timedelta, timezone
-from jose import jwt
-import jose
 from functools import wraps
 from flask import request, jsonify, current_app
-from app.models import Admin, Customer, Mechanic
+from app.models import Admin, Customer, Mechanic, db
 
 def encode_token(user_id, user_type): # uses unique pieces of information to create a token specific to the user
+    from jose import jwt # Imported on first use, python-jose and its crypto backends are slow to import
     payload = {
         'exp': datetime.now(timezone.utc) + timedelta(days=0, hours=1), # Token expires in 1 hour
         'iat': datetime.now(timezone.utc), # Issued at time
@@ -20,6 +19,51 @@ def is_testing_mode():
     from flask import current_app
     return current_app.config.get('TESTING', False)
 
+def load_token_user(token, session=None): # Decodes a token and loads its user, shared by token_required, the request profiler and the async views
+    """Return (user, None) for a valid token, with user.user_type set, or (None, error message)."""
+    from jose import jwt, JWTError # Imported on first use like in encode_token
+    secret_key = current_app.config.get('SECRET_KEY', 'default_secret_key')
+    try:
+        data = jwt.decode(token, secret_key, algorithms=['HS256']) # Decode the token using the secret key and algorithm
+        print(f"Decoded data: {data}") # Debugging line
+    except JWTError as e: # Handle JWT errors
+        print(f"JWT decode Error: {e}")
+        return None, 'Unauthorized'
+    
+    user_id = data['sub'] # Get the user ID from the decoded token
+    user_type = data['user_type'] # Get the user type from the decoded token
+    
+    # Loading appropriate user based on user_type
+    session = session or db.session
+    if user_type == 'customer':
+        user = session.get(Customer, user_id)
+    elif user_type == 'mechanic':
+        user = session.get(Mechanic, user_id)
+    elif user_type == 'admin':
+        user = session.get(Admin, user_id)
+    else:
+        print(f"Invalid user type: {user_type} in token")
+        return None, 'Invalid user type!'
+    
+    if not user:
+        print(f"User not found for ID: {user_id} and type: {user_type}")
+        return None, 'Token invalid or user not found'
+
+    # Attaching the user_type to the user object
+    user.user_type = user_type
+    return user, None
+
+def token_principal(): # The "user_type:id" of the request's bearer token without loading the user, None without a valid token
+    from jose import jwt, JWTError
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        return None
+    try:
+        data = jwt.decode(parts[1], current_app.config.get('SECRET_KEY', 'default_secret_key'), algorithms=['HS256'])
+    except JWTError:
+        return None
+    return f"{data.get('user_type')}:{data.get('sub')}"
+
 def token_required(f): # Decorator to require token for certain routes
     @wraps(f) # Preserve the original function's metadata
     def decorated(*args, **kwargs):
@@ -43,35 +87,9 @@ def token_required(f): # Decorator to require token for certain routes
 
         print(f"Decoded token: {token}")
         
-        secret_key = current_app.config.get('SECRET_KEY', 'default_secret_key')
-        try:
-            data = jwt.decode(token, secret_key, algorithms=['HS256']) # Decode the token using the secret key and algorithm
-            print(f"Decoded data: {data}") # Debugging line
-            
-            user_id = data['sub'] # Get the user ID from the decoded token
-            user_type = data['user_type'] # Get the user type from the decoded token
-            
-            # Loading appropriate user based on user_type
-            if user_type == 'customer':
-                user = Customer.query.get(user_id)
-            elif user_type == 'mechanic':
-                user = Mechanic.query.get(user_id)
-            elif user_type == 'admin':
-                user = Admin.query.get(user_id)
-            else:
-                print(f"Invalid user type: {user_type} in token")
-                return jsonify({'error': 'Invalid user type!'}), 401
-            
-            if not user:
-                print(f"User not found for ID: {user_id} and type: {user_type}")
-                return jsonify({'error': 'Token invalid or user not found'}), 401
-
-            # Attaching the user_type to the user object
-            user.user_type = user_type
-            
-        except jose.JWTError as e: # Handle JWT errors
-            print(f"JWT decode Error: {e}")
-            return jsonify({'error': 'Unauthorized'}), 401
+        user, error = load_token_user(token)
+        if error:
+            return jsonify({'error': error}), 401
 
         return f(user, *args, **kwargs) # Call the original function with the user ID
     
@@ -80,3 +98,22 @@ def token_required(f): # Decorator to require token for certain routes
 # Error handler for 404 Not Found
 def not_found(message="Resource not found."):
     return jsonify({"error": message}), 404
+
+# Commit used by write endpoints that build their response from the objects they just wrote
+def commit_keep_loaded():
+    """Commit without expiring loaded instances so dumping them afterwards doesn't reload them.
+
+    Primary keys are already set on the instances by the flush (RETURNING or lastrowid), and the models
+    only use Python-side defaults, so nothing needs refreshing. Set WRITE_RESPONSES_FROM_MEMORY to False
+    to fall back to a plain commit that expires everything.
+    """
+    session = db.session()
+    if not current_app.config.get('WRITE_RESPONSES_FROM_MEMORY', True):
+        session.commit()
+        return
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
@@ -0,0 +1,9 @@
+"""Async entrypoint: `uvicorn asgi:app`, serves the read endpoints with async views, see app/asgi.py."""
+from dotenv import load_dotenv
+# Load .env
+load_dotenv()
+
+import os
+from app.asgi import create_asgi_app
+
+app = create_asgi_app(os.getenv('FLASK_ENV', 'production'))
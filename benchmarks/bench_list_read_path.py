@@ -0,0 +1,72 @@
+"""Compare the Core record read path against Model.query.paginate for the list endpoints.
+
+Usage:
+    python -m benchmarks.bench_list_read_path --tickets 2000 --per-page 100 --repeat 20
+
+Runs against the 'benchmark' config (sqlite:///benchmark.db unless BENCHMARK_DATABASE_URI is set) and
+reports pages per second and peak traced memory for each path.
+"""
+import argparse
+import time
+import tracemalloc
+from app import create_app
+from app.models import db, Customer, ServiceTicket
+from app.blueprints.service_tickets.service_ticketsSchemas import service_tickets_schema
+from app.blueprints.customers.customersSchemas import customers_schema
+from app.utils.dataset import DatasetSpec, generate_dataset
+from app.utils.rows import paginate_records, fetch_service_ticket_records
+
+
+def seed(tickets, seed_value=42):
+    """Recreate the tables and fill them with the synthetic data set, one customer per 20 tickets."""
+    generate_dataset(DatasetSpec(customers=max(tickets // 20, 1), tickets=tickets, seed=seed_value))
+
+
+def measure(app, path, model, schema, per_page, repeat, loader=None):
+    """Time and trace memory for reading and dumping every page of a list endpoint."""
+    app.config['LIST_READ_PATH'] = path
+    base_query = model.query.order_by(model.id)
+    total = base_query.count()
+    pages = (total + per_page - 1) // per_page
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in range(1, pages + 1):
+            pagination = paginate_records(base_query, model, page, per_page, total, loader=loader)
+            schema.dump(pagination.items)
+            db.session.remove()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pages_per_second": round(pages * repeat / elapsed, 1),
+        "rows_per_second": round(total * repeat / elapsed, 1),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--per-page', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('benchmark')
+    with app.app_context():
+        seed(args.tickets)
+        cases = [
+            ("service_tickets", ServiceTicket, service_tickets_schema, fetch_service_ticket_records),
+            ("customers", Customer, customers_schema, None),
+        ]
+        for name, model, schema, loader in cases:
+            for path in ('orm', 'core'):
+                result = measure(app, path, model, schema, args.per_page, args.repeat, loader)
+                print(f"{name:16} {path:5} {result['pages_per_second']:>10} pages/s "
+                      f"{result['rows_per_second']:>12} rows/s {result['peak_memory_kib']:>10} KiB peak")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Compare per-worker memory of gunicorn with and without preloading the app in the master (Linux only).
+
+Usage:
+    python -m benchmarks.bench_prefork --workers 4 --requests 200
+
+Starts gunicorn -c gunicorn.conf.py against the 'benchmark' config twice, once with GUNICORN_PRELOAD=0,
+sends the same requests to both and reports each worker's unique (USS) and proportional (PSS) memory
+from /proc/<pid>/smaps_rollup. With preloading the shared part moves out of USS into the master.
+"""
+import argparse
+import http.client
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_kib(pid):
+    """(USS, PSS) of a process in KiB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values.get('Private_Clean', 0) + values.get('Private_Dirty', 0), values.get('Pss', 0)
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def wait_for_server(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/inventory/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"gunicorn did not answer on port {port}")
+
+
+def send_requests(port, count):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    for i in range(count):
+        path = ['/inventory/', '/service_tickets/?page=1&per_page=50', '/mechanics/', '/customers/'][i % 4]
+        connection.request('GET', path)
+        connection.getresponse().read()
+
+
+def measure(preload, workers, requests, port):
+    env = dict(os.environ, FLASK_ENV='benchmark', GUNICORN_PRELOAD='1' if preload else '0',
+               WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{port}')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=PROJECT_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port)
+        send_requests(port, requests)
+        time.sleep(1)
+        usage = [memory_kib(pid) for pid in worker_pids(server.pid)]
+        return {
+            "workers": len(usage),
+            "uss_kib": statistics.mean(uss for uss, _ in usage),
+            "pss_kib": statistics.mean(pss for _, pss in usage),
+            "master_pss_kib": memory_kib(server.pid)[1],
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help="Requests sent before measuring")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        result = measure(preload, args.workers, args.requests, args.port)
+        total = result['master_pss_kib'] + result['pss_kib'] * result['workers']
+        print(f"preload={'on ' if preload else 'off'}  workers {result['workers']}  "
+              f"per-worker USS {result['uss_kib'] / 1024:7.1f} MiB  PSS {result['pss_kib'] / 1024:7.1f} MiB  "
+              f"total PSS {total / 1024:7.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
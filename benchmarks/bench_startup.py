@@ -0,0 +1,82 @@
+"""Measure cold start: importing the app package and creating the app, each in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 1000
+    python -m benchmarks.bench_startup --config benchmark --imports 15
+
+Reports the median wall time of `import app` and of `create_app(config)` (including the import) over
+--runs interpreters, and exits with status 1 if create_app goes over --budget-ms. --imports lists the
+slowest top-level imports from `python -X importtime` to show where startup time goes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_app_ms": (created - start) * 1000}))
+"""
+
+
+def measure_once(config):
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT, config],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(count):
+    """Top-level modules imported by `import app`, slowest first, as (module, cumulative ms)."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Two spaces of indent are the modules app imports directly
+        if name.startswith('  ') and not name.startswith('    '):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='testing')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--imports', type=int, default=10, help="How many of the slowest imports to list, 0 for none")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.config) for _ in range(args.runs)]
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    create_app_ms = statistics.median(run['create_app_ms'] for run in runs)
+    print(f"import app                {import_ms:>8.1f} ms (median of {args.runs})")
+    print(f"create_app('{args.config}')  {create_app_ms:>8.1f} ms (median of {args.runs}, includes the import)")
+
+    if args.imports:
+        print("\nSlowest imports of the app package:")
+        for name, ms in slowest_imports(args.imports):
+            print(f"  {name:40} {ms:>8.1f} ms")
+
+    if create_app_ms > args.budget_ms:
+        print(f"\nStartup of {create_app_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print(f"\nStartup is within the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+from sqlalchemy import func, select
+from app import create_app
+from app.extensions import cache
+from app.models import db, ProductServiceTicket, ServiceMechanic
+from loadtest.seed import seed_database
+
+
+class Fixtures:
+    """The app and the ids of the seeded rows the microbenchmarks run against."""
+
+    def __init__(self, app, customer_id, product_id, busiest_ticket_id, tickets):
+        self.app = app
+        self.customer_id = customer_id
+        self.product_id = product_id
+        self.busiest_ticket_id = busiest_ticket_id  # Ticket with the most mechanics and product links
+        self.tickets = tickets
+
+
+def build_fixtures(tickets=2000, seed=42):
+    """Create the 'benchmark' app and seed it with the synthetic data set at the given number of tickets.
+
+    The response cache is switched to an in-process SimpleCache so cache hit paths can be measured.
+    Returns with an app context pushed for the benchmarks to run in.
+    """
+    app = create_app('benchmark')
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    app.app_context().push()
+
+    seed_data = seed_database(tickets=tickets, seed=seed)
+
+    links = (select(ProductServiceTicket.service_ticket_id, func.count().label('links'))
+             .group_by(ProductServiceTicket.service_ticket_id).subquery())
+    busiest_ticket_id = db.session.execute(
+        select(ServiceMechanic.service_ticket_id)
+        .join(links, links.c.service_ticket_id == ServiceMechanic.service_ticket_id)
+        .order_by(links.c.links.desc(), ServiceMechanic.service_ticket_id)
+        .limit(1)
+    ).scalar_one()
+
+    return Fixtures(app, seed_data.customers[0][0], seed_data.product_ids[0], busiest_ticket_id, len(seed_data.ticket_ids))
@@ -0,0 +1,198 @@
+"""Microbenchmarks of the serialization, auth, pagination and cache hot paths, with stored baselines.
+
+Usage:
+    python -m benchmarks.micro run                          # print timings
+    python -m benchmarks.micro run --output results.json    # also write them
+    python -m benchmarks.micro run --save-baseline          # overwrite benchmarks/baseline.json
+    python -m benchmarks.micro run --filter auth.
+    python -m benchmarks.micro compare results.json --threshold 0.25
+
+Each benchmark is timed as --repeat samples of a fixed number of calls after a warmup, and the median
+time per call is reported. compare exits with status 1 if any benchmark got slower than the baseline
+by more than --threshold (a fraction, 0.25 = 25%). Baselines only mean something on the machine that
+recorded them, re-record them after changing hardware or Python version. compare refuses, with status 2,
+results recorded with a different --tickets, Python version or machine than the baseline, unless
+--allow-mismatch is given.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def time_benchmark(run, number, repeat, warmup=1):
+    """Return per-call timings in microseconds over repeat samples of number calls each."""
+    for _ in range(warmup):
+        run()
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                run()
+            samples.append((time.perf_counter() - start) / number * 1e6)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "calls": number * repeat,
+    }
+
+
+def run_suite(name_filter=None, repeat=7, tickets=2000, seed=42):
+    """Seed the fixtures and time every registered benchmark whose name contains name_filter."""
+    from benchmarks.fixtures import build_fixtures
+    from benchmarks.suite import BENCHMARKS
+    from app.models import db
+
+    fixtures = build_fixtures(tickets=tickets, seed=seed)
+    results = {}
+    # The views and token_required print debugging output on every call, keep it out of the timings
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, (setup, number) in BENCHMARKS.items():
+            if name_filter and name_filter not in name:
+                continue
+            run = setup(fixtures)
+            results[name] = time_benchmark(run, number, repeat)
+            db.session.remove()
+
+    return {
+        "benchmarks": results,
+        "run": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "tickets": fixtures.tickets,
+            "repeat": repeat,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+    }
+
+
+def run_mismatches(results, baseline):
+    """Return (field, baseline value, current value) for each run parameter that differs from the baseline.
+
+    The fixture size changes what most benchmarks measure, e.g. a page past the last ticket is empty,
+    and timings of different Python minor versions or machines aren't comparable.
+    """
+    base_run, current_run = baseline.get("run", {}), results.get("run", {})
+    mismatches = []
+    for field in ('tickets', 'python', 'machine'):
+        base_value, current_value = base_run.get(field), current_run.get(field)
+        if field == 'python':
+            # Patch releases don't move the timings, minor versions do
+            base_value, current_value = (value and '.'.join(value.split('.')[:2]) for value in (base_value, current_value))
+        if base_value != current_value:
+            mismatches.append((field, base_value, current_value))
+    return mismatches
+
+
+def compare(results, baseline, threshold):
+    """Return (rows, regressions) comparing median timings; a ratio above 1 + threshold is a regression."""
+    rows, regressions = [], []
+    for name, current in sorted(results["benchmarks"].items()):
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            rows.append((name, None, current["median_us"], None, 'new'))
+            continue
+        ratio = current["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        status = 'REGRESSION' if ratio > 1 + threshold else ('faster' if ratio < 1 - threshold else 'ok')
+        rows.append((name, base["median_us"], current["median_us"], ratio, status))
+        if status == 'REGRESSION':
+            regressions.append(name)
+    return rows, regressions
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def print_results(results):
+    for name, stats in results["benchmarks"].items():
+        print(f"{name:40} {stats['median_us']:>14.3f} us/call  (min {stats['min_us']:.3f}, stdev {stats['stdev_us']:.3f})")
+
+
+def print_comparison(rows):
+    for name, base, current, ratio, status in rows:
+        base_text = f"{base:.3f}" if base is not None else '-'
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else '-'
+        print(f"{name:40} {base_text:>14} -> {current:>14.3f} us  {ratio_text:>7}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the microbenchmarks")
+    run_parser.add_argument('--filter', help="Only run benchmarks whose name contains this text")
+    run_parser.add_argument('--repeat', type=int, default=7)
+    run_parser.add_argument('--tickets', type=int, default=2000)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', help="Write the results to this JSON file")
+    run_parser.add_argument('--save-baseline', action='store_true', help=f"Store the results as {BASELINE_PATH}")
+    run_parser.add_argument('--threshold', type=float, default=0.25, help="Regression threshold used with --compare")
+    run_parser.add_argument('--compare', action='store_true', help="Compare against the baseline after running")
+    run_parser.add_argument('--allow-mismatch', action='store_true',
+                            help="Compare even if the run parameters differ from the baseline's")
+
+    compare_parser = commands.add_parser('compare', help="Compare stored results against the baseline")
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--baseline', default=BASELINE_PATH)
+    compare_parser.add_argument('--threshold', type=float, default=0.25)
+    compare_parser.add_argument('--allow-mismatch', action='store_true',
+                                help="Compare even if the run parameters differ from the baseline's")
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_suite(args.filter, args.repeat, args.tickets, args.seed)
+        print_results(results)
+        if args.output:
+            write_json(args.output, results)
+        if args.save_baseline:
+            write_json(BASELINE_PATH, results)
+            print(f"Baseline written to {BASELINE_PATH}")
+        if not args.compare:
+            return
+        baseline_path, threshold = BASELINE_PATH, args.threshold
+    else:
+        results = load_json(args.results)
+        baseline_path, threshold = args.baseline, args.threshold
+
+    baseline = load_json(baseline_path)
+    mismatches = run_mismatches(results, baseline)
+    for field, base_value, current_value in mismatches:
+        print(f"Run parameter {field} differs from the baseline: {base_value} -> {current_value}")
+    if mismatches and not args.allow_mismatch:
+        print("Refusing to compare, re-record the baseline or pass --allow-mismatch")
+        sys.exit(2)
+
+    rows, regressions = compare(results, baseline, threshold)
+    print_comparison(rows)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"No regressions beyond {threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Microbenchmarks for the serialization, auth, pagination and cache hot paths.
+
+Each benchmark is a setup function registered with @benchmark. It receives the Fixtures of the seeded
+benchmark database, runs inside an app context and returns the zero-argument callable that gets timed.
+"""
+from sqlalchemy.orm import selectinload, joinedload
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.models import ServiceTicket
+from app.blueprints.service_tickets.service_ticketsSchemas import service_ticket_schema, service_tickets_schema
+from app.utils.catalog import product_catalog
+from app.utils.rows import paginate_records, fetch_service_ticket_records
+from app.utils.util import encode_token, token_required
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number=100):
+    """Register a benchmark setup function; number is how many calls make up one timed sample."""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return decorator
+
+
+def _eager_ticket(ticket_id):
+    return (ServiceTicket.query
+            .options(joinedload(ServiceTicket.customer), selectinload(ServiceTicket.mechanics),
+                     selectinload(ServiceTicket.product_links))
+            .filter_by(id=ticket_id).one())
+
+
+# ---------------------- Serialization ----------------------
+@benchmark('schema.dump_ticket', number=500)
+def dump_ticket(context):
+    ticket = _eager_ticket(context.busiest_ticket_id)
+    return lambda: service_ticket_schema.dump(ticket)
+
+
+@benchmark('schema.dump_ticket_page_records', number=20)
+def dump_ticket_page_records(context):
+    tickets = fetch_service_ticket_records(limit=50)
+    return lambda: service_tickets_schema.dump(tickets)
+
+
+# ---------------------- Auth ----------------------
+@benchmark('auth.encode_token', number=1000)
+def encode(context):
+    return lambda: encode_token(context.customer_id, 'customer')
+
+
+@benchmark('auth.token_required', number=200)
+def token_required_path(context):
+    token = encode_token(context.customer_id, 'customer')
+    view = token_required(lambda user: user.id)
+
+    def run():
+        with context.app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+            view()
+    return run
+
+
+@benchmark('auth.password_hash', number=1)
+def password_hash(context):
+    return lambda: generate_password_hash('password123')
+
+
+@benchmark('auth.password_verify', number=1)
+def password_verify(context):
+    hashed = generate_password_hash('password123')
+    return lambda: check_password_hash(hashed, 'password123')
+
+
+# ---------------------- Pagination ----------------------
+def _page_benchmark(page):
+    def setup(context):
+        base_query = ServiceTicket.query.order_by(ServiceTicket.id)
+        total = base_query.count()
+
+        def run():
+            pagination = paginate_records(base_query, ServiceTicket, page, 10, total, loader=fetch_service_ticket_records)
+            service_tickets_schema.dump(pagination.items)
+        return run
+    return setup
+
+
+for _page in (1, 10, 100):
+    benchmark(f'pagination.tickets_page_{_page}', number=20)(_page_benchmark(_page))
+
+
+@benchmark('pagination.count_tickets', number=50)
+def count_tickets(context):
+    return lambda: ServiceTicket.query.count()
+
+
+# ---------------------- Cache hits ----------------------
+@benchmark('cache.get_service_ticket_hit', number=200)
+def stale_cache_hit(context):
+    client = context.app.test_client()
+    path = f'/service_tickets/{context.busiest_ticket_id}'
+    client.get(path)
+    return lambda: client.get(path)
+
+
+@benchmark('cache.catalog_lookup', number=5000)
+def catalog_lookup(context):
+    product_id = context.product_id
+    product_catalog.snapshot()
+    return lambda: product_catalog.price(product_id)
@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+"""gunicorn settings for the pre-fork production server: gunicorn -c gunicorn.conf.py
+
+The app is created and warmed up once in the master (preload_app), the heap is frozen out of the
+GC right before each fork and every worker drops the inherited database pool, so workers share the
+master's memory copy-on-write and only allocate what their own requests need.
+
+Workers are threaded: an SSE stream of GET /service_tickets/stream holds its thread for up to
+SSE_MAX_STREAM_SECONDS, which a sync worker would spend blocked past its timeout. A gthread worker keeps
+notifying the master from its main loop, so the timeout only catches a hung worker, and every worker caps
+its streams below its threads (see limit_streams) so the other requests always have a thread left.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))  # WEB_THREADS in app/config.py sizes the database pools from it
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))  # Recycling workers also gives back copied pages
+max_requests_jitter = max_requests // 10
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from app.utils.prefork import freeze_heap
+        freeze_heap()
+
+
+def post_fork(server, worker):
+    from app.utils.sse import limit_streams
+    from wsgi import app
+    if preload_app:
+        from app.utils.prefork import after_fork
+        after_fork(app)
+    limit_streams(app, server.cfg.threads)
+    if server.cfg.threads > app.config.get('WEB_THREADS', server.cfg.threads):
+        server.log.warning("Workers run %s threads but the database pools are sized for %s, set GUNICORN_THREADS instead of --threads",
+                           server.cfg.threads, app.config['WEB_THREADS'])
@@ -0,0 +1,195 @@
+"""Run weighted load-test scenarios built from the bundled Postman collections.
+
+Usage:
+    python -m loadtest --concurrency 8 --duration 30
+    python -m loadtest --collection Module1_Project.postman_collection.json --weights list_tickets=10,login=0
+    python -m loadtest --target http://127.0.0.1:5000 --seed --config development --yes
+
+Without --target the app runs in-process against the 'benchmark' config, seeded first. With --target
+requests go over HTTP; --seed then seeds the database of --config, which must be the one the server uses.
+Seeding drops the tables first, for any config other than 'benchmark' it asks unless --yes is given.
+The report (per-endpoint p50/p95/p99 latency, throughput and error rate) is written as sorted JSON.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from app import create_app
+from loadtest.postman import load_collection
+from loadtest.report import summarize, write_report
+from loadtest.scenarios import build_scenarios, SCENARIO_SPECS
+from loadtest.seed import seed_database, load_seed_data, SEED_PASSWORD
+
+
+class InProcessClient:
+    """Sends calls through the Flask test client, no network involved."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Sends calls to a running server over a kept-alive HTTP connection."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.connection = None
+
+    def send(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def parse_weights(raw):
+    """Parse 'login=1,list_tickets=5' into a dict."""
+    weights = {}
+    for part in filter(None, (raw or '').split(',')):
+        name, _, value = part.partition('=')
+        if name not in SCENARIO_SPECS:
+            raise SystemExit(f"Unknown scenario '{name}', expected one of: {', '.join(SCENARIO_SPECS)}")
+        weights[name] = float(value)
+    return weights
+
+
+def fetch_tokens(client, seed_data, count):
+    """Log in as a sample of seeded customers and return their tokens."""
+    tokens = []
+    for _, email in seed_data.customers[:count]:
+        status, data = client.send('POST', '/auth/login', {"email": email, "password": SEED_PASSWORD})
+        if status == 200 and data:
+            tokens.append(data['auth_token'])
+    if not tokens:
+        raise SystemExit("Could not log in as any seeded customer, is the database seeded?")
+    return tokens
+
+
+def run_worker(client, scenarios, seed_data, tokens, rng, deadline, budget, records, lock):
+    weights = [scenario.weight for scenario in scenarios]
+    local = []
+    while time.perf_counter() < deadline and budget():
+        call = rng.choices(scenarios, weights)[0].next_call(rng, seed_data, tokens)
+        start = time.perf_counter()
+        try:
+            status, _ = client.send(call.method, call.path, call.body, call.headers)
+        except Exception:
+            status = 0
+        latency = time.perf_counter() - start
+        local.append((call.label, status, latency, status in call.expected))
+    with lock:
+        records.extend(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--collection', default='MechanicShop.postman_collection.json')
+    parser.add_argument('--target', help="Base URL of a running server, e.g. http://127.0.0.1:5000")
+    parser.add_argument('--config', default='benchmark', help="App config used for seeding and in-process runs")
+    parser.add_argument('--seed', action='store_true', help="Seed the database before an HTTP run (always done in-process)")
+    parser.add_argument('--yes', action='store_true', help="Don't ask before seeding a non-benchmark database")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to run")
+    parser.add_argument('--requests', type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument('--weights', help="Override scenario weights, e.g. login=1,list_tickets=5,add_product=0")
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--output', default='loadtest-report.json')
+    args = parser.parse_args()
+
+    scenarios, skipped = build_scenarios(load_collection(args.collection), parse_weights(args.weights))
+    if skipped:
+        print(f"Scenarios not found in {args.collection}, skipped: {', '.join(skipped)}", file=sys.stderr)
+    if not scenarios:
+        raise SystemExit("No scenarios to run")
+
+    seed = args.seed or not args.target
+    if seed and args.config != 'benchmark' and not args.yes:
+        answer = input(f"Drop every table of the '{args.config}' database and fill it with generated data? [y/N] ")
+        if answer.strip().lower() not in ('y', 'yes'):
+            raise SystemExit("Aborted")
+
+    app = create_app(args.config)
+    with app.app_context():
+        if seed:
+            seed_data = seed_database(customers=args.customers, tickets=args.tickets, seed=args.random_seed)
+        else:
+            seed_data = load_seed_data()
+
+    def make_client():
+        return HttpClient(args.target) if args.target else InProcessClient(app)
+
+    records, lock = [], threading.Lock()
+    sent = iter(range(args.requests)) if args.requests else None
+
+    def budget():
+        return sent is None or next(sent, None) is not None
+
+    # The views print debugging output on every request, keep it out of the run
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tokens = fetch_tokens(make_client(), seed_data, min(args.concurrency * 4, len(seed_data.customers)))
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=run_worker, args=(
+                make_client(), scenarios, seed_data, tokens, random.Random(args.random_seed + index),
+                deadline, budget, records, lock))
+            for index in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    report = summarize(records, elapsed)
+    report["run"] = {
+        "collection": os.path.basename(args.collection),
+        "mode": "http" if args.target else "in-process",
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "scenarios": {scenario.name: scenario.weight for scenario in scenarios},
+        "started_at": started_at.isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+    }
+    write_report(args.output, report)
+
+    for label, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{label:45} {stats['requests']:>7} req {stats['throughput_rps']:>9} rps  "
+              f"p50 {latency['p50']:>8} p95 {latency['p95']:>8} p99 {latency['p99']:>8} ms  errors {stats['error_rate']:.2%}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import json
+import re
+from urllib.parse import urlencode
+
+# Numeric path segments are treated as ids so requests can be matched and relabelled per endpoint
+_ID_SEGMENT = re.compile(r'^\d+$')
+
+
+class PostmanRequest:
+    """A single request from a Postman collection, with the host stripped from its URL."""
+    __slots__ = ('name', 'method', 'segments', 'query', 'body', 'headers')
+
+    def __init__(self, name, method, segments, query, body, headers):
+        self.name = name
+        self.method = method
+        self.segments = segments
+        self.query = query
+        self.body = body
+        self.headers = headers
+
+    @property
+    def template(self):
+        """Path with ids replaced by {id}, e.g. /service_tickets/{id}/add_product."""
+        return '/' + '/'.join('{id}' if _ID_SEGMENT.match(segment) else segment for segment in self.segments)
+
+    def path(self, ids=(), query=None):
+        """Build the request path, filling the id segments in order and overriding query values."""
+        ids = list(ids)
+        segments = [str(ids.pop(0)) if ids and _ID_SEGMENT.match(segment) else segment for segment in self.segments]
+        path = '/' + '/'.join(segments)
+        params = {**self.query, **(query or {})}
+        return f"{path}?{urlencode(params)}" if params else path
+
+    def __repr__(self):
+        return f"<PostmanRequest {self.method} {self.template} {self.name!r}>"
+
+
+def _walk(items):
+    for item in items:
+        if 'item' in item:
+            yield from _walk(item['item'])
+        elif 'request' in item:
+            yield item
+
+
+def load_collection(path):
+    """Parse a Postman v2.1 collection file into a flat list of PostmanRequest objects."""
+    with open(path, encoding='utf-8') as f:
+        collection = json.load(f)
+
+    requests = []
+    for item in _walk(collection.get('item', [])):
+        request = item['request']
+        url = request.get('url', {})
+        if isinstance(url, str):
+            url = {'raw': url}
+        segments = url.get('path') or [part for part in re.sub(r'^\w+://[^/]+', '', url.get('raw', '')).split('?')[0].split('/') if part]
+        query = {param['key']: param.get('value', '') for param in url.get('query', []) if not param.get('disabled')}
+
+        body = None
+        raw_body = (request.get('body') or {}).get('raw')
+        if raw_body and raw_body.strip():
+            try:
+                body = json.loads(raw_body)
+            except ValueError:
+                body = None
+        headers = {header['key']: header['value'] for header in request.get('header', []) if not header.get('disabled')}
+
+        requests.append(PostmanRequest(item['name'], request.get('method', 'GET').upper(), [s for s in segments if s], query, body, headers))
+    return requests
+
+
+def find_request(requests, method, template):
+    """Return the first request in a collection with the given method and path template, or None."""
+    for request in requests:
+        if request.method == method and request.template.rstrip('/') == template.rstrip('/'):
+            return request
+    return None
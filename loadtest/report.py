@@ -0,0 +1,57 @@
+import json
+import math
+from collections import defaultdict
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(records, elapsed):
+    """Aggregate (label, status, latency seconds, ok) records into per-endpoint statistics."""
+    by_label = defaultdict(list)
+    for record in records:
+        by_label[record[0]].append(record)
+
+    endpoints = {}
+    for label, rows in sorted(by_label.items()):
+        latencies = sorted(row[2] * 1000 for row in rows)
+        errors = sum(1 for row in rows if not row[3])
+        statuses = defaultdict(int)
+        for row in rows:
+            statuses[str(row[1])] += 1
+        endpoints[label] = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4),
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 2),
+                "p50": round(percentile(latencies, 50), 2),
+                "p95": round(percentile(latencies, 95), 2),
+                "p99": round(percentile(latencies, 99), 2),
+                "max": round(latencies[-1], 2),
+            },
+            "status_codes": dict(sorted(statuses.items())),
+        }
+
+    total = len(records)
+    total_errors = sum(1 for record in records if not record[3])
+    return {
+        "requests": total,
+        "errors": total_errors,
+        "error_rate": round(total_errors / total, 4) if total else 0,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+        "endpoints": endpoints,
+    }
+
+
+def write_report(path, report):
+    """Write a report as stable, sorted JSON so reports from two releases diff cleanly."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
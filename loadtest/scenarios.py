@@ -0,0 +1,85 @@
+from loadtest.postman import find_request
+from loadtest.seed import SEED_PASSWORD
+
+
+class Call:
+    """A concrete request ready to be sent by a client."""
+    __slots__ = ('method', 'path', 'body', 'headers', 'label', 'expected')
+
+    def __init__(self, method, path, body, headers, label, expected):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.headers = headers
+        self.label = label
+        self.expected = expected
+
+
+class Scenario:
+    """A weighted scenario built around one request of a Postman collection.
+
+    The collection supplies the method, path and body shape; build() fills in ids, credentials and
+    tokens from the seeded data so every call hits rows that exist.
+    """
+
+    def __init__(self, name, weight, request, build, expected=(200,)):
+        self.name = name
+        self.weight = weight
+        self.request = request
+        self.build = build
+        self.expected = expected
+
+    def next_call(self, rng, seed_data, tokens):
+        path, body, headers = self.build(self.request, rng, seed_data, tokens)
+        return Call(self.request.method, path, body, {**headers}, f"{self.request.method} {self.request.template}", self.expected)
+
+
+def _login(request, rng, seed_data, tokens):
+    _, email = rng.choice(seed_data.customers)
+    return request.path(), {**(request.body or {}), "email": email, "password": SEED_PASSWORD}, {}
+
+
+def _list_tickets(request, rng, seed_data, tokens):
+    pages = max(len(seed_data.ticket_ids) // 10, 1)
+    return request.path(query={"page": rng.randint(1, pages), "per_page": 10}), None, {}
+
+
+def _my_tickets(request, rng, seed_data, tokens):
+    return request.path(), None, {"Authorization": f"Bearer {rng.choice(tokens)}"}
+
+
+def _add_product(request, rng, seed_data, tokens):
+    body = {**(request.body or {}), "product_id": rng.choice(seed_data.product_ids), "quantity": rng.randint(1, 4)}
+    return request.path(ids=[rng.choice(seed_data.ticket_ids)]), body, {}
+
+
+def _search(request, rng, seed_data, tokens):
+    _, name = rng.choice(seed_data.mechanics)
+    return request.path(query={"name": name.split()[0]}), None, {}
+
+
+# name: (default weight, method, path template in the collection, builder, expected status codes)
+SCENARIO_SPECS = {
+    'login': (1, 'POST', '/auth/login', _login, (200,)),
+    'list_tickets': (5, 'GET', '/service_tickets', _list_tickets, (200,)),
+    'my_tickets': (3, 'GET', '/service_tickets/my-tickets', _my_tickets, (200,)),
+    # Adding a product that is already linked is a 400 by design, not a failure
+    'add_product': (1, 'PUT', '/service_tickets/{id}/add_product', _add_product, (201, 400)),
+    'search': (2, 'GET', '/mechanics/search', _search, (200,)),
+}
+
+
+def build_scenarios(collection_requests, weights=None):
+    """Build the scenarios whose request exists in the collection, returning them and the names skipped."""
+    weights = weights or {}
+    scenarios, skipped = [], []
+    for name, (default_weight, method, template, build, expected) in SCENARIO_SPECS.items():
+        weight = weights.get(name, default_weight)
+        if weight <= 0:
+            continue
+        request = find_request(collection_requests, method, template)
+        if request is None:
+            skipped.append(name)
+            continue
+        scenarios.append(Scenario(name, weight, request, build, expected))
+    return scenarios, skipped
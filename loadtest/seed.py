@@ -0,0 +1,33 @@
+from sqlalchemy import select
+from app.models import db, Customer, Mechanic, Product, ServiceTicket
+from app.utils.dataset import DatasetSpec, generate_dataset
+
+# Every seeded customer and mechanic shares this password so scenarios can log in as any of them
+SEED_PASSWORD = 'password123'
+
+
+class SeedData:
+    """Ids and login details of the rows the scenarios pick from."""
+
+    def __init__(self, customers, mechanics, product_ids, ticket_ids):
+        self.customers = customers  # list of (id, email)
+        self.mechanics = mechanics  # list of (id, name)
+        self.product_ids = product_ids
+        self.ticket_ids = ticket_ids
+
+
+def seed_database(customers=200, mechanics=20, products=100, tickets=2000, seed=42):
+    """Recreate the tables and fill them with a deterministic synthetic data set for load testing."""
+    generate_dataset(DatasetSpec(customers=customers, mechanics=mechanics, products=products, tickets=tickets,
+                                 seed=seed, email_domain='loadtest.com', password=SEED_PASSWORD))
+    return load_seed_data()
+
+
+def load_seed_data():
+    """Read the ids the scenarios need from an already seeded database."""
+    return SeedData(
+        customers=[tuple(row) for row in db.session.execute(select(Customer.id, Customer.email).order_by(Customer.id))],
+        mechanics=[tuple(row) for row in db.session.execute(select(Mechanic.id, Mechanic.name).order_by(Mechanic.id))],
+        product_ids=list(db.session.execute(select(Product.id).order_by(Product.id)).scalars()),
+        ticket_ids=list(db.session.execute(select(ServiceTicket.id).order_by(ServiceTicket.id)).scalars()),
+    )
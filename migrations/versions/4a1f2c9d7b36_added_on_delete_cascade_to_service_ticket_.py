@@ -0,0 +1,53 @@
+"""Added ON DELETE CASCADE to service ticket, mechanic assignment and product link foreign keys
+
+Revision ID: 4a1f2c9d7b36
+Revises: cdc91d0560d5
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a1f2c9d7b36'
+down_revision = 'cdc91d0560d5'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table, name of the recreated constraint)
+CASCADING_FOREIGN_KEYS = [
+    ('service_tickets', 'customer_id', 'customers', 'fk_service_tickets_customer_id'),
+    ('service_mechanics', 'service_ticket_id', 'service_tickets', 'fk_service_mechanics_service_ticket_id'),
+    ('service_mechanics', 'mechanic_id', 'mechanics', 'fk_service_mechanics_mechanic_id'),
+    ('inventory_service_tickets', 'service_ticket_id', 'service_tickets', 'fk_inventory_service_tickets_service_ticket_id'),
+]
+
+
+def _foreign_key_name(table, column):
+    # The original constraints were created without explicit names (e.g. service_tickets_ibfk_1 on MySQL)
+    inspector = sa.inspect(op.get_bind())
+    for foreign_key in inspector.get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column]:
+            return foreign_key['name']
+    return None
+
+
+def _replace_foreign_keys(ondelete):
+    # SQLite tables are created with db.create_all() and SQLite can't alter constraints in place
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    for table, column, referenced_table, name in CASCADING_FOREIGN_KEYS:
+        existing_name = _foreign_key_name(table, column)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if existing_name:
+                batch_op.drop_constraint(existing_name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referenced_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
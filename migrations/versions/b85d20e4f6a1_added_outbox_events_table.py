@@ -0,0 +1,32 @@
+"""Added outbox_events table for the service ticket change feed
+
+Revision ID: b85d20e4f6a1
+Revises: 7c3e5a1d9b42
+Create Date: 2026-10-19 14:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b85d20e4f6a1'
+down_revision = '7c3e5a1d9b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('aggregate_type', sa.String(length=30), nullable=False),
+    sa.Column('aggregate_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('outbox_events')
@@ -0,0 +1,51 @@
+"""Added service_tickets.change_version, sync_counters and service_ticket_tombstones for delta sync
+
+Revision ID: d3a9f6b2c871
+Revises: b85d20e4f6a1
+Create Date: 2026-10-19 16:41:09.374215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a9f6b2c871'
+down_revision = 'b85d20e4f6a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing tickets start at version 0, a first sync without ?since= returns them all
+    op.add_column('service_tickets', sa.Column('change_version', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_service_tickets_change_version', 'service_tickets', ['change_version'], unique=False)
+    sync_counters = op.create_table('sync_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(sync_counters, [
+        {'name': 'service_tickets', 'value': 0},
+        {'name': 'service_ticket_tombstones_pruned', 'value': 0},
+    ])
+    op.create_table('service_ticket_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('service_ticket_id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('mechanic_id', sa.Integer(), nullable=True),
+    sa.Column('change_version', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_service_ticket_tombstones_customer_version', 'service_ticket_tombstones', ['customer_id', 'change_version'], unique=False)
+    op.create_index('ix_service_ticket_tombstones_mechanic_version', 'service_ticket_tombstones', ['mechanic_id', 'change_version'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_service_ticket_tombstones_mechanic_version', table_name='service_ticket_tombstones')
+    op.drop_index('ix_service_ticket_tombstones_customer_version', table_name='service_ticket_tombstones')
+    op.drop_table('service_ticket_tombstones')
+    op.drop_table('sync_counters')
+    op.drop_index('ix_service_tickets_change_version', table_name='service_tickets')
+    op.drop_column('service_tickets', 'change_version')
@@ -0,0 +1,63 @@
+"""Added the service ticket archive tables and an index on service_tickets.service_date
+
+Revision ID: e5b8c1f47a20
+Revises: d3a9f6b2c871
+Create Date: 2026-10-19 18:12:37.506118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c1f47a20'
+down_revision = 'd3a9f6b2c871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Archival looks up the tickets before a service_date cutoff
+    op.create_index('ix_service_tickets_service_date', 'service_tickets', ['service_date'], unique=False)
+    if op.get_bind().dialect.name == 'sqlite':
+        # Without AUTOINCREMENT SQLite hands out the id of an archived ticket again. MySQL 8.0+ and MariaDB 10.2.4+
+        # keep their counter, older versions reset it to max(id) + 1 on a restart, archive_service_tickets refuses to run on them
+        for table in ('service_tickets', 'inventory_service_tickets'):
+            with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+                pass
+    # No foreign keys, so the archive can be partitioned by service_date on MySQL
+    op.create_table('service_tickets_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('vin', sa.String(length=17), nullable=False),
+    sa.Column('service_date', sa.DateTime(), nullable=False),
+    sa.Column('service_desc', sa.String(length=200), nullable=False),
+    sa.Column('change_version', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_service_tickets_archive_customer_id', 'service_tickets_archive', ['customer_id'], unique=False)
+    op.create_table('service_mechanics_archive',
+    sa.Column('service_ticket_id', sa.Integer(), nullable=False),
+    sa.Column('mechanic_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('service_ticket_id', 'mechanic_id')
+    )
+    op.create_index('ix_service_mechanics_archive_mechanic_id', 'service_mechanics_archive', ['mechanic_id'], unique=False)
+    op.create_table('inventory_service_tickets_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('service_ticket_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_inventory_service_tickets_archive_service_ticket_id', 'inventory_service_tickets_archive', ['service_ticket_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_inventory_service_tickets_archive_service_ticket_id', table_name='inventory_service_tickets_archive')
+    op.drop_table('inventory_service_tickets_archive')
+    op.drop_index('ix_service_mechanics_archive_mechanic_id', table_name='service_mechanics_archive')
+    op.drop_table('service_mechanics_archive')
+    op.drop_index('ix_service_tickets_archive_customer_id', table_name='service_tickets_archive')
+    op.drop_table('service_tickets_archive')
+    op.drop_index('ix_service_tickets_service_date', table_name='service_tickets')
@@ -0,0 +1,25 @@
+"""Added the product_catalog row of sync_counters, the catalog version every worker reads
+
+Revision ID: f2a6d8c3b914
+Revises: e5b8c1f47a20
+Create Date: 2026-10-19 21:04:51.318426
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8c3b914'
+down_revision = 'e5b8c1f47a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sync_counters = sa.table('sync_counters', sa.column('name', sa.String(length=50)), sa.column('value', sa.Integer()))
+    op.bulk_insert(sync_counters, [{'name': 'product_catalog', 'value': 0}])
+
+
+def downgrade():
+    op.execute("DELETE FROM sync_counters WHERE name = 'product_catalog'")
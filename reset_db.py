@@ -1,9 +1,8 @@
 # reset_db.py
 
 from app import create_app, db # Import the db object from your models module
-from app.config import DevelopmentConfig
 
-app = create_app(DevelopmentConfig)
+app = create_app('development')
 
 with app.app_context():
     db.drop_all()
@@ -0,0 +1,55 @@
+# seed_db.py
+"""Recreate the tables and fill them with synthetic, referentially consistent data.
+
+Usage:
+    python seed_db.py --scale small
+    python seed_db.py --scale production
+    python seed_db.py --tickets 250000 --customers 20000 --seed 7
+    python seed_db.py --config development --yes
+
+The same seed always produces the same data. Every generated account uses the password 'password123'.
+The tables are dropped first. The benchmark database is seeded by default, seeding any other config's
+database asks for confirmation unless --yes is given.
+"""
+import argparse
+import time
+from app import create_app
+from app.utils.dataset import DatasetSpec, SCALES, generate_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='benchmark', help="App config whose database gets seeded")
+    parser.add_argument('--yes', action='store_true', help="Don't ask before dropping a non-benchmark database")
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--customers', type=int)
+    parser.add_argument('--mechanics', type=int)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--tickets', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of customer, mechanic and product usage")
+    args = parser.parse_args()
+
+    if args.config != 'benchmark' and not args.yes:
+        answer = input(f"Drop every table of the '{args.config}' database and fill it with generated data? [y/N] ")
+        if answer.strip().lower() not in ('y', 'yes'):
+            raise SystemExit("Aborted")
+
+    spec = DatasetSpec.from_scale(
+        args.scale, customers=args.customers, mechanics=args.mechanics, products=args.products,
+        tickets=args.tickets, seed=args.seed, chunk_size=args.chunk_size, skew=args.skew
+    )
+    started = time.perf_counter()
+
+    def progress(table, rows):
+        print(f"{table:28} {rows:>10} rows  ({time.perf_counter() - started:.1f}s)")
+
+    app = create_app(args.config)
+    with app.app_context():
+        generate_dataset(spec, progress=progress)
+    print(f"✅ Database seeded in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from werkzeug.exceptions import HTTPException
+from app.models import db
+from app.utils.replicas import HEALTH_CHECK_OPTION
+from app.utils.slow_queries import EXPLAIN_OPTION
+
+
+class Budget:
+    """Most SQL statements, and optionally milliseconds, a single request to an endpoint may take."""
+
+    def __init__(self, queries, ms=None):
+        self.queries = queries
+        self.ms = ms
+
+
+# Budgets for every route, keyed by endpoint. They count statements sent to the database during one
+# request, including loading the user of a token, and match what each endpoint needs today so an N+1
+# regression fails the test that exercises it. Lower them when an endpoint gets cheaper.
+ROUTE_BUDGETS = {
+    'authentications_bp.login': Budget(4),  # Looks the email up as customer, mechanic and admin
+
+    'customers_bp.create_customer': Budget(1),
+    'customers_bp.get_customers': Budget(2),
+    'customers_bp.get_customer': Budget(1),
+    'customers_bp.update_customer': Budget(4),  # Includes the sync version stamped on the customer
+    'customers_bp.delete_customer': Budget(12),  # The deletes of live and archived tickets, the sync version and one INSERT ... SELECT each of outbox events and tombstones
+
+    'inventory_bp.create_inventory': Budget(2),  # Product writes bump the shared catalog version
+    'inventory_bp.get_all_products': Budget(1, ms=250),  # Served from the in-memory catalog
+    'inventory_bp.get_product': Budget(1, ms=250),
+    'inventory_bp.update_product': Budget(4),  # Includes the catalog version
+    'inventory_bp.delete_product': Budget(5),
+
+    'mechanics_bp.create_mechanic': Budget(1),
+    'mechanics_bp.get_mechanics': Budget(2),
+    'mechanics_bp.get_mechanic': Budget(1),
+    'mechanics_bp.get_most_worked_mechanics': Budget(1),
+    'mechanics_bp.search_mechanics': Budget(1),
+    'mechanics_bp.update_mechanic': Budget(4),  # Includes the sync version stamped on the mechanic
+    'mechanics_bp.delete_mechanic': Budget(7),  # Includes the mechanic's archived assignments
+
+    'service_tickets_bp.create_service_ticket': Budget(4),  # Ticket writes also take a sync version and insert their outbox events
+    'service_tickets_bp.get_service_tickets': Budget(5),  # Count, page and one IN query per relationship
+    'service_tickets_bp.get_service_ticket': Budget(6),  # An archived ticket misses the live table, then one IN query per relationship and the product catalog
+    'service_tickets_bp.get_my_tickets': Budget(4),
+    'service_tickets_bp.sync_my_tickets': Budget(7),  # Counters, tickets with their relationships and tombstones
+    'service_tickets_bp.stream_my_tickets': Budget(2),  # The token's user and the replay after a Last-Event-ID, live events use no queries
+    'service_tickets_bp.update_service_ticket': Budget(9),  # Ticket, mechanic, assignments, sync version, UPDATE, assignment write, tombstone, outbox event, product links
+    'service_tickets_bp.add_product_to_service_ticket': Budget(7),
+    'service_tickets_bp.delete_service_ticket': Budget(8),
+
+    'admin_bp.get_slow_queries': Budget(1),
+    'admin_bp.clear_slow_queries': Budget(1),
+    'admin_bp.get_profiles': Budget(1),
+    'admin_bp.get_profile': Budget(1),
+
+    'jobs_bp.get_job': Budget(2),
+    'jobs_bp.get_jobs': Budget(2),
+    'jobs_bp.create_job': Budget(2),
+
+    'outbox_bp.get_events': Budget(3),  # The token's user, the events and the gaps still open
+}
+
+# Endpoints served by extensions that never touch the database
+UNBUDGETED_ENDPOINTS = {'static', 'swagger_ui.show', 'swagger_ui.static'}
+
+
+class QueryCapture:
+    """Records the SQL statements executed on the engines and how long each took, while active."""
+
+    def __init__(self, *engines):
+        self.engines = engines
+        self.statements = []  # list of (sql, seconds)
+        self.elapsed = 0.0
+        self._started = {}
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self._started[id(cursor)] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = self._started.pop(id(cursor), time.perf_counter())
+        if context is not None and (context.execution_options.get(EXPLAIN_OPTION) or context.execution_options.get(HEALTH_CHECK_OPTION)):
+            return  # Plans captured by the slow query log and replica health checks aren't part of the request
+        self.statements.append((statement, time.perf_counter() - started))
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._before)
+            event.listen(engine, 'after_cursor_execute', self._after)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self._start
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._before)
+            event.remove(engine, 'after_cursor_execute', self._after)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join(f"  {seconds * 1000:7.2f} ms  {sql}" for sql, seconds in self.statements)
+
+
+def capture_queries():
+    """Context manager capturing the statements run on the app's engines, e.g. `with capture_queries() as q:`."""
+    return QueryCapture(*db.engines.values())
+
+
+def check_budget(capture, budget, label):
+    """Raise AssertionError if a capture went over a budget."""
+    if capture.count > budget.queries:
+        raise AssertionError(
+            f"{label} ran {capture.count} SQL statements, budget is {budget.queries}:\n{capture.report()}")
+    if budget.ms is not None and capture.elapsed * 1000 > budget.ms:
+        raise AssertionError(f"{label} took {capture.elapsed * 1000:.1f} ms, budget is {budget.ms} ms")
+
+
+@contextmanager
+def query_budget(queries, ms=None, label='Block'):
+    """Assert that the statements run inside the block stay within a query count and optional time budget."""
+    with capture_queries() as capture:
+        yield capture
+    check_budget(capture, Budget(queries, ms), label)
+
+
+@contextmanager
+def override_budget(endpoint, queries, ms=None):
+    """Temporarily replace the budget of an endpoint, for tests that deliberately exercise a slower path."""
+    previous = ROUTE_BUDGETS.get(endpoint)
+    ROUTE_BUDGETS[endpoint] = Budget(queries, ms)
+    try:
+        yield
+    finally:
+        ROUTE_BUDGETS[endpoint] = previous
+
+
+class BudgetedClient(FlaskClient):
+    """Test client that checks every request against the budget of the endpoint it hits."""
+
+    def open(self, *args, **kwargs):
+        with capture_queries() as capture:
+            response = super().open(*args, **kwargs)
+        endpoint = self._endpoint(response.request)
+        if endpoint is not None and endpoint not in UNBUDGETED_ENDPOINTS:
+            budget = ROUTE_BUDGETS.get(endpoint)
+            if budget is None:
+                raise AssertionError(f"No query budget declared for endpoint {endpoint}, add it to ROUTE_BUDGETS")
+            check_budget(capture, budget, f"{response.request.method} {response.request.path} ({endpoint})")
+        return response
+
+    def _endpoint(self, request):
+        adapter = self.application.url_map.bind('localhost')
+        try:
+            endpoint, _ = adapter.match(request.path, request.method)
+        except HTTPException:
+            return None
+        return endpoint
+
+
+def budgeted_client(app):
+    """Return a test client for app that enforces ROUTE_BUDGETS on every request."""
+    app.test_client_class = BudgetedClient
+    return app.test_client()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import uuid
+from app import create_app
+from app.models import db, Admin, Customer
+import unittest
+from app.utils.slow_queries import slow_query_log
+from tests.query_budget import budgeted_client, override_budget
+
+# python -m unittest tests.test_admin -v
+
+class TestAdmin(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+        # Keep the slow query log and stored profiles out of the instance folder of the checkout
+        cls.directory = tempfile.mkdtemp()
+        cls.app.config['SLOW_QUERY_LOG_FILE'] = os.path.join(cls.directory, 'slow_queries.log')
+        cls.app.config['PROFILE_DIR'] = os.path.join(cls.directory, 'profiles')
+
+        # Create an application context
+        cls.app.app_context = cls.app.app_context()
+        cls.app.app_context.push()
+        db.create_all()
+
+        # Creating a test admin for all tests
+        cls.admin_email = f"admin_{str(uuid.uuid4())[:8]}@email.com"
+        admin = Admin(name="Slow Query Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        db.session.add(admin)
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app.app_context.pop()
+        shutil.rmtree(cls.directory)
+
+    def login(self, email, password):
+        response = self.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    # ------ Test Get Slow Queries ------
+    def test_get_slow_queries(self):
+        headers = self.login(self.admin_email, "adminpassword")
+        self.client.delete('/admin/slow-queries', headers=headers)
+
+        # Record every statement of one request
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        self.app.config['SLOW_QUERY_EXPLAIN_INTERVAL'] = 0
+        self.addCleanup(self.app.config.pop, 'SLOW_QUERY_THRESHOLD_MS', None)
+        self.addCleanup(self.app.config.pop, 'SLOW_QUERY_EXPLAIN_INTERVAL', None)
+        self.client.get('/service_tickets/?page=1&per_page=5')
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+        # The plans are added by the background EXPLAIN thread
+        slow_query_log.join(self.app)
+
+        response = self.client.get('/admin/slow-queries', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        ticket_queries = [entry for entry in response.json['slow_queries']
+                          if entry['endpoint'] == 'service_tickets_bp.get_service_tickets']
+        self.assertTrue(ticket_queries)
+        self.assertTrue(all(entry['route'] == 'GET /service_tickets/' for entry in ticket_queries))
+        self.assertTrue(any('service_tickets' in entry['statement'] and entry['plan'] for entry in ticket_queries))
+
+    # ------ Test Slow Query Parameters Are Redacted ------
+    def test_slow_query_parameters_redacted(self):
+        headers = self.login(self.admin_email, "adminpassword")
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        self.addCleanup(self.app.config.pop, 'SLOW_QUERY_THRESHOLD_MS', None)
+        self.addCleanup(self.app.config.pop, 'SLOW_QUERY_LOG_PARAMETERS', None)
+        for log_parameters in (False, True):
+            self.app.config['SLOW_QUERY_LOG_PARAMETERS'] = log_parameters
+            slow_query_log.clear(self.app)
+            self.login(self.admin_email, "adminpassword")
+            slow_query_log.join(self.app)
+            parameters = ' '.join(entry['parameters'] for entry in slow_query_log.entries(self.app)
+                                  if entry['endpoint'] == 'authentications_bp.login')
+            self.assertEqual(self.admin_email in parameters, log_parameters, parameters)
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+        with open(self.app.config['SLOW_QUERY_LOG_FILE']) as log_file:
+            self.assertIn("'str'", log_file.read())
+        self.client.delete('/admin/slow-queries', headers=headers)
+
+    # ------ Test Get Slow Queries Not Admin ------
+    def test_get_slow_queries_not_admin(self):
+        email = f"customer_{str(uuid.uuid4())[:8]}@email.com"
+        customer = Customer(name="Not Admin", phone="555-555-5555", email=email, password="password123")
+        db.session.add(customer)
+        db.session.commit()
+
+        response = self.client.get('/admin/slow-queries', headers=self.login(email, "password123"))
+        self.assertEqual(response.status_code, 403)
+
+    # ------ Test Profile Request ------
+    def test_profile_request(self):
+        headers = self.login(self.admin_email, "adminpassword")
+
+        # Checking the admin token for profiling loads the admin once more
+        with override_budget('service_tickets_bp.get_service_tickets', 6):
+            response = self.client.get('/service_tickets/', headers={**headers, 'X-Profile': 'inline'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Profile-Status'], 'inline')
+        profile = response.json['profile']
+        self.assertEqual(profile['endpoint'], 'service_tickets_bp.get_service_tickets')
+        self.assertGreater(profile['sql']['count'], 0)
+        self.assertTrue(any('get_service_tickets' in entry['function'] for entry in profile['functions']))
+
+        with override_budget('service_tickets_bp.get_service_tickets', 6):
+            response = self.client.get('/service_tickets/', headers={**headers, 'X-Profile': 'store'})
+        self.assertEqual(response.headers['X-Profile-Status'], 'stored')
+        self.assertIn('service_tickets', response.json)
+        profile_id = response.headers['X-Profile-Id']
+
+        response = self.client.get(f'/admin/profiles/{profile_id}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['id'], profile_id)
+        self.assertIn(profile_id, self.client.get('/admin/profiles', headers=headers).json['profiles'])
+
+    # ------ Test Profile Request Limits ------
+    def test_profile_request_limits(self):
+        email = f"customer_{str(uuid.uuid4())[:8]}@email.com"
+        customer = Customer(name="Not Admin", phone="555-555-5555", email=email, password="password123")
+        db.session.add(customer)
+        db.session.commit()
+
+        with override_budget('service_tickets_bp.get_service_tickets', 6):
+            # Anyone else's request runs normally, without a profile
+            for headers in (self.login(email, "password123"), {}):
+                response = self.client.get('/service_tickets/', headers={**headers, 'X-Profile': 'inline'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers['X-Profile-Status'], 'denied')
+                self.assertIn('service_tickets', response.json)
+
+            # With every profiling slot taken the request runs without a profile
+            slots = self.app.extensions['request_profiler']['slots']
+            slots.acquire()
+            self.addCleanup(slots.release)
+            response = self.client.get('/service_tickets/', headers={**self.login(self.admin_email, "adminpassword"), 'X-Profile': 'inline'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Profile-Status'], 'busy')
+        self.assertIn('service_tickets', response.json)
@@ -0,0 +1,149 @@
+import uuid
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from app import create_app
+from app.models import (db, Admin, Customer, Mechanic, OutboxEvent, Product, ProductServiceTicket, ServiceMechanic,
+                        ServiceTicket, ServiceTicketArchive, ServiceMechanicArchive, ProductServiceTicketArchive)
+from app.utils.archive import archive_cutoff, archive_service_tickets
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_archive -v
+
+
+class TestArchive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        suffix = str(uuid.uuid4())[:8]
+        cls.admin_email = f"archive_admin_{suffix}@email.com"
+        admin = Admin(name="Archive Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        mechanic = Mechanic(name="Archive Mechanic", phone="555-555-5555", email=f"archive_mechanic_{suffix}@email.com",
+                            salary=50000, password="password123")
+        product = Product(name="Archive Spark Plug", price=7.5)
+        db.session.add_all([admin, mechanic, product])
+        db.session.commit()
+        cls.mechanic_id, cls.product_id = mechanic.id, product.id
+        cls.admin_headers = cls.login(cls.admin_email, "adminpassword")
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    @classmethod
+    def login(cls, email, password):
+        response = cls.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    def create_customer(self):
+        email = f"archive_customer_{str(uuid.uuid4())[:8]}@email.com"
+        customer = Customer(name="Archive Customer", phone="555-555-5555", email=email, password="password123")
+        db.session.add(customer)
+        db.session.commit()
+        return customer.id, self.login(email, "password123")
+
+    def create_ticket(self, customer_id, days_ago):
+        ticket = ServiceTicket(customer_id=customer_id, vin="1HGCM82633A123456", service_desc="Archive ticket",
+                               service_date=datetime.utcnow() - timedelta(days=days_ago),
+                               mechanics=[db.session.get(Mechanic, self.mechanic_id)])
+        ticket.product_links = [ProductServiceTicket(product_id=self.product_id, quantity=3)]
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket.id
+
+    def archive(self):
+        archived = archive_service_tickets(archive_cutoff(365), batch_size=1)
+        db.session.expire_all()
+        return archived
+
+    # ------ Test Old Tickets Are Moved With Their Links ------
+    def test_old_tickets_moved(self):
+        customer_id, _ = self.create_customer()
+        old_ids = [self.create_ticket(customer_id, 400) for _ in range(2)]
+        recent_id = self.create_ticket(customer_id, 10)
+
+        self.assertGreaterEqual(self.archive(), 2)
+        self.assertEqual(db.session.scalars(select(ServiceTicket.id).where(ServiceTicket.customer_id == customer_id)).all(), [recent_id])
+        self.assertEqual(db.session.scalars(select(ServiceTicketArchive.id).where(ServiceTicketArchive.customer_id == customer_id)
+                                            .order_by(ServiceTicketArchive.id)).all(), old_ids)
+        self.assertFalse(db.session.scalars(select(ServiceMechanic).where(ServiceMechanic.service_ticket_id.in_(old_ids))).all())
+        self.assertFalse(db.session.scalars(select(ProductServiceTicket).where(ProductServiceTicket.service_ticket_id.in_(old_ids))).all())
+        self.assertEqual(len(db.session.scalars(select(ServiceMechanicArchive).where(ServiceMechanicArchive.service_ticket_id.in_(old_ids))).all()), 2)
+        self.assertEqual(len(db.session.scalars(select(ProductServiceTicketArchive).where(ProductServiceTicketArchive.service_ticket_id.in_(old_ids))).all()), 2)
+        # Nothing left to archive
+        self.assertEqual(self.archive(), 0)
+
+    # ------ Test Archived Tickets Are Still Readable ------
+    def test_archived_ticket_readable(self):
+        customer_id, _ = self.create_customer()
+        ticket_id = self.create_ticket(customer_id, 400)
+        self.archive()
+
+        response = self.client.get(f'/service_tickets/{ticket_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json['archived'])
+        ticket = response.json['service_ticket']
+        self.assertEqual((ticket['id'], ticket['customer_id'], ticket['mechanic_ids']), (ticket_id, customer_id, [self.mechanic_id]))
+        self.assertEqual([link['quantity'] for link in ticket['product_links']], [3])
+        self.assertEqual(self.client.get('/service_tickets/999999999').status_code, 404)
+
+        # Lists leave the archive out unless it is asked for
+        live = self.client.get('/service_tickets/?per_page=1000').json['service_tickets']
+        self.assertNotIn(ticket_id, [ticket['id'] for ticket in live])
+        archived = self.client.get('/service_tickets/?archived=true&per_page=1000').json['service_tickets']
+        self.assertIn(ticket_id, [ticket['id'] for ticket in archived])
+
+    # ------ Test Archiving Is Recorded For Consumers And Sync Clients ------
+    def test_archiving_recorded(self):
+        customer_id, headers = self.create_customer()
+        ticket_id = self.create_ticket(customer_id, 400)
+        token = self.client.get('/service_tickets/sync', headers=headers).json['sync_token']
+        self.archive()
+
+        event_types = db.session.scalars(select(OutboxEvent.event_type).where(OutboxEvent.aggregate_id == ticket_id)
+                                         .order_by(OutboxEvent.id)).all()
+        self.assertEqual(event_types[-1], 'service_ticket.archived')
+        result = self.client.get(f'/service_tickets/sync?since={token}', headers=headers).json
+        self.assertEqual(result['deleted_ids'], [ticket_id])
+
+    # ------ Test Deleting A Customer Deletes Their Archive ------
+    def test_customer_delete_removes_archive(self):
+        customer_id, _ = self.create_customer()
+        ticket_id = self.create_ticket(customer_id, 400)
+        self.archive()
+
+        self.assertEqual(self.client.delete(f'/customers/{customer_id}', headers=self.admin_headers).status_code, 200)
+        self.assertIsNone(db.session.get(ServiceTicketArchive, ticket_id))
+        self.assertFalse(db.session.scalars(select(ProductServiceTicketArchive).where(ProductServiceTicketArchive.service_ticket_id == ticket_id)).all())
+
+    # ------ Test Archive Command ------
+    def test_archive_command(self):
+        customer_id, _ = self.create_customer()
+        ticket_id = self.create_ticket(customer_id, 40)
+        result = self.app.test_cli_runner().invoke(args=['archive-tickets', '--older-than-days', '30', '--batch-size', '10'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Archived", result.output)
+        db.session.expire_all()
+        self.assertIsNotNone(db.session.get(ServiceTicketArchive, ticket_id))
+
+    # ------ Test Servers Resetting AUTO_INCREMENT Are Refused ------
+    def test_old_mysql_refused(self):
+        customer_id, _ = self.create_customer()
+        ticket_id = self.create_ticket(customer_id, 40)
+        for is_mariadb, version in ((False, (5, 7, 44)), (True, (10, 1, 48))):
+            dialect = SimpleNamespace(name='mysql', is_mariadb=is_mariadb, server_version_info=version)
+            with patch.object(db.session, 'get_bind', return_value=SimpleNamespace(dialect=dialect)):
+                with self.assertRaisesRegex(RuntimeError, "AUTO_INCREMENT"):
+                    archive_service_tickets(archive_cutoff(30), 10)
+        self.assertIsNotNone(db.session.get(ServiceTicket, ticket_id))
@@ -2,6 +2,7 @@ from app import create_app, db
 from app.models import Customer, Mechanic
 import unittest
 from app.config import config_by_name
+from tests.query_budget import budgeted_client
 
 # python -m unittest discover tests -v
 # python -m unittest tests.test_authentication -v
@@ -11,7 +12,7 @@ class TestAuthentication(unittest.TestCase):
     def setUpClass(cls):
         cls.app = create_app('testing')
         print(cls.app.config) # Debugging line
-        cls.client = cls.app.test_client()
+        cls.client = budgeted_client(cls.app)
 
         # Create an application context
         cls.app.app_context = cls.app.app_context()
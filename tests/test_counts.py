@@ -0,0 +1,118 @@
+import uuid
+import unittest
+from sqlalchemy import func, select, text
+from app import create_app
+from app.models import db, Admin, Customer
+from app.utils.counts import _count_key, count_store
+from app.utils.deletes import delete_customer_cascade
+from tests.query_budget import budgeted_client, capture_queries
+
+# python -m unittest tests.test_counts -v
+
+
+class TestListCounts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        cls.admin_email = f"counts_admin_{str(uuid.uuid4())[:8]}@email.com"
+        admin = Admin(name="Counts Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        db.session.add(admin)
+        db.session.add_all([Customer(name="Counts Customer", phone="555-555-5555", email=f"counts_{str(uuid.uuid4())[:8]}@email.com",
+                                     password="password123") for _ in range(3)])
+        db.session.commit()
+        response = cls.client.post('/auth/login', json={"email": cls.admin_email, "password": "adminpassword"})
+        cls.admin_headers = {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    def customer_count(self):
+        return db.session.execute(select(func.count()).select_from(Customer)).scalar()
+
+    def list_customers(self, query=''):
+        response = self.client.get(f'/customers/?per_page=2{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def create_customer(self):
+        response = self.client.post('/customers/', json={"name": "Counted Customer", "phone": "555-555-5555",
+                                                        "email": f"counted_{str(uuid.uuid4())[:8]}@email.com",
+                                                        "password": "password123"})
+        self.assertEqual(response.status_code, 201)
+        return response.json['customer']['id'] if 'customer' in response.json else response.json['id']
+
+    def count_statements(self, query):
+        with capture_queries() as capture:
+            self.list_customers(query)
+        return [sql for sql, _ in capture.statements if 'count(' in sql.lower()]
+
+    # ------ Test Exact Count ------
+    def test_exact_count(self):
+        result = self.list_customers('&count=exact')
+        self.assertEqual((result['total'], result['count']), (self.customer_count(), 'exact'))
+        self.assertTrue(self.count_statements('&count=exact'))
+        self.assertEqual(self.client.get('/customers/?count=roughly').status_code, 400)
+
+    # ------ Test Cached Count Is Invalidated By Writes ------
+    def test_cached_count_invalidated(self):
+        total = self.list_customers('&count=cached')['total']
+        self.assertEqual(total, self.customer_count())
+        self.assertEqual(self.count_statements('&count=cached'), [])
+
+        customer_id = self.create_customer()
+        self.assertEqual(self.list_customers('&count=cached')['total'], total + 1)
+        # Set-based deletes invalidate it too
+        delete_customer_cascade(customer_id)
+        db.session.commit()
+        self.assertEqual(self.list_customers('&count=cached')['total'], total)
+
+    # ------ Test A Stale Cached Count Doesn't Hide Pages ------
+    def test_stale_cached_count_serves_pages(self):
+        # Another worker added customers after this one cached its total
+        self.list_customers('&count=cached')
+        count_store().set(_count_key(Customer.__tablename__), 1)
+        result = self.list_customers('&count=cached&page=2')
+        self.assertEqual((result['total'], result['count']), (1, 'cached'))
+        self.assertTrue(result['customers'])
+        self.assertNotIn('error', result)
+
+    # ------ Test No Count Reads One Row Past The Page ------
+    def test_no_count(self):
+        self.assertEqual(self.count_statements('&count=none'), [])
+        first = self.list_customers('&count=none')
+        self.assertEqual((first['total'], first['total_pages'], first['count']), (None, None, 'none'))
+        self.assertEqual(len(first['customers']), 2)
+        self.assertTrue(first['has_next'])
+
+        last_page = (self.customer_count() + 1) // 2
+        last = self.list_customers(f'&count=none&page={last_page}')
+        self.assertFalse(last['has_next'])
+        past = self.list_customers(f'&count=none&page={last_page + 1}')
+        self.assertEqual((past['customers'], past['error']), ([], 'Page not found or exceeds total pages'))
+
+    # ------ Test Estimated Count ------
+    def test_estimated_count(self):
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        result = self.list_customers('&count=estimate')
+        self.assertEqual((result['total'], result['count']), (self.customer_count(), 'estimate'))
+        self.assertEqual(self.count_statements('&count=estimate'), [])
+
+    # ------ Test Strategy From Config ------
+    def test_strategy_from_config(self):
+        self.app.config['LIST_COUNT_STRATEGIES'] = {'customers_bp.get_customers': 'none'}
+        self.addCleanup(self.app.config.pop, 'LIST_COUNT_STRATEGIES')
+        self.assertEqual(self.list_customers()['count'], 'none')
+        self.assertEqual(self.list_customers('&count=exact')['count'], 'exact')
+        # Endpoints without an entry keep the default strategy
+        self.assertEqual(self.client.get('/mechanics/').json['count'], 'exact')
@@ -1,9 +1,10 @@
 import uuid
 from flask import jsonify, request
 from app import create_app
-from app.models import db, Customer, Admin
+from app.models import db, Customer, Admin, Mechanic, Product, ProductServiceTicket, ServiceMechanic, ServiceTicket
 import unittest
 from app.config import config_by_name
+from tests.query_budget import budgeted_client
 
 # python -m unittest discover tests -v
 # python -m unittest tests.test_customers -v
@@ -13,7 +14,7 @@ class TestCustomer(unittest.TestCase):
     def setUpClass(cls):
         cls.app = create_app('testing')
         print(cls.app.config) # Debugging line
-        cls.client = cls.app.test_client()
+        cls.client = budgeted_client(cls.app)
 
         # Create an application context
         cls.app.app_context = cls.app.app_context()
@@ -245,6 +246,47 @@ class TestCustomer(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['message'], f"Customer {customer_id} deleted successfully")
     
+    
+    # -------------------Delete Customer With Service Tickets Test-------------------
+    def test_delete_customer_with_service_tickets(self):
+        # Creating a customer with service tickets that have mechanics and products linked
+        delete_customer = Customer(
+            name="Delete Me Tickets",
+            phone="777-777-7778",
+            email=f"delete_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        mechanic = Mechanic(
+            name="Cascade Mechanic",
+            phone="777-777-7779",
+            email=f"mechanic_{self.short_uuid()}@em.com",
+            salary=50000,
+            password="password123"
+        )
+        product = Product(name="Cascade Product", price=12.50)
+        db.session.add_all([delete_customer, mechanic, product])
+        db.session.commit()
+        
+        tickets = [ServiceTicket(customer_id=delete_customer.id, vin="1HGCM82633A123456", service_desc=f"Ticket {i}", mechanics=[mechanic])
+                   for i in range(3)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        ticket_ids = [ticket.id for ticket in tickets]
+        db.session.add(ProductServiceTicket(product_id=product.id, service_ticket_id=ticket_ids[0], quantity=2))
+        db.session.commit()
+        customer_id = delete_customer.id
+        
+        response = self.client.delete(f'/customers/{customer_id}', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['deleted_service_tickets'], 3)
+        
+        # The tickets and their links are gone, the mechanic is kept
+        db.session.expire_all()
+        self.assertEqual(ServiceTicket.query.filter(ServiceTicket.id.in_(ticket_ids)).count(), 0)
+        self.assertEqual(ProductServiceTicket.query.filter(ProductServiceTicket.service_ticket_id.in_(ticket_ids)).count(), 0)
+        self.assertEqual(ServiceMechanic.query.filter(ServiceMechanic.service_ticket_id.in_(ticket_ids)).count(), 0)
+        self.assertIsNotNone(db.session.get(Mechanic, mechanic.id))
+        
         
     # -------------------Invalid Delete Customer Test-------------------
     def test_invalid_delete_customer(self):
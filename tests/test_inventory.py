@@ -4,7 +4,11 @@ from app import create_app
 from app.models import Product, db, Mechanic, Admin, Customer
 import unittest
 from app.config import config_by_name
+from tests.query_budget import budgeted_client
 from app.utils.util import not_found
+from app.utils.catalog import product_catalog
+from app.utils.sync import bump_counter
+from sqlalchemy import update
 
 
 # python -m unittest discover tests -v
@@ -16,7 +20,7 @@ class TestServiceTicket(unittest.TestCase):
     def setUpClass(cls):
         cls.app = create_app('testing')
         print(cls.app.config) # Debugging line
-        cls.client = cls.app.test_client()
+        cls.client = budgeted_client(cls.app)
 
         # Create an application context
         cls.app.app_context = cls.app.app_context()
@@ -210,6 +214,51 @@ class TestServiceTicket(unittest.TestCase):
         self.assertEqual(response.json['price'], 29.99)
         
         
+# ------------------------------ Test Catalog Reflects Product Changes ------------------------------
+    def test_catalog_reflects_product_changes(self):
+        # Creating a product outside of the endpoints
+        new_product = Product(name="Catalog Product", price=5.50)
+        db.session.add(new_product)
+        db.session.commit()
+        
+        # The catalog snapshot should pick up the new product
+        response = self.client.get(f'/inventory/{new_product.id}', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['price'], 5.50)
+        
+        # Updating the product should refresh the snapshot
+        response = self.client.put(f'/inventory/{new_product.id}', json={
+            "name": "Catalog Product",
+            "price": 7.25
+        }, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(product_catalog.price(new_product.id), 7.25)
+        
+        # Deleting the product should remove it from the snapshot
+        response = self.client.delete(f'/inventory/{new_product.id}', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(product_catalog.get(new_product.id))
+
+
+# ------------------------------ Test Catalog Follows Other Workers ------------------------------
+    def test_catalog_follows_other_workers(self):
+        self.app.config['CATALOG_VERSION_CHECK_INTERVAL'] = 0
+        self.addCleanup(self.app.config.pop, 'CATALOG_VERSION_CHECK_INTERVAL')
+        product = Product(name="Shared Catalog Product", price=3.0)
+        db.session.add(product)
+        db.session.commit()
+        self.assertEqual(product_catalog.price(product.id), 3.0)
+
+        # Another worker changes the price, this process only learns of it through the shared counter
+        db.session.execute(update(Product).where(Product.id == product.id).values(price=4.0))
+        self.assertEqual(product_catalog.price(product.id), 3.0)
+        bump_counter(db.session.connection(), product_catalog.COUNTER)
+        db.session.commit()
+        self.assertEqual(product_catalog.price(product.id), 4.0)
+        db.session.delete(product)
+        db.session.commit()
+
+
 # ------------------------------ Test Invalid Update Existing Inventory Product ------------------------------
     def test_invalid_update_existing_inventory_product(self):
         # Test updating an existing inventory product with invalid data
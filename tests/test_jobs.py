@@ -0,0 +1,203 @@
+import time
+import uuid
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import create_app
+from app.models import db, Admin, Customer, Job, ServiceTicket
+from app.utils.jobs import JobWorker, job_task, enqueue, claim_job, run_job, QUEUED, RUNNING, SUCCEEDED, FAILED
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_jobs -v
+
+flaky_calls = []
+
+
+# Fails until it ran `succeed_on` times
+@job_task('tests.flaky')
+def flaky_task(succeed_on):
+    flaky_calls.append(succeed_on)
+    if len(flaky_calls) < succeed_on:
+        raise RuntimeError(f"attempt {len(flaky_calls)} failed")
+    return {"calls": len(flaky_calls)}
+
+
+# Runs longer than a few heartbeats
+@job_task('tests.slow')
+def slow_task(seconds):
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+# Another worker claims the job again while this run is still going
+@job_task('tests.taken_over')
+def taken_over_task(job_id):
+    with db.engine.begin() as connection:
+        connection.execute(update(Job).where(Job.id == job_id).values(locked_by='other-worker', attempts=Job.attempts + 1))
+    db.session.add(Customer(name="Taken Over Customer", phone="555-555-5555", email="taken_over@email.com", password="password123"))
+    return {"ran": True}
+
+
+class TestJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        cls.admin_email = f"jobs_admin_{str(uuid.uuid4())[:8]}@email.com"
+        admin = Admin(name="Jobs Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        db.session.add(admin)
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    def setUp(self):
+        flaky_calls.clear()
+        self.app.config['JOB_RETRY_BACKOFF'] = 0
+        self.addCleanup(self.app.config.pop, 'JOB_RETRY_BACKOFF')
+
+    def login(self, email, password):
+        response = self.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    def create_customer(self):
+        email = f"jobs_customer_{str(uuid.uuid4())[:8]}@email.com"
+        customer = Customer(name="Jobs Customer", phone="555-555-5555", email=email, password="password123")
+        db.session.add(customer)
+        db.session.commit()
+        return customer.id, self.login(email, "password123")
+
+    def run_worker(self, **kwargs):
+        processed = JobWorker(self.app, **kwargs).run(burst=True)
+        # The worker wrote from its own sessions, drop what this session has loaded
+        db.session.remove()
+        return processed
+
+    # ------ Test Async Delete Returns 202 ------
+    def test_async_delete_customer(self):
+        customer_id, headers = self.create_customer()
+        db.session.add(ServiceTicket(customer_id=customer_id, vin="1HGCM82633A123456", service_desc="Queued delete"))
+        db.session.commit()
+
+        response = self.client.delete(f'/customers/{customer_id}', headers={**headers, 'Prefer': 'respond-async'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Location'], response.json['status_url'])
+        self.assertEqual(response.json['status'], QUEUED)
+        # Nothing was deleted during the request
+        self.assertIsNotNone(db.session.get(Customer, customer_id))
+
+        status = self.client.get(response.json['status_url'], headers=headers)
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(status.json['job']['status'], QUEUED)
+        self.assertEqual(status.json['job']['payload'], {"customer_id": customer_id})
+
+        self.assertGreaterEqual(self.run_worker(), 1)
+        self.assertIsNone(db.session.get(Customer, customer_id))
+        job = self.client.get(response.json['status_url'], headers=self.login(self.admin_email, "adminpassword")).json['job']
+        self.assertEqual(job['status'], SUCCEEDED)
+        self.assertEqual(job['result'], {"customer_id": customer_id, "deleted_service_tickets": 1})
+
+    # ------ Test Job Status Permissions ------
+    def test_job_status_permissions(self):
+        customer_id, headers = self.create_customer()
+        _, other_headers = self.create_customer()
+        response = self.client.delete(f'/customers/{customer_id}', headers={**headers, 'Prefer': 'respond-async'})
+        self.assertEqual(self.client.get(response.json['status_url'], headers=other_headers).status_code, 403)
+        self.assertEqual(self.client.get('/jobs/', headers=headers).status_code, 403)
+        self.assertEqual(self.client.get('/jobs/999999', headers=headers).status_code, 404)
+        self.run_worker()
+
+    # ------ Test Retry With Backoff ------
+    def test_retry_with_backoff(self):
+        self.app.config['JOB_RETRY_BACKOFF'] = 60
+        job_id = enqueue('tests.flaky', {"succeed_on": 2}).id
+
+        self.assertEqual(self.run_worker(), 1)
+        job = db.session.get(Job, job_id)
+        self.assertEqual((job.status, job.attempts), (QUEUED, 1))
+        self.assertIn("attempt 1 failed", job.error)
+        # The retry waits between half and all of the backoff
+        self.assertGreater(job.run_at, datetime.utcnow() + timedelta(seconds=25))
+
+        # Not due yet
+        self.assertEqual(self.run_worker(), 0)
+        db.session.get(Job, job_id).run_at = datetime.utcnow()
+        db.session.commit()
+        self.run_worker()
+        job = db.session.get(Job, job_id)
+        self.assertEqual((job.status, job.attempts, job.error), (SUCCEEDED, 2, None))
+        self.assertEqual(len(flaky_calls), 2)
+
+    # ------ Test Failed After Max Attempts ------
+    def test_failed_after_max_attempts(self):
+        job_id = enqueue('tests.flaky', {"succeed_on": 10}).id
+        for _ in range(5):
+            self.run_worker()
+        job = db.session.get(Job, job_id)
+        self.assertEqual((job.status, job.attempts), (FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(len(flaky_calls), 3)
+
+        headers = self.login(self.admin_email, "adminpassword")
+        failed = self.client.get('/jobs/?status=failed', headers=headers).json['jobs']
+        self.assertIn(job_id, [job['id'] for job in failed])
+        self.assertEqual(self.client.get('/jobs/?status=lost', headers=headers).status_code, 400)
+
+    # ------ Test Admin Enqueue ------
+    def test_admin_enqueue(self):
+        headers = self.login(self.admin_email, "adminpassword")
+        response = self.client.post('/jobs/', json={"name": "tests.flaky", "payload": {"succeed_on": 1}}, headers=headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.post('/jobs/', json={"name": "missing"}, headers=headers).status_code, 400)
+        self.assertEqual(self.client.post('/jobs/', json={"name": "tests.flaky", "delay": -1}, headers=headers).status_code, 400)
+
+        self.run_worker(concurrency=3)
+        self.assertEqual(db.session.get(Job, response.json['job_id']).status, SUCCEEDED)
+
+    # ------ Test Stale Job Is Claimed Again ------
+    def test_stale_job_claimed_again(self):
+        job_id = enqueue('tests.flaky', {"succeed_on": 1}).id
+        job = claim_job('dead-worker')
+        self.assertEqual((job.id, job.status), (job_id, RUNNING))
+        # Another worker doesn't get the job while it's locked
+        self.assertIsNone(claim_job('other-worker'))
+
+        job.locked_at = datetime.utcnow() - timedelta(seconds=self.app.config.get('JOB_LOCK_TIMEOUT', 600) + 1)
+        db.session.commit()
+        job = claim_job('other-worker')
+        self.assertEqual((job.id, job.locked_by, job.attempts), (job_id, 'other-worker', 2))
+        self.assertEqual(run_job(job).status, SUCCEEDED)
+
+    # ------ Test Heartbeat Keeps A Long Job Locked ------
+    def test_heartbeat_refreshes_lock(self):
+        self.app.config['JOB_HEARTBEAT_INTERVAL'] = 0.05
+        self.addCleanup(self.app.config.pop, 'JOB_HEARTBEAT_INTERVAL')
+        job_id = enqueue('tests.slow', {"seconds": 0.3}).id
+        job = claim_job('slow-worker')
+        claimed_at = datetime.utcnow() - timedelta(seconds=60)
+        job.locked_at = claimed_at
+        db.session.commit()
+
+        job = run_job(job)
+        self.assertEqual((job.id, job.status), (job_id, SUCCEEDED))
+        self.assertGreater(job.locked_at, claimed_at + timedelta(seconds=50))
+
+    # ------ Test Outcome Of A Taken Over Job Is Dropped ------
+    def test_taken_over_job_outcome_dropped(self):
+        job_id = enqueue('tests.taken_over', {}).id
+        db.session.get(Job, job_id).payload = f'{{"job_id": {job_id}}}'
+        db.session.commit()
+        job = run_job(claim_job('first-worker'))
+
+        # The run that owns the job now records the outcome, not this one
+        self.assertEqual((job.status, job.locked_by, job.attempts, job.result), (RUNNING, 'other-worker', 2, None))
+        self.assertIsNone(Customer.query.filter_by(email="taken_over@email.com").first())
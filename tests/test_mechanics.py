@@ -4,6 +4,7 @@ from app import create_app
 from app.models import db, Mechanic, Admin
 import unittest
 from app.config import config_by_name
+from tests.query_budget import budgeted_client
 
 
 # python -m unittest discover tests -v
@@ -16,7 +17,7 @@ class TestMechanic(unittest.TestCase):
     def setUpClass(cls):
         cls.app = create_app('testing')
         print(cls.app.config) # Debugging line
-        cls.client = cls.app.test_client()
+        cls.client = budgeted_client(cls.app)
 
         # Create an application context
         cls.app.app_context = cls.app.app_context()
@@ -0,0 +1,180 @@
+import uuid
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app import create_app
+from app.models import db, Admin, Customer, Mechanic, OutboxEvent, Product, ServiceTicket
+from app.utils.outbox import outbox
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_outbox -v
+
+
+class TestOutbox(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        suffix = str(uuid.uuid4())[:8]
+        cls.admin_email = f"outbox_admin_{suffix}@email.com"
+        admin = Admin(name="Outbox Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        cls.customer = Customer(name="Outbox Customer", phone="555-555-5555", email=f"outbox_customer_{suffix}@email.com",
+                                password="password123")
+        cls.mechanic = Mechanic(name="Outbox Mechanic", phone="555-555-5555", email=f"outbox_mechanic_{suffix}@email.com",
+                                salary=50000, password="password123")
+        cls.product = Product(name="Outbox Oil Filter", price=12.5)
+        db.session.add_all([admin, cls.customer, cls.mechanic, cls.product])
+        db.session.commit()
+        cls.headers = cls.login(cls.admin_email, "adminpassword")
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    @classmethod
+    def login(cls, email, password):
+        response = cls.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    def last_sequence(self):
+        return db.session.execute(select(func.max(OutboxEvent.id))).scalar() or 0
+
+    def events_after(self, after):
+        response = self.client.get(f'/outbox/events?after={after}&limit=1000', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json['events']
+
+    def create_ticket(self):
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": self.customer.id, "vin": "1HGCM82633A123456", "service_desc": "Outbox ticket"
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json['service_ticket_id']
+
+    # ------ Test Ticket Changes Are Recorded ------
+    def test_ticket_changes_recorded(self):
+        after = self.last_sequence()
+        ticket_id = self.create_ticket()
+        self.client.put(f'/service_tickets/{ticket_id}', json={"vin": "2HGCM82633A654321"})
+        self.client.put(f'/service_tickets/{ticket_id}', json={"add_mechanic_ids": [self.mechanic.id]})
+        self.client.put(f'/service_tickets/{ticket_id}', json={"remove_mechanic_ids": [self.mechanic.id]})
+        self.client.put(f'/service_tickets/{ticket_id}/add_product', json={"product_id": self.product.id, "quantity": 2})
+        self.client.delete(f'/service_tickets/{ticket_id}', headers=self.headers)
+
+        events = self.events_after(after)
+        self.assertEqual([event['event_type'] for event in events], [
+            'service_ticket.created', 'service_ticket.updated', 'service_ticket.mechanic_assigned',
+            'service_ticket.mechanic_removed', 'service_ticket.product_added', 'service_ticket.deleted'
+        ])
+        self.assertEqual({event['aggregate_id'] for event in events}, {ticket_id})
+        self.assertEqual(events[0]['payload']['vin'], "1HGCM82633A123456")
+        self.assertEqual(events[1]['payload'], {"vin": "2HGCM82633A654321"})
+        self.assertEqual(events[2]['payload'], {"mechanic_id": self.mechanic.id})
+        self.assertEqual(events[4]['payload']['quantity'], 2)
+        self.assertIsNone(events[5]['payload'])
+        sequences = [event['sequence'] for event in events]
+        self.assertEqual(sequences, sorted(sequences))
+
+    # ------ Test Set Based Deletes Are Recorded ------
+    def test_set_based_deletes_recorded(self):
+        mechanic = Mechanic(name="Leaving Mechanic", phone="555-555-5555", email=f"leaving_{str(uuid.uuid4())[:8]}@email.com",
+                            salary=50000, password="password123")
+        tickets = [ServiceTicket(customer_id=self.customer.id, vin="1HGCM82633A123456", service_desc="Assigned", mechanics=[mechanic])
+                   for _ in range(2)]
+        db.session.add_all([mechanic, *tickets])
+        db.session.commit()
+        mechanic_id, ticket_ids = mechanic.id, [ticket.id for ticket in tickets]
+        after = self.last_sequence()
+
+        response = self.client.delete(f'/mechanics/{mechanic_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        events = self.events_after(after)
+        self.assertEqual([(event['event_type'], event['aggregate_id'], event['payload']) for event in events],
+                         [('service_ticket.mechanic_removed', ticket_id, {"mechanic_id": mechanic_id}) for ticket_id in ticket_ids])
+
+    # ------ Test Rolled Back Changes Are Not Recorded ------
+    def test_rollback_not_recorded(self):
+        after = self.last_sequence()
+        db.session.add(ServiceTicket(customer_id=self.customer.id, vin="1HGCM82633A123456", service_desc="Rolled back"))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(self.last_sequence(), after)
+
+    # ------ Test Consumer Batches ------
+    def test_consumer_batches(self):
+        after = self.last_sequence()
+        ticket_ids = [self.create_ticket() for _ in range(3)]
+
+        seen = []
+        cursor = after
+        while True:
+            response = self.client.get(f'/outbox/events?after={cursor}&limit=2', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            seen += [event['aggregate_id'] for event in response.json['events']]
+            cursor = response.json['next_after']
+            if not response.json['has_more']:
+                break
+        self.assertEqual(seen, ticket_ids)
+        self.assertEqual(self.client.get('/outbox/events?after=-1', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get('/outbox/events', headers=self.login(self.customer.email, "password123")).status_code, 403)
+
+    # ------ Test Read Waits On Recent Gaps ------
+    def test_read_waits_on_recent_gaps(self):
+        after = self.last_sequence()
+        # after + 1 belongs to a transaction that hasn't committed yet
+        event = OutboxEvent(id=after + 2, event_type='service_ticket.updated', aggregate_type='service_ticket', aggregate_id=1)
+        db.session.add(event)
+        db.session.commit()
+        batch = outbox.read(after, 10)
+        self.assertEqual((batch.events, batch.next_after, batch.gaps), ([], after, []))
+
+        event.created_at = datetime.utcnow() - timedelta(seconds=60)
+        db.session.commit()
+        batch = outbox.read(after, 10)
+        self.assertEqual(([event.id for event in batch.events], batch.gaps), ([after + 2], [after + 1]))
+
+        # Gaps of rolled back transactions are dropped once the events after them are old enough
+        event.created_at = datetime.utcnow() - timedelta(seconds=self.app.config.get('OUTBOX_GAP_RETENTION', 3600) + 60)
+        db.session.commit()
+        self.assertEqual(outbox.read(after, 10).gaps, [])
+
+    # ------ Test Late Commit In A Gap Is Delivered ------
+    def test_late_commit_in_gap_delivered(self):
+        after = self.last_sequence()
+        # after + 1 commits long after the feed moved past it, e.g. a transaction that stayed open for minutes
+        db.session.add(OutboxEvent(id=after + 2, event_type='service_ticket.updated', aggregate_type='service_ticket',
+                                   aggregate_id=1, created_at=datetime.utcnow() - timedelta(seconds=120)))
+        db.session.commit()
+        response = self.client.get(f'/outbox/events?after={after}', headers=self.headers).json
+        self.assertEqual(([event['sequence'] for event in response['events']], response['gaps']), ([after + 2], [after + 1]))
+
+        db.session.add(OutboxEvent(id=after + 1, event_type='service_ticket.deleted', aggregate_type='service_ticket',
+                                   aggregate_id=2, created_at=datetime.utcnow() - timedelta(seconds=240)))
+        db.session.commit()
+        response = self.client.get(f"/outbox/events?after={response['next_after']}&gaps={after + 1}", headers=self.headers).json
+        self.assertEqual([event['sequence'] for event in response['events']], [after + 1])
+        self.assertEqual((response['next_after'], response['gaps']), (after + 2, []))
+        self.assertEqual(self.client.get('/outbox/events?gaps=a', headers=self.headers).status_code, 400)
+
+    # ------ Test Dispatcher Runs Handlers ------
+    def test_dispatcher_runs_handlers(self):
+        handled = []
+        handler = outbox.handler('service_ticket.created')(lambda event: handled.append(event.aggregate_id))
+        self.addCleanup(outbox.handlers.remove, (
+            {'service_ticket.created'}, handler
+        ))
+        outbox.dispatch()
+
+        ticket_ids = [self.create_ticket() for _ in range(2)]
+        self.client.put(f'/service_tickets/{ticket_ids[0]}', json={"service_desc": "Not a create"})
+        self.assertEqual(outbox.dispatch(), 3)
+        self.assertEqual(handled, ticket_ids)
+        self.assertEqual(outbox.dispatch(), 0)
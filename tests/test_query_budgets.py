@@ -0,0 +1,97 @@
+import re
+import uuid
+from sqlalchemy import text
+from app import create_app
+from app.models import db
+from app.utils.catalog import product_catalog
+import unittest
+from tests.query_budget import ROUTE_BUDGETS, UNBUDGETED_ENDPOINTS, budgeted_client, capture_queries, query_budget, override_budget
+
+# python -m unittest tests.test_query_budgets -v
+
+class TestQueryBudgets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app.app_context = cls.app.app_context()
+        cls.app.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app.app_context.pop()
+
+    # ------ Test Every Route Has A Budget ------
+    def test_every_route_has_a_budget(self):
+        endpoints = {rule.endpoint for rule in self.app.url_map.iter_rules()} - UNBUDGETED_ENDPOINTS
+        self.assertEqual(sorted(endpoints - set(ROUTE_BUDGETS)), [])
+        self.assertEqual(sorted(set(ROUTE_BUDGETS) - endpoints), [])
+
+    # ------ Test Query Budget Exceeded ------
+    def test_query_budget_exceeded(self):
+        with self.assertRaises(AssertionError) as context:
+            with query_budget(2):
+                for _ in range(3):
+                    db.session.execute(text('SELECT 1'))
+        self.assertIn('ran 3 SQL statements, budget is 2', str(context.exception))
+
+        with query_budget(3) as capture:
+            for _ in range(3):
+                db.session.execute(text('SELECT 1'))
+        self.assertEqual(capture.count, 3)
+
+    # ------ Test Budgeted Client ------
+    def test_budgeted_client_enforces_route_budget(self):
+        with override_budget('inventory_bp.get_product', 0):
+            # Bumping the catalog version makes the request reload the snapshot from the database
+            product_catalog.bump_version()
+            with self.assertRaises(AssertionError):
+                self.client.get('/inventory/1')
+        self.assertEqual(ROUTE_BUDGETS['inventory_bp.get_product'].queries, 1)
+
+    def reloads_after_write(self, capture):
+        """The SELECTs by primary key of a table the request wrote, run after its last write: reloads of expired rows."""
+        statements = [sql for sql, _ in capture.statements]
+        written = {re.search(r'^\s*(?:INSERT INTO|UPDATE)\s+(\w+)', sql, re.I) for sql in statements} - {None}
+        written_tables = {match.group(1) for match in written}
+        last_write = max((i for i, sql in enumerate(statements) if re.match(r'\s*(INSERT|UPDATE)\b', sql, re.I)), default=-1)
+        return [sql for sql in statements[last_write + 1:]
+                if any(re.search(rf'\bFROM {table}\s+WHERE {table}\.id = \?', sql) for table in written_tables)]
+
+    # ------ Test Write Responses Are Built From Memory ------
+    def test_write_responses_not_reloaded(self):
+        email = f"budget_{str(uuid.uuid4())[:8]}@email.com"
+        with capture_queries() as capture:
+            response = self.client.post('/customers/', json={"name": "Budget Customer", "phone": "555-555-5555",
+                                                             "email": email, "password": "password123"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.reloads_after_write(capture), [])
+        customer_id = response.json['id']
+
+        # The first ticket of a fresh database also inserts its sync counter
+        with override_budget('service_tickets_bp.create_service_ticket', 5), capture_queries() as capture:
+            response = self.client.post('/service_tickets/', json={"customer_id": customer_id, "vin": "1HGCM82633A123456",
+                                                                   "service_desc": "Budget ticket"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['service_ticket']['customer_id'], customer_id)
+        self.assertEqual(self.reloads_after_write(capture), [])
+
+        token = self.client.post('/auth/login', json={"email": email, "password": "password123"}).json['auth_token']
+        headers = {'Authorization': f"Bearer {token}"}
+        with capture_queries() as capture:
+            response = self.client.put(f'/customers/{customer_id}', json={"name": "Renamed Customer"}, headers=headers)
+        self.assertEqual((response.status_code, response.json['name']), (200, "Renamed Customer"))
+        self.assertEqual(self.reloads_after_write(capture), [])
+
+        # A plain commit expires the customer and dumping it reloads it
+        self.app.config['WRITE_RESPONSES_FROM_MEMORY'] = False
+        self.addCleanup(self.app.config.pop, 'WRITE_RESPONSES_FROM_MEMORY')
+        reload_budget = ROUTE_BUDGETS['customers_bp.update_customer'].queries + 1
+        with override_budget('customers_bp.update_customer', reload_budget), capture_queries() as capture:
+            response = self.client.put(f'/customers/{customer_id}', json={"name": "Reloaded Customer"}, headers=headers)
+        self.assertEqual(response.json['name'], "Reloaded Customer")
+        self.assertEqual(len(self.reloads_after_write(capture)), 1)
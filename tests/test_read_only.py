@@ -0,0 +1,73 @@
+import unittest
+import uuid
+from sqlalchemy import event, select
+from app import create_app
+from app.models import db, Customer
+from app.utils.read_only import READ_ONLY_KEY
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_read_only -v
+
+
+class TestReadOnly(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    def isolation_levels(self, method, url, **kwargs):
+        """Isolation level of the connection of every statement a request runs."""
+        levels = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            levels.append(conn.get_execution_options().get('isolation_level'))
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', before_cursor_execute)
+        response = self.client.open(url, method=method, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return levels
+
+    # ------ Test Get Requests Read In Autocommit ------
+    def test_get_requests_autocommit(self):
+        levels = self.isolation_levels('GET', '/customers/')
+        self.assertTrue(levels)
+        self.assertEqual(set(levels), {'AUTOCOMMIT'})
+
+        # Writes keep their transaction
+        levels = self.isolation_levels('POST', '/customers/', json={
+            "name": "Read Only", "phone": "555-555-5555", "email": f"read_only_{str(uuid.uuid4())[:8]}@email.com",
+            "password": "password123"
+        })
+        self.assertTrue(levels)
+        self.assertNotIn('AUTOCOMMIT', levels)
+
+    # ------ Test Read Only Session ------
+    def test_read_only_session(self):
+        query = select(Customer)
+        with self.app.test_request_context('/customers/', method='GET'):
+            self.app.preprocess_request()
+            self.assertFalse(db.session.autoflush)
+            self.assertEqual(db.session.get_bind(clause=query).get_execution_options().get('isolation_level'), 'AUTOCOMMIT')
+            # Writes never run on the autocommit connection
+            self.assertIs(db.session.get_bind(clause=Customer.__table__.delete()), db.engine)
+        # The session is restored once the request ends
+        self.assertTrue(db.session.autoflush)
+        self.assertNotIn(READ_ONLY_KEY, db.session.info)
+
+        self.app.config['READ_ONLY_GET_MODE'] = 'transaction'
+        self.addCleanup(self.app.config.pop, 'READ_ONLY_GET_MODE')
+        with self.app.test_request_context('/customers/', method='GET'):
+            self.app.preprocess_request()
+            self.assertFalse(db.session.autoflush)
+            self.assertIs(db.session.get_bind(clause=query), db.engine)
@@ -0,0 +1,150 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from flask import g
+from sqlalchemy import select
+from app import create_app
+from app.commands import copy_sqlite_database
+from app.config import TestingConfig
+from app.models import db, Customer
+from app.utils.replicas import REPLICA_BIND_PREFIX, WRITE_COOKIE, WRITE_HEADER
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_replicas -v
+
+
+def replica_config(directory, replicas):
+    """A testing config on a primary SQLite file in directory with the given replica files."""
+    return type('ReplicaTestingConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'primary.db')}",
+        'SQLALCHEMY_REPLICA_URIS': [f"sqlite:///{path}" for path in replicas],
+    })
+
+
+def add_customer(path, name):
+    """Insert a customer straight into one database file, bypassing the app."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("INSERT INTO customers (name, phone, email, password_hash) VALUES (?, ?, ?, ?)",
+                     (name, "555-555-5555", f"{name.replace(' ', '.').lower()}@email.com", "hash"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class TestReplicas(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A primary and two replicas, each replica with one customer the others don't have
+        cls.directory = tempfile.mkdtemp()
+        cls.replicas = [os.path.join(cls.directory, f"replica_{index}.db") for index in range(2)]
+        cls.app = create_app(replica_config(cls.directory, cls.replicas))
+        cls.client = budgeted_client(cls.app)
+
+        with cls.app.app_context():
+            db.create_all()
+            db.session.add(Customer(name="Primary Customer", phone="555-555-5555", email="primary@email.com", password="password123"))
+            db.session.commit()
+        copy_sqlite_database(os.path.join(cls.directory, 'primary.db'), cls.replicas[0])
+        copy_sqlite_database(os.path.join(cls.directory, 'primary.db'), cls.replicas[1])
+        add_customer(cls.replicas[0], "Replica Zero")
+        add_customer(cls.replicas[1], "Replica One")
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(cls.directory)
+        # db is shared by every app in the process, apps without replicas can't create_all for their binds
+        for key in [key for key in db.metadatas if key and key.startswith(REPLICA_BIND_PREFIX)]:
+            del db.metadatas[key]
+
+    def setUp(self):
+        state = self.app.extensions['replica_router']
+        self.addCleanup(state.health.clear)
+        self.addCleanup(self.client.delete_cookie, WRITE_COOKIE)
+
+    def customer_names(self, app=None, client=None):
+        # Every request in its own app context, so g and db.session don't carry over between requests
+        with (app or self.app).app_context():
+            response = (client or self.client).get('/customers/?per_page=50')
+        self.assertEqual(response.status_code, 200)
+        return {customer['name'] for customer in response.json['customers']}
+
+    def source(self, names):
+        if "Replica Zero" in names:
+            return 'replica_0'
+        if "Replica One" in names:
+            return 'replica_1'
+        return 'primary'
+
+    # ------ Test Reads Round Robin ------
+    def test_reads_round_robin(self):
+        sources = {self.source(self.customer_names()) for _ in range(4)}
+        self.assertEqual(sources, {'replica_0', 'replica_1'})
+
+    # ------ Test Read Your Writes ------
+    def test_read_your_writes(self):
+        with self.app.app_context():
+            response = self.client.post('/customers/', json={
+                "name": "Fresh Customer", "phone": "555-555-5555", "email": "fresh@email.com", "password": "password123"
+            })
+        self.assertEqual(response.status_code, 201)
+
+        # The replicas don't have the new customer, the client reads from the primary for a while
+        names = self.customer_names()
+        self.assertEqual(self.source(names), 'primary')
+        self.assertIn("Fresh Customer", names)
+
+        # Other clients, e.g. behind the same proxy, keep reading from the replicas
+        self.assertNotEqual(self.source(self.customer_names(client=budgeted_client(self.app))), 'primary')
+
+        # Clients without cookies send the marker back in a header, any worker can check its signature
+        marker = response.headers[WRITE_HEADER]
+        self.client.delete_cookie(WRITE_COOKIE)
+        self.assertNotEqual(self.source(self.customer_names()), 'primary')
+        with self.app.app_context():
+            response = self.client.get('/customers/?per_page=50', headers={WRITE_HEADER: marker})
+        self.assertIn("Fresh Customer", {customer['name'] for customer in response.json['customers']})
+        with self.app.app_context():
+            response = self.client.get('/customers/?per_page=50', headers={WRITE_HEADER: marker + 'x'})
+        self.assertNotIn("Fresh Customer", {customer['name'] for customer in response.json['customers']})
+
+        # The marker is the writer's, the anonymous signup doesn't pin a logged in customer's reads
+        with self.app.app_context():
+            login = self.client.post('/auth/login', json={"email": "primary@email.com", "password": "password123"})
+        self.client.delete_cookie(WRITE_COOKIE)
+        headers = {WRITE_HEADER: marker, 'Authorization': f"Bearer {login.json['auth_token']}"}
+        with self.app.app_context():
+            response = self.client.get('/customers/?per_page=50', headers=headers)
+        self.assertNotIn("Fresh Customer", {customer['name'] for customer in response.json['customers']})
+
+    # ------ Test Routing Rules ------
+    def test_routing_rules(self):
+        query = select(Customer)
+        with self.app.test_request_context('/customers/', method='GET'):
+            self.assertIn(db.session.get_bind(clause=query), [db.engines['replica_0'], db.engines['replica_1']])
+            g.use_primary = True
+            self.assertIs(db.session.get_bind(clause=query), db.engine)
+        with self.app.test_request_context('/customers/', method='POST'):
+            self.assertIs(db.session.get_bind(clause=query), db.engine)
+        with self.app.app_context():
+            self.assertIs(db.session.get_bind(clause=query), db.engine)
+
+    # ------ Test Unhealthy Replica ------
+    def test_unhealthy_replica(self):
+        state = self.app.extensions['replica_router']
+        state.health['replica_1'] = (time.monotonic(), False)
+        self.assertEqual({self.source(self.customer_names()) for _ in range(3)}, {'replica_0'})
+
+        # A replica that can't be opened fails its health check and reads fall back to the primary
+        app = create_app(replica_config(self.directory, [os.path.join(self.directory, 'missing', 'replica.db')]))
+        self.assertEqual(self.source(self.customer_names(app, budgeted_client(app))), 'primary')
+        self.assertEqual(app.extensions['replica_router'].health['replica_0'][1], False)
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
@@ -1,10 +1,21 @@
+import hashlib
+import json
 import uuid
 from flask import jsonify, request
 from app import create_app
 from app.models import Product, db, Mechanic, Admin, ServiceTicket, Customer
 import unittest
 from app.config import config_by_name
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from tests.query_budget import ROUTE_BUDGETS, budgeted_client, override_budget
+from app.models import IdempotencyKey
+from app.utils import idempotency
 from app.utils.util import not_found
+from app.utils.stale_cache import stale_cache_key
+from app.utils.lazyload import NPlusOneError
+from app.extensions import cache
+from unittest.mock import patch
 
 
 # python -m unittest discover tests -v
@@ -16,7 +27,7 @@ class TestServiceTicket(unittest.TestCase):
     def setUpClass(cls):
         cls.app = create_app('testing')
         print(cls.app.config) # Debugging line
-        cls.client = cls.app.test_client()
+        cls.client = budgeted_client(cls.app)
 
         # Create an application context
         cls.app.app_context = cls.app.app_context()
@@ -137,6 +148,70 @@ class TestServiceTicket(unittest.TestCase):
         self.assertEqual(data['vin'], "1HGCM82633A123456")
     
         
+    # ---------------------- Test Create Service Ticket With Idempotency Key ----------------------
+    def test_create_service_ticket_idempotency_key(self):
+        test_customer = Customer(
+            name="Retry Customer",
+            phone="123-456-7811",
+            email=f"testcustomer_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        db.session.add(test_customer)
+        db.session.commit()
+        
+        payload = {
+            "customer_id": test_customer.id,
+            "vin": "1HGCM82633A654321",
+            "service_desc": "Test Idempotent Service Ticket"
+        }
+        headers = {**self.auth_headers, 'Idempotency-Key': self.short_uuid()}
+        
+        # Reserving the key and storing the response are two more statements
+        with override_budget('service_tickets_bp.create_service_ticket', ROUTE_BUDGETS['service_tickets_bp.create_service_ticket'].queries + 2):
+            first = self.client.post('/service_tickets/', json=payload, headers=headers)
+            retry = self.client.post('/service_tickets/', json=payload, headers=headers)
+        
+        # The retry gets the stored response and no second ticket is created
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(retry.json['service_ticket_id'], first.json['service_ticket_id'])
+        self.assertEqual(ServiceTicket.query.filter_by(customer_id=test_customer.id).count(), 1)
+        
+        # Reusing the key for a different request is rejected
+        conflict = self.client.post('/service_tickets/', json={**payload, "service_desc": "Different"}, headers=headers)
+        self.assertEqual(conflict.status_code, 422)
+
+        # Another client sending the same key gets its own request run, not the stored response
+        login = self.client.post('/auth/login', json={"email": self.test_email, "password": "password123"})
+        other_headers = {'Authorization': f"Bearer {login.json['auth_token']}", 'Idempotency-Key': headers['Idempotency-Key']}
+        with override_budget('service_tickets_bp.create_service_ticket', ROUTE_BUDGETS['service_tickets_bp.create_service_ticket'].queries + 2):
+            other = self.client.post('/service_tickets/', json=payload, headers=other_headers)
+        self.assertEqual(other.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', other.headers)
+        self.assertEqual(ServiceTicket.query.filter_by(customer_id=test_customer.id).count(), 2)
+
+    # ---------------------- Test Abandoned Idempotency Key Expires ----------------------
+    def test_abandoned_idempotency_key_expires(self):
+        key = self.short_uuid()
+        with self.app.test_request_context('/service_tickets/', method='POST', headers=self.auth_headers):
+            store_key = idempotency._store_key(key)
+        body = json.dumps({"customer_id": 1, "vin": "1HGCM82633A654321", "service_desc": "Abandoned key"})
+        # A worker reserved the key and died before storing the response
+        db.session.add(IdempotencyKey(key=store_key, fingerprint=hashlib.sha256(body.encode()).hexdigest(),
+                                      expires_at=datetime.utcnow() + timedelta(seconds=60)))
+        db.session.commit()
+        headers = {**self.auth_headers, 'Idempotency-Key': key, 'Content-Type': 'application/json'}
+        self.assertEqual(self.client.post('/service_tickets/', data=body, headers=headers).status_code, 409)
+
+        db.session.execute(update(IdempotencyKey).where(IdempotencyKey.key == store_key).values(expires_at=datetime.utcnow()))
+        db.session.commit()
+        # The failed reservation, reading and deleting the expired key, then reserving it and storing the response
+        with override_budget('service_tickets_bp.create_service_ticket', ROUTE_BUDGETS['service_tickets_bp.create_service_ticket'].queries + 5):
+            response = self.client.post('/service_tickets/', data=body, headers=headers)
+        self.assertEqual(response.status_code, 201)
+    
+    
     # ---------------------- Test Invalid Create Service Ticket ----------------------
     def test_invalid_create_service_ticket(self):
         # Attempt to create a service ticket without a customer ID
@@ -177,6 +252,178 @@ class TestServiceTicket(unittest.TestCase):
         self.assertIsInstance(response.json['service_tickets'], list)
     
     
+    # ---------------------- Test Get All Service Tickets Read Paths Match ----------------------
+    def test_get_all_service_tickets_read_paths_match(self):
+        test_customer = Customer(
+            name="Read Path Customer",
+            phone="135-456-7891",
+            email=f"testcustomer_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        test_mechanic = Mechanic(
+            name="Read Path Mechanic",
+            phone="135-456-7892",
+            email=f"testmechanic_{self.short_uuid()}@em.com",
+            salary=60000,
+            password="password123"
+        )
+        db.session.add_all([test_customer, test_mechanic])
+        db.session.commit()
+        
+        self.client.post('/service_tickets/', json={
+            "customer_id": test_customer.id,
+            "mechanic_ids": [test_mechanic.id],
+            "vin": "3TNCM82633A123457",
+            "service_desc": "Test Read Path Service Ticket"
+        }, headers=self.auth_headers)
+        
+        # The Core record path should produce exactly the same page as the ORM path
+        self.app.config['LIST_READ_PATH'] = 'orm'
+        self.addCleanup(self.app.config.pop, 'LIST_READ_PATH', None)
+        # The ORM path lazy loads each ticket's relationships, which is what the Core path avoids
+        db.session.add_all([
+            ServiceTicket(customer_id=test_customer.id, vin="3TNCM82633A123457", service_desc=f"Read Path Service {i}", mechanics=[test_mechanic])
+            for i in range(6)
+        ])
+        db.session.commit()
+        with override_budget('service_tickets_bp.get_service_tickets', 200):
+            with self.assertRaises(NPlusOneError) as context:
+                self.client.get('/service_tickets/?per_page=50')
+            self.assertIn('ServiceTicket.mechanics lazy loaded', str(context.exception))
+            
+            self.app.config['LAZY_LOAD_DETECTION'] = None
+            self.addCleanup(self.app.config.__setitem__, 'LAZY_LOAD_DETECTION', 'raise')
+            orm_response = self.client.get('/service_tickets/?per_page=50')
+        self.app.config['LIST_READ_PATH'] = 'core'
+        core_response = self.client.get('/service_tickets/?per_page=50')
+        
+        self.assertEqual(core_response.status_code, 200)
+        self.assertEqual(core_response.json, orm_response.json)
+        self.assertTrue(any(test_mechanic.id in ticket["mechanic_ids"] for ticket in core_response.json['service_tickets']))
+    
+    
+    # ---------------------- Test Batch Get Service Tickets by IDs ----------------------
+    def test_batch_get_service_tickets_by_ids(self):
+        test_customer = Customer(
+            name="Batch Customer",
+            phone="135-456-7893",
+            email=f"testcustomer_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        db.session.add(test_customer)
+        db.session.commit()
+        
+        ticket_ids = []
+        for desc in ("Batch Ticket One", "Batch Ticket Two"):
+            response = self.client.post('/service_tickets/', json={
+                "customer_id": test_customer.id,
+                "vin": "3TNCM82633A123458",
+                "service_desc": desc
+            }, headers=self.auth_headers)
+            ticket_ids.append(response.json['service_ticket_id'])
+        
+        # Results come back in request order with None and a missing entry for unknown ids
+        response = self.client.get(f'/service_tickets/?ids={ticket_ids[1]},99999999,{ticket_ids[0]}')
+        self.assertEqual(response.status_code, 200)
+        tickets = response.json['service_tickets']
+        self.assertEqual(tickets[0]['service_desc'], "Batch Ticket Two")
+        self.assertIsNone(tickets[1])
+        self.assertEqual(tickets[2]['service_desc'], "Batch Ticket One")
+        self.assertEqual(response.json['missing'], [99999999])
+        
+        response = self.client.get('/service_tickets/?ids=1,abc')
+        self.assertEqual(response.status_code, 400)
+    
+    
+    # ---------------------- Test Batch Cached Tickets Follow Their Customer ----------------------
+    def test_batch_cached_tickets_follow_customer(self):
+        test_customer = Customer(
+            name="Cached Customer",
+            phone="135-456-7894",
+            email=f"testcustomer_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        db.session.add(test_customer)
+        db.session.commit()
+        customer_id = test_customer.id
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": customer_id,
+            "vin": "3TNCM82633A123459",
+            "service_desc": "Cached Customer Ticket"
+        }, headers=self.auth_headers)
+        ticket_id = response.json['service_ticket_id']
+        
+        # Fill the cache, then rename the customer
+        self.client.get(f'/service_tickets/?ids={ticket_id}')
+        response = self.client.put(f'/customers/{customer_id}', json={"name": "Renamed Cached Customer"}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/service_tickets/?ids={ticket_id}')
+        self.assertEqual(response.json['service_tickets'][0]['customer']['name'], "Renamed Cached Customer")
+        
+        # Deleting the customer deletes the cached ticket too
+        response = self.client.delete(f'/customers/{customer_id}', headers=self.auth_headers)
+        self.assertEqual(response.json['deleted_service_tickets'], 1)
+        response = self.client.get(f'/service_tickets/?ids={ticket_id}')
+        self.assertEqual((response.json['service_tickets'], response.json['missing']), ([None], [ticket_id]))
+    
+    
+    # ---------------------- Test Batch Cached Tickets Follow Their Mechanics ----------------------
+    def test_batch_cached_tickets_follow_mechanic(self):
+        test_mechanic = Mechanic(
+            name="Cached Mechanic",
+            phone="696-666-6667",
+            email=f"testmechanic_{self.short_uuid()}@em.com",
+            salary=60000,
+            password="password123"
+        )
+        db.session.add(test_mechanic)
+        db.session.commit()
+        mechanic_id = test_mechanic.id
+        customer = Customer.query.first()
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": customer.id,
+            "vin": "3TNCM82633A123460",
+            "service_desc": "Cached Mechanic Ticket",
+            "mechanic_ids": [mechanic_id]
+        }, headers=self.auth_headers)
+        ticket_id = response.json['service_ticket_id']
+        
+        self.client.get(f'/service_tickets/?ids={ticket_id}')
+        response = self.client.put(f'/mechanics/{mechanic_id}', json={"name": "Renamed Cached Mechanic"}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/service_tickets/?ids={ticket_id}')
+        self.assertEqual([mechanic['name'] for mechanic in response.json['service_tickets'][0]['mechanics']], ["Renamed Cached Mechanic"])
+        
+        # Deleting the mechanic unassigns them from the cached ticket
+        self.assertEqual(self.client.delete(f'/mechanics/{mechanic_id}', headers=self.auth_headers).status_code, 200)
+        response = self.client.get(f'/service_tickets/?ids={ticket_id}')
+        self.assertEqual(response.json['service_tickets'][0]['mechanic_ids'], [])
+    
+    
+    # ---------------------- Test Batch Cached Tickets Follow Their Products ----------------------
+    def test_batch_cached_tickets_follow_product(self):
+        test_product = Product(name=f"Cached Filter {self.short_uuid()}", price=12.5)
+        db.session.add(test_product)
+        db.session.commit()
+        product_id = test_product.id
+        customer = Customer.query.first()
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": customer.id,
+            "vin": "3TNCM82633A123461",
+            "service_desc": "Cached Product Ticket"
+        }, headers=self.auth_headers)
+        ticket_id = response.json['service_ticket_id']
+        response = self.client.put(f'/service_tickets/{ticket_id}/add_product', json={"product_id": product_id, "quantity": 2},
+                                   headers=self.auth_headers)
+        self.assertEqual(response.status_code, 201)
+        
+        self.client.get(f'/service_tickets/?ids={ticket_id}')
+        response = self.client.put(f'/inventory/{product_id}', json={"name": "Cached Filter", "price": 14.0}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/service_tickets/?ids={ticket_id}')
+        self.assertEqual([link['product']['price'] for link in response.json['service_tickets'][0]['product_links']], [14.0])
+    
+    
     # ---------------------- Test Invalid Get All Service Tickets ----------------------
     def test_invalid_get_all_service_tickets(self):
         response = self.client.get('/service_tickets/?page=not_a_number')
@@ -384,6 +631,48 @@ class TestServiceTicket(unittest.TestCase):
         self.assertIn('Service ticket not found', response.get_data(as_text=True))
     
     
+    # ---------------------- Test Get Service Ticket Serves Stale Cache on Error ----------------------
+    def test_get_service_ticket_serves_stale_on_error(self):
+        # Use a real cache for this test, the testing config uses the null cache
+        cache.init_app(self.app, config={'CACHE_TYPE': 'SimpleCache'})
+        self.addCleanup(cache.init_app, self.app, config={'CACHE_TYPE': 'NullCache'})
+        
+        test_customer = Customer(
+            name="Stale Customer",
+            phone="123-436-7811",
+            email=f"testcustomer_{self.short_uuid()}@em.com",
+            password="password123"
+        )
+        db.session.add(test_customer)
+        db.session.commit()
+        
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": test_customer.id,
+            "vin": "5UXHM82633A123456",
+            "service_desc": "Test Stale Service Ticket"
+        }, headers=self.auth_headers)
+        service_ticket_id = response.json.get('service_ticket_id')
+        
+        # First request fills the cache
+        response = self.client.get(f'/service_tickets/{service_ticket_id}')
+        self.assertEqual(response.status_code, 200)
+        
+        # Age the cached entry past the hard timeout
+        key = stale_cache_key(f'/service_tickets/{service_ticket_id}?')
+        entry = cache.get(key)
+        self.assertIsNotNone(entry)
+        entry['created'] -= self.app.config.get('CACHE_HARD_TIMEOUT', 300) + 1
+        cache.set(key, entry)
+        
+        # Database failure should fall back to the stale response
+        with patch.object(db.session, 'get', side_effect=Exception("Database unavailable")):
+            response = self.client.get(f'/service_tickets/{service_ticket_id}')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Revalidation Failed', response.headers.get('Warning', ''))
+        self.assertEqual(response.json['service_ticket']['service_desc'], "Test Stale Service Ticket")
+    
+    
     # ---------------------- Test Update Existing Service Ticket ----------------------
     def test_update_service_ticket(self):
         # Create a test customer
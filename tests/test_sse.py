@@ -0,0 +1,182 @@
+import json
+import uuid
+import unittest
+from sqlalchemy import func, select
+from app import create_app
+from app.models import db, Admin, Customer, Mechanic, OutboxEvent, ServiceTicket
+from app.utils.outbox import outbox
+from app.utils.sse import limit_streams
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_sse -v
+
+
+class TestServerSentEvents(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        suffix = str(uuid.uuid4())[:8]
+        cls.admin_email = f"sse_admin_{suffix}@email.com"
+        admin = Admin(name="SSE Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        cls.customer = Customer(name="SSE Customer", phone="555-555-5555", email=f"sse_customer_{suffix}@email.com",
+                                password="password123")
+        cls.other_customer = Customer(name="Other SSE Customer", phone="555-555-5555",
+                                      email=f"sse_other_{suffix}@email.com", password="password123")
+        cls.mechanic = Mechanic(name="SSE Mechanic", phone="555-555-5555", email=f"sse_mechanic_{suffix}@email.com",
+                                salary=50000, password="password123")
+        db.session.add_all([admin, cls.customer, cls.other_customer, cls.mechanic])
+        db.session.commit()
+        cls.customer_id, cls.other_customer_id, cls.mechanic_id = cls.customer.id, cls.other_customer.id, cls.mechanic.id
+        cls.customer_headers = cls.login(cls.customer.email, "password123")
+        cls.mechanic_headers = cls.login(cls.mechanic.email, "password123")
+        cls.admin_headers = cls.login(cls.admin_email, "adminpassword")
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    @classmethod
+    def login(cls, email, password):
+        response = cls.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    def setUp(self):
+        self.configure(SSE_HEARTBEAT_INTERVAL=0.05)
+        # Start the dispatcher at the end of the feed
+        outbox.dispatch()
+
+    def configure(self, **settings):
+        for key, value in settings.items():
+            self.addCleanup(self.app.config.__setitem__, key, self.app.config.get(key)) if key in self.app.config \
+                else self.addCleanup(self.app.config.pop, key)
+            self.app.config[key] = value
+
+    def open_stream(self, headers):
+        response = self.client.get('/service_tickets/stream', headers=headers, buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.addCleanup(response.close)
+        messages = iter(response.response)
+        self.assertTrue(next(messages).startswith(b"retry: "))
+        return messages
+
+    def next_event(self, messages):
+        """(event type, data) of the next message, (None, None) for a heartbeat."""
+        fields = {}
+        for line in next(messages).decode().splitlines():
+            if line.startswith(':'):
+                return None, None
+            name, _, value = line.partition(': ')
+            fields[name] = value
+        return fields.get('event'), json.loads(fields['data'])
+
+    def create_ticket(self, customer_id, mechanic_ids=()):
+        ticket = ServiceTicket(customer_id=customer_id, vin="1HGCM82633A123456", service_desc="Streamed ticket",
+                               mechanics=[db.session.get(Mechanic, mechanic_id) for mechanic_id in mechanic_ids])
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket.id
+
+    def update_ticket(self, ticket_id, **changes):
+        ticket = db.session.get(ServiceTicket, ticket_id)
+        for key, value in changes.items():
+            setattr(ticket, key, value)
+        db.session.commit()
+
+    # ------ Test Customer Receives Own Ticket Events ------
+    def test_customer_receives_own_ticket_events(self):
+        messages = self.open_stream(self.customer_headers)
+        ticket_id = self.create_ticket(self.customer_id)
+        self.create_ticket(self.other_customer_id)
+        self.update_ticket(ticket_id, service_desc="Brakes done")
+        outbox.dispatch()
+
+        event_type, data = self.next_event(messages)
+        self.assertEqual((event_type, data['aggregate_id']), ('service_ticket.created', ticket_id))
+        event_type, data = self.next_event(messages)
+        self.assertEqual((event_type, data['payload']), ('service_ticket.updated', {"service_desc": "Brakes done"}))
+        # The other customer's ticket isn't sent
+        self.assertEqual(self.next_event(messages), (None, None))
+
+    # ------ Test Mechanic Receives Assignment Events ------
+    def test_mechanic_receives_assignment_events(self):
+        messages = self.open_stream(self.mechanic_headers)
+        ticket_id = self.create_ticket(self.customer_id, [self.mechanic_id])
+        outbox.dispatch()
+        self.assertEqual(self.next_event(messages)[0], 'service_ticket.created')
+        self.assertEqual(self.next_event(messages)[0], 'service_ticket.mechanic_assigned')
+
+        # The audience is looked up when the event is dispatched, the unassigned mechanic gets no more updates
+        self.update_ticket(ticket_id, mechanics=[])
+        self.update_ticket(ticket_id, service_desc="No longer theirs")
+        outbox.dispatch()
+        event_type, data = self.next_event(messages)
+        self.assertEqual((event_type, data['payload']), ('service_ticket.mechanic_removed', {"mechanic_id": self.mechanic_id}))
+        self.assertEqual(self.next_event(messages), (None, None))
+
+    # ------ Test Resume From Last Event ID ------
+    def test_resume_from_last_event_id(self):
+        last_event_id = db.session.execute(select(func.max(OutboxEvent.id))).scalar()
+        ticket_id = self.create_ticket(self.customer_id)
+        self.update_ticket(ticket_id, service_desc="Missed while offline")
+
+        messages = self.open_stream({**self.customer_headers, 'Last-Event-ID': str(last_event_id)})
+        replayed = [self.next_event(messages)[0] for _ in range(2)]
+        self.assertEqual(replayed, ['service_ticket.created', 'service_ticket.updated'])
+        # The same events reaching the live subscription aren't sent twice
+        outbox.dispatch()
+        self.assertEqual(self.next_event(messages), (None, None))
+
+        # Too far behind to replay
+        self.configure(SSE_REPLAY_LIMIT=1)
+        messages = self.open_stream({**self.customer_headers, 'Last-Event-ID': str(last_event_id)})
+        self.assertEqual(self.next_event(messages), ('reset', {"reason": "too_far_behind"}))
+        self.assertIsNone(next(messages, None))
+
+        headers = {**self.customer_headers, 'Last-Event-ID': 'abc'}
+        self.assertEqual(self.client.get('/service_tickets/stream', headers=headers).status_code, 400)
+        self.assertEqual(self.client.get('/service_tickets/stream', headers=self.admin_headers).status_code, 404)
+
+    # ------ Test Slow Client Is Reset ------
+    def test_slow_client_reset(self):
+        self.configure(SSE_BUFFER_SIZE=2)
+        messages = self.open_stream(self.customer_headers)
+        for _ in range(3):
+            self.create_ticket(self.customer_id)
+        outbox.dispatch()
+        self.assertEqual(self.next_event(messages), ('reset', {"reason": "buffer_overflow"}))
+        self.assertIsNone(next(messages, None))
+
+    # ------ Test Connection Limit And Stream Lifetime ------
+    def test_connection_limit_and_lifetime(self):
+        self.configure(SSE_MAX_CONNECTIONS=1, SSE_MAX_STREAM_SECONDS=0.2)
+        response = self.client.get('/service_tickets/stream', headers=self.customer_headers, buffered=False)
+        busy = self.client.get('/service_tickets/stream', headers=self.mechanic_headers)
+        self.assertEqual(busy.status_code, 503)
+        self.assertIn('Retry-After', busy.headers)
+
+        # The stream ends on its own with heartbeats in between
+        messages = list(response.response)
+        self.assertIn(b": heartbeat\n\n", messages)
+        response.close()
+        self.assertEqual(self.client.get('/service_tickets/stream', headers=self.mechanic_headers).status_code, 200)
+
+    # ------ Test Streams Leave Threads For Other Requests ------
+    def test_streams_limited_to_threads(self):
+        self.configure(SSE_MAX_CONNECTIONS=100, SSE_RESERVED_THREADS=4)
+        limit_streams(self.app, 10)
+        self.assertEqual(self.app.config['SSE_MAX_CONNECTIONS'], 6)
+        # A lower limit is kept and too few threads leave no room for streams
+        limit_streams(self.app, 32)
+        self.assertEqual(self.app.config['SSE_MAX_CONNECTIONS'], 6)
+        limit_streams(self.app, 2)
+        self.assertEqual(self.app.config['SSE_MAX_CONNECTIONS'], 0)
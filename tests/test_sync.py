@@ -0,0 +1,184 @@
+import uuid
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import create_app
+from app.models import db, Admin, Customer, Mechanic, Product, ServiceTicket, ServiceTicketTombstone
+from app.utils.sync import prune_tombstones
+from tests.query_budget import budgeted_client
+
+# python -m unittest tests.test_sync -v
+
+
+class TestSync(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        cls.client = budgeted_client(cls.app)
+
+        # Create an application context
+        cls.app_context = cls.app.app_context()
+        cls.app_context.push()
+        db.create_all()
+
+        suffix = str(uuid.uuid4())[:8]
+        cls.admin_email = f"sync_admin_{suffix}@email.com"
+        admin = Admin(name="Sync Admin", email=cls.admin_email)
+        admin.set_password("adminpassword")
+        cls.customer_email = f"sync_customer_{suffix}@email.com"
+        cls.customer = Customer(name="Sync Customer", phone="555-555-5555", email=cls.customer_email, password="password123")
+        cls.mechanic_email = f"sync_mechanic_{suffix}@email.com"
+        cls.mechanic = Mechanic(name="Sync Mechanic", phone="555-555-5555", email=cls.mechanic_email, salary=50000,
+                                password="password123")
+        cls.product = Product(name="Sync Wiper Blades", price=19.99)
+        db.session.add_all([admin, cls.customer, cls.mechanic, cls.product])
+        db.session.commit()
+        cls.mechanic_headers = cls.login(cls.mechanic_email, "password123")
+        cls.customer_headers = cls.login(cls.customer_email, "password123")
+        cls.admin_headers = cls.login(cls.admin_email, "adminpassword")
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        cls.app_context.pop()
+
+    @classmethod
+    def login(cls, email, password):
+        response = cls.client.post('/auth/login', json={"email": email, "password": password})
+        return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    def sync(self, headers, since=None):
+        url = '/service_tickets/sync' if since is None else f'/service_tickets/sync?since={since}'
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def create_ticket(self, mechanic_ids=()):
+        response = self.client.post('/service_tickets/', json={
+            "customer_id": self.customer.id, "vin": "1HGCM82633A123456", "service_desc": "Sync ticket",
+            "mechanic_ids": list(mechanic_ids)
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json['service_ticket_id']
+
+    def changed_ids(self, result):
+        return [ticket['id'] for ticket in result['service_tickets']]
+
+    # ------ Test Mechanic Delta Sync ------
+    def test_mechanic_delta_sync(self):
+        ticket_id = self.create_ticket([self.mechanic.id])
+        full = self.sync(self.mechanic_headers)
+        self.assertTrue(full['full_sync'])
+        self.assertIn(ticket_id, self.changed_ids(full))
+
+        # Nothing changed
+        token = full['sync_token']
+        result = self.sync(self.mechanic_headers, token)
+        self.assertEqual((result['service_tickets'], result['deleted_ids'], result['full_sync']), ([], [], False))
+        self.assertEqual(result['sync_token'], token)
+
+        # Ticket fields and product links
+        self.client.put(f'/service_tickets/{ticket_id}', json={"service_desc": "Changed"})
+        result = self.sync(self.mechanic_headers, token)
+        self.assertEqual(self.changed_ids(result), [ticket_id])
+        self.assertEqual(result['service_tickets'][0]['service_desc'], "Changed")
+        token = result['sync_token']
+        self.client.put(f'/service_tickets/{ticket_id}/add_product', json={"product_id": self.product.id, "quantity": 1})
+        result = self.sync(self.mechanic_headers, token)
+        self.assertEqual(self.changed_ids(result), [ticket_id])
+        token = result['sync_token']
+
+        # Unassigned tickets are tombstones, assigned again they are changes
+        self.client.put(f'/service_tickets/{ticket_id}', json={"remove_mechanic_ids": [self.mechanic.id]})
+        result = self.sync(self.mechanic_headers, token)
+        self.assertEqual((result['service_tickets'], result['deleted_ids']), ([], [ticket_id]))
+        self.client.put(f'/service_tickets/{ticket_id}', json={"add_mechanic_ids": [self.mechanic.id]})
+        result = self.sync(self.mechanic_headers, token)
+        self.assertEqual((self.changed_ids(result), result['deleted_ids']), ([ticket_id], []))
+        token = result['sync_token']
+
+        # Deleted tickets are tombstones for their customer and mechanics
+        customer_token = self.sync(self.customer_headers)['sync_token']
+        self.assertEqual(self.client.delete(f'/service_tickets/{ticket_id}', headers=self.admin_headers).status_code, 200)
+        self.assertEqual(self.sync(self.mechanic_headers, token)['deleted_ids'], [ticket_id])
+        self.assertEqual(self.sync(self.customer_headers, customer_token)['deleted_ids'], [ticket_id])
+
+    # ------ Test Renamed People Are Synced With Their Tickets ------
+    def test_renamed_people_synced(self):
+        ticket_id = self.create_ticket([self.mechanic.id])
+        mechanic_token = self.sync(self.mechanic_headers)['sync_token']
+        customer_token = self.sync(self.customer_headers)['sync_token']
+
+        response = self.client.put(f'/mechanics/{self.mechanic.id}', json={"name": "Sync Mechanic Renamed"}, headers=self.admin_headers)
+        self.assertEqual(response.status_code, 200)
+        result = self.sync(self.mechanic_headers, mechanic_token)
+        self.assertIn(ticket_id, self.changed_ids(result))
+        ticket = next(ticket for ticket in result['service_tickets'] if ticket['id'] == ticket_id)
+        self.assertEqual([mechanic['name'] for mechanic in ticket['mechanics']], ["Sync Mechanic Renamed"])
+
+        response = self.client.put(f'/customers/{self.customer.id}', json={"name": "Sync Customer Renamed"}, headers=self.admin_headers)
+        self.assertEqual(response.status_code, 200)
+        result = self.sync(self.customer_headers, customer_token)
+        self.assertIn(ticket_id, self.changed_ids(result))
+        self.assertEqual({ticket['customer']['name'] for ticket in result['service_tickets']}, {"Sync Customer Renamed"})
+
+    # ------ Test Customer Delta Sync ------
+    def test_customer_delta_sync(self):
+        token = self.sync(self.customer_headers)['sync_token']
+        ticket_id = self.create_ticket()
+        result = self.sync(self.customer_headers, token)
+        self.assertEqual(self.changed_ids(result), [ticket_id])
+        # Another user's syncs don't see it
+        self.assertNotIn(ticket_id, self.changed_ids(self.sync(self.mechanic_headers)))
+
+        # Deleting an assigned mechanic changes the customer's ticket
+        mechanic = Mechanic(name="Leaving Mechanic", phone="555-555-5555", email=f"leaving_{str(uuid.uuid4())[:8]}@email.com",
+                            salary=50000, password="password123")
+        db.session.add(mechanic)
+        db.session.commit()
+        mechanic_id = mechanic.id
+        self.client.put(f'/service_tickets/{ticket_id}', json={"add_mechanic_ids": [mechanic_id]})
+        token = self.sync(self.customer_headers, token)['sync_token']
+        self.assertEqual(self.client.delete(f'/mechanics/{mechanic_id}', headers=self.admin_headers).status_code, 200)
+        result = self.sync(self.customer_headers, token)
+        self.assertEqual(self.changed_ids(result), [ticket_id])
+        self.assertEqual(result['service_tickets'][0]['mechanic_ids'], [])
+
+    # ------ Test Invalid And Expired Tokens ------
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/service_tickets/sync?since=abc', headers=self.mechanic_headers).status_code, 400)
+        self.assertEqual(self.client.get('/service_tickets/sync?since=-1', headers=self.mechanic_headers).status_code, 400)
+        self.assertEqual(self.client.get('/service_tickets/sync', headers=self.admin_headers).status_code, 404)
+        # A token from another database
+        self.assertTrue(self.sync(self.mechanic_headers, 10 ** 9)['full_sync'])
+
+        # A token from before pruned tombstones
+        ticket_id = self.create_ticket([self.mechanic.id])
+        token = self.sync(self.mechanic_headers)['sync_token']
+        self.client.put(f'/service_tickets/{ticket_id}', json={"remove_mechanic_ids": [self.mechanic.id]})
+        db.session.execute(update(ServiceTicketTombstone).values(created_at=datetime.utcnow() - timedelta(days=60)))
+        db.session.commit()
+        self.assertGreaterEqual(prune_tombstones(30), 1)
+        result = self.sync(self.mechanic_headers, token)
+        self.assertTrue(result['full_sync'])
+        self.assertNotIn(ticket_id, self.changed_ids(result))
+
+    # ------ Test Versions Are Stamped In The Same Transaction ------
+    def test_versions_stamped(self):
+        ticket = ServiceTicket(customer_id=self.customer.id, vin="1HGCM82633A123456", service_desc="Versioned")
+        db.session.add(ticket)
+        db.session.commit()
+        first = ticket.change_version
+        self.assertGreater(first, 0)
+
+        ticket.vin = "2HGCM82633A654321"
+        ticket.service_desc = "Versioned twice"
+        db.session.commit()
+        self.assertGreater(ticket.change_version, first)
+
+        # A rolled back change doesn't move the ticket's version
+        version = ticket.change_version
+        ticket.vin = "3HGCM82633A654321"
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(ticket.change_version, version)
@@ -0,0 +1,14 @@
+# wsgi.py
+"""Production entrypoint: `gunicorn -c gunicorn.conf.py` (preloads this module in the master process)."""
+from dotenv import load_dotenv
+# Load .env
+load_dotenv()
+
+import os
+from app import create_app
+from app.utils.prefork import warm_up
+
+app = create_app(os.getenv('FLASK_ENV', 'production'))
+
+# Mappers, URL map and product catalog are built once here and shared by every forked worker
+warm_up(app)